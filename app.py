@@ -1,11 +1,13 @@
 import streamlit as st
-import google.generativeai as genai
-from pymongo import MongoClient
 from bson.json_util import dumps
-import certifi
 import pandas as pd
 from datetime import datetime, timedelta
 import pytz
+import requests
+from urllib.parse import quote
+
+from app_resources import GeminiResource, MongoResources
+from sensor_history import build_sensor_history, ensure_history_indexes, fetch_sensor_records
 
 def set_custom_theme():
     """Apply enhanced custom color theme with animations"""
@@ -339,18 +341,45 @@ div[data-testid="stTable"] tr:hover td {
 # ===========================
 # KONFIGURASI AWAL
 # ===========================
+# Klien Gemini dan MongoDB dibuat sekali per proses server (app_resources.py),
+# bukan di setiap rerun Streamlit, lalu dipakai bersama oleh semua sesi.
+@st.cache_resource
+def get_gemini(api_key):
+    return GeminiResource(api_key)
+
+@st.cache_resource
+def get_mongo(uri):
+    return MongoResources(uri)
+
 # API Key Gemini
-api_key = st.secrets["GEMINI_API"]
-genai.configure(api_key=api_key)
-model = genai.GenerativeModel('gemini-2.0-flash')
+model = get_gemini(st.secrets["GEMINI_API"])
 
 # MongoDB Config
-MONGO_URI = st.secrets["MONGO_URI"]
-client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
-db = client["SentinelSIC"]
-collection = db["SensorSentinel"]
-boxcfg_coll = db["IdUserBox"]
-reminder_collection = db["MedicineReminders"]
+mongo = get_mongo(st.secrets["MONGO_URI"])
+if not mongo.ensure():
+    st.warning("⚠️ Koneksi MongoDB bermasalah, mencoba menyambung ulang pada interaksi berikutnya.")
+client = mongo.client
+db = mongo.db
+collection = mongo.collection("SensorSentinel")
+boxcfg_coll = mongo.collection("IdUserBox")
+reminder_collection = mongo.collection("MedicineReminders")
+
+@st.cache_resource
+def ensure_sensor_indexes():
+    """Indeks (box_id, timestamp) untuk riwayat sensor, dibuat sekali per proses server."""
+    try:
+        ensure_history_indexes(collection)
+    except Exception as e:
+        st.warning(f"Gagal membuat indeks riwayat sensor: {str(e)}")
+    return True
+
+ensure_sensor_indexes()
+
+# Riwayat sensor diproses secara vektor (sensor_history.py), jadi batasnya bisa jauh di atas 2000
+SENSOR_HISTORY_LIMIT = 20000
+
+# Server MediBox (opsional): GET /api/mediboxes/<box_id>/status
+MEDIBOX_API_URL = (st.secrets.get("MEDIBOX_API_URL") or "").rstrip("/")
 
 # Fungsi untuk mendapatkan timestamp lokal
 def get_local_timestamp():
@@ -395,101 +424,72 @@ if 'box_id' in st.query_params and st.session_state.page == 'login':
 # FUNGSI PENDUKUNG
 # ===========================
 def get_sensor_data():
+    """Status terkini kotak aktif: satu pembacaan berdasarkan box_id, bukan scan seluruh koleksi."""
+    box_id = st.session_state.box_id
+    if not box_id:
+        return None
+
+    if MEDIBOX_API_URL:
+        try:
+            response = requests.get(f"{MEDIBOX_API_URL}/api/mediboxes/{quote(box_id, safe='')}/status", timeout=5)
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            status = response.json()
+            latest = status.get("latest") or {}
+            return {
+                **(latest.get("data") or {}),
+                "box_id": box_id,
+                "timestamp": latest.get("recorded_at"),
+                "lid_state": status.get("lid_state"),
+                "pill_count": status.get("pill_count"),
+                "last_seen_at": status.get("last_seen_at"),
+            }
+        except (requests.RequestException, ValueError) as e:
+            st.warning(f"Status kotak dari server tidak tersedia, membaca MongoDB: {str(e)}")
+
     try:
-        latest = list(collection.find().sort("timestamp", -1).limit(1))
-        return latest[0] if latest else None
+        return collection.find_one({"box_id": box_id}, sort=[("timestamp", -1)])
     except Exception as e:
         st.error(f"Gagal mengambil data dari MongoDB: {str(e)}")
         return None
 
-def get_sensor_history(limit=2000):
+def get_sensor_history(limit=SENSOR_HISTORY_LIMIT):
     try:
-        records = list(collection.find().sort("timestamp", -1).limit(limit))
-        records.reverse()
+        if not st.session_state.box_id:
+            return pd.DataFrame()
 
-        filtered_changes = []
-        last = {}
-        medications_taken = 0
-        previous_ldr = None
-        last_timestamp = None
-        
-        box_config = None
-        if st.session_state.box_id and st.session_state.box_cfg:
+        config_last_updated = None
+        initial_med_count = 0
+        if st.session_state.box_cfg:
             box_config = st.session_state.box_cfg
             last_updated = box_config.get('last_updated')
             initial_med_count = box_config.get('Jumlah_obat', 0)
-            
-            if last_updated:
-                if isinstance(last_updated, datetime):
-                    config_last_updated = last_updated
-                else:
-                    try:
-                        config_last_updated = datetime.fromisoformat(str(last_updated))
-                    except:
-                        config_last_updated = None
-            else:
-                config_last_updated = None
-        else:
-            config_last_updated = None
-            initial_med_count = 0
-        
-        if st.session_state.reset_obat_count:
-            medications_taken = 0
-            st.session_state.reset_obat_count = False
-
-        for record in records:
-            changes = {}
-            for key in ['temperature', 'humidity', 'ldr_value']:
-                current_val = record.get(key)
-                changes[key] = current_val
-                last[key] = current_val
-
-            current_ldr = record.get('ldr_value')
-            
-            if current_ldr >= 1000:
-                changes['status_kotak'] = "TERBUKA 📂"
-            else:
-                changes['status_kotak'] = "TERTUTUP 📁"
-            
-            timestamp = record.get('timestamp')
-            current_timestamp = pd.to_datetime(timestamp) if timestamp else None
-            
-            add_record = False
-            
-            if previous_ldr is None or last_timestamp is None:
-                add_record = True
-            elif (previous_ldr < 1000 and current_ldr >= 1000) or (previous_ldr >= 1000 and current_ldr < 1000):
-                add_record = True
-                if (previous_ldr < 1000 and current_ldr >= 1000 and 
-                    config_last_updated and current_timestamp and 
-                    current_timestamp > config_last_updated):
-                    medications_taken += 1
-            elif current_timestamp and last_timestamp and (current_timestamp - last_timestamp).total_seconds() >= 3600:
-                add_record = True
-            
-            previous_ldr = current_ldr
 
-            if timestamp:
-                adjusted_timestamp = pd.to_datetime(timestamp) + timedelta(hours=7)
-                changes['timestamp'] = adjusted_timestamp
-            else:
-                changes['timestamp'] = None
+            if isinstance(last_updated, datetime):
+                config_last_updated = last_updated
+            elif last_updated:
+                try:
+                    config_last_updated = datetime.fromisoformat(str(last_updated))
+                except ValueError:
+                    config_last_updated = None
 
-            changes['jumlah_obat_awal'] = initial_med_count
-            changes['jumlah_obat_diminum'] = medications_taken
-            changes['jumlah_obat_saat_ini'] = max(0, initial_med_count - medications_taken)
-            
-            if add_record:
-                filtered_changes.append(changes)
-                last_timestamp = current_timestamp
+        if st.session_state.reset_obat_count:
+            st.session_state.reset_obat_count = False
 
-        return pd.DataFrame(filtered_changes)
+        # Hanya data kotak ini setelah last_updated; seed = pembacaan terakhir sebelumnya
+        records, seed = fetch_sensor_records(collection, st.session_state.box_id, config_last_updated, limit)
+        if seed is None:
+            return build_sensor_history(records, config_last_updated, initial_med_count)
+        history = build_sensor_history([seed] + records, config_last_updated, initial_med_count)
+        return history.iloc[1:].reset_index(drop=True)
     except Exception as e:
         st.error(f"Gagal mengambil riwayat sensor: {str(e)}")
         return pd.DataFrame()
     
 def insert_sensor_data(temperature, humidity, ldr_value):
     sensor_data = {
+        "box_id": st.session_state.box_id,
         "temperature": temperature,
         "humidity": humidity,
         "ldr_value": ldr_value,
@@ -0,0 +1,136 @@
+"""Process-wide clients for the Streamlit app.
+
+Streamlit re-executes ``app.py`` on every widget interaction. ``app.py``
+caches one ``MongoResources`` and one ``GeminiResource`` per server
+process with ``st.cache_resource``, so reruns and sessions share the same
+connection pool and model instead of paying TLS and client setup on
+every click. Nothing in here imports Streamlit, so
+``benchmark_app_startup.py`` can time it on its own.
+"""
+import threading
+import time
+
+import certifi
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+MONGO_DATABASE = "SentinelSIC"
+GEMINI_MODEL = "gemini-2.0-flash"
+
+
+class MongoResources:
+    """One ``MongoClient`` plus its collection handles, rebuilt when a health check fails.
+
+    ``ensure()`` runs on every rerun but only pings the server every
+    ``check_interval`` seconds. A failed ping closes the client and
+    connects again; if that fails as well, ``ensure()`` returns False and
+    the next rerun retries.
+    """
+
+    def __init__(self, uri, database=MONGO_DATABASE, check_interval=30.0, client_factory=None):
+        self.uri = uri
+        self.database = database
+        self.check_interval = float(check_interval)
+        self._client_factory = client_factory or self._connect
+        self._client = None
+        self._collections = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+        self.connects = 0
+        self.reconnects = 0
+        self.failed_checks = 0
+
+    def _connect(self):
+        return MongoClient(self.uri, tlsCAFile=certifi.where(), serverSelectionTimeoutMS=5000)
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+                self.connects += 1
+            return self._client
+
+    @property
+    def db(self):
+        return self.client[self.database]
+
+    def collection(self, name):
+        client = self.client
+        with self._lock:
+            handle = self._collections.get(name)
+            if handle is None:
+                handle = self._collections[name] = client[self.database][name]
+            return handle
+
+    def ensure(self) -> bool:
+        """Ping if the last check is older than ``check_interval``; reconnect once on failure."""
+        checked_at = self._checked_at
+        if checked_at is not None and time.monotonic() - checked_at < self.check_interval:
+            return True
+        for attempt in range(2):
+            try:
+                self.client.admin.command("ping")
+            except PyMongoError:
+                self.failed_checks += 1
+                if attempt == 0:
+                    self.reconnect()
+                continue
+            self._checked_at = time.monotonic()
+            return True
+        self._checked_at = None
+        return False
+
+    def reconnect(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+            self._collections = {}
+            self._checked_at = None
+            self.reconnects += 1
+        if client is not None:
+            client.close()
+
+    def stats(self) -> dict:
+        return {"connects": self.connects, "reconnects": self.reconnects, "failed_checks": self.failed_checks}
+
+
+class GeminiResource:
+    """Configured Gemini model, created on first use and rebuilt after a transport failure.
+
+    ``generate_content`` mirrors ``GenerativeModel.generate_content``, so
+    call sites keep using it like the model. An unavailable or timed-out
+    call rebuilds the model once and retries; any other error (quota,
+    blocked prompt) is raised as before.
+    """
+
+    def __init__(self, api_key, model_name=GEMINI_MODEL):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(self.model_name)
+            return self._model
+
+    def reset(self) -> None:
+        with self._lock:
+            self._model = None
+            self.rebuilds += 1
+
+    def generate_content(self, *args, **kwargs):
+        from google.api_core import exceptions as google_exceptions
+
+        try:
+            return self.model.generate_content(*args, **kwargs)
+        except (google_exceptions.ServiceUnavailable, google_exceptions.DeadlineExceeded):
+            self.reset()
+            return self.model.generate_content(*args, **kwargs)
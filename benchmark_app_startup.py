@@ -0,0 +1,81 @@
+"""Startup-latency benchmark: cold vs warm Streamlit reruns.
+
+Usage: python benchmark_app_startup.py [--uri MONGO_URI] [--gemini-key KEY] [--runs 20] [--mongomock]
+
+A cold rerun is what every click used to cost: a new ``MongoClient`` (TLS
+handshake on its first round trip), fresh collection handles and a newly
+configured Gemini model. A warm rerun is what ``app.py`` does now with the
+cached resources: a health check that only pings every ``check_interval``
+seconds, plus handle lookups. ``--mongomock`` measures the code paths
+without a server; the URI defaults to ``$MONGO_URI`` and Gemini is skipped
+without a key (``$GEMINI_API``).
+"""
+import argparse
+import os
+import statistics
+import time
+
+from app_resources import GeminiResource, MongoResources
+
+COLLECTIONS = ("SensorSentinel", "IdUserBox", "MedicineReminders")
+
+
+def rerun(mongo, gemini):
+    mongo.ensure()
+    for name in COLLECTIONS:
+        mongo.collection(name)
+    if gemini is not None:
+        gemini.model
+
+
+def _summary(label, samples):
+    samples = sorted(sample * 1000 for sample in samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<6} mean {statistics.mean(samples):9.3f} ms   p50 {statistics.median(samples):9.3f} ms   "
+          f"p95 {p95:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI"))
+    parser.add_argument("--gemini-key", default=os.environ.get("GEMINI_API"))
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--mongomock", action="store_true")
+    args = parser.parse_args()
+    if not args.uri and not args.mongomock:
+        parser.error("set --uri (or MONGO_URI), or pass --mongomock")
+
+    factory = None
+    if args.mongomock:
+        import mongomock
+
+        factory = mongomock.MongoClient
+
+    def resources():
+        mongo = MongoResources(args.uri, client_factory=factory)
+        gemini = GeminiResource(args.gemini_key) if args.gemini_key else None
+        return mongo, gemini
+
+    cold = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        mongo, gemini = resources()
+        rerun(mongo, gemini)
+        cold.append(time.perf_counter() - started)
+        mongo.client.close()
+
+    mongo, gemini = resources()
+    rerun(mongo, gemini)
+    warm = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        rerun(mongo, gemini)
+        warm.append(time.perf_counter() - started)
+
+    _summary("cold", cold)
+    _summary("warm", warm)
+    print(f"speedup {statistics.mean(cold) / statistics.mean(warm):.0f}x (mean), {mongo.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Micro-benchmark: vectorized sensor history vs the original per-record loop.
+
+Usage: python benchmark_sensor_history.py [--sizes 2000 100000 1000000] [--max-legacy-rows N]
+
+Records are synthetic ``SensorSentinel`` documents (one every 10 seconds,
+timestamps stored as strings like ``get_local_timestamp``), with the lid
+opened a few times a day. Both implementations run on the same records
+and their outputs are compared before timings are reported.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from sensor_history import build_sensor_history
+
+
+def legacy_sensor_history(records, config_last_updated=None, initial_med_count=0, medications_taken=0):
+    """The loop ``get_sensor_history`` used before, minus the Streamlit session handling."""
+    filtered_changes = []
+    previous_ldr = None
+    last_timestamp = None
+    for record in records:
+        changes = {key: record.get(key) for key in ['temperature', 'humidity', 'ldr_value']}
+        current_ldr = record.get('ldr_value')
+        changes['status_kotak'] = "TERBUKA 📂" if current_ldr >= 1000 else "TERTUTUP 📁"
+
+        timestamp = record.get('timestamp')
+        current_timestamp = pd.to_datetime(timestamp) if timestamp else None
+        add_record = False
+        if previous_ldr is None or last_timestamp is None:
+            add_record = True
+        elif (previous_ldr < 1000 and current_ldr >= 1000) or (previous_ldr >= 1000 and current_ldr < 1000):
+            add_record = True
+            if (previous_ldr < 1000 and current_ldr >= 1000 and
+                    config_last_updated and current_timestamp and
+                    current_timestamp > config_last_updated):
+                medications_taken += 1
+        elif current_timestamp and last_timestamp and (current_timestamp - last_timestamp).total_seconds() >= 3600:
+            add_record = True
+        previous_ldr = current_ldr
+
+        changes['timestamp'] = pd.to_datetime(timestamp) + timedelta(hours=7) if timestamp else None
+        changes['jumlah_obat_awal'] = initial_med_count
+        changes['jumlah_obat_diminum'] = medications_taken
+        changes['jumlah_obat_saat_ini'] = max(0, initial_med_count - medications_taken)
+        if add_record:
+            filtered_changes.append(changes)
+            last_timestamp = current_timestamp
+    return pd.DataFrame(filtered_changes)
+
+
+def make_records(count, seed=7):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    records = []
+    open_until = -1
+    for index in range(count):
+        if index > open_until and rng.random() < 1 / 2000:
+            open_until = index + rng.randint(2, 12)
+        records.append({
+            "temperature": round(rng.uniform(24.0, 31.0), 1),
+            "humidity": round(rng.uniform(55.0, 80.0), 1),
+            "ldr_value": rng.randint(1100, 2500) if index <= open_until else rng.randint(50, 600),
+            "timestamp": (start + timedelta(seconds=10 * index)).strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    return records
+
+
+def _time(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 100000, 1000000])
+    parser.add_argument("--max-legacy-rows", type=int, default=100000,
+                        help="skip the original loop above this many rows (it needs ~1 ms per row)")
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'kept':>7} {'loop s':>9} {'vector s':>9} {'speedup':>8}")
+    for size in args.sizes:
+        records = make_records(size)
+        cutoff = datetime.strptime(records[len(records) // 4]["timestamp"], "%Y-%m-%d %H:%M:%S")
+        vectorized, vector_seconds = _time(build_sensor_history, records, cutoff, 30)
+
+        if size > args.max_legacy_rows:
+            print(f"{size:>9} {len(vectorized):>7} {'-':>9} {vector_seconds:>9.3f} {'-':>8}")
+            continue
+        legacy, loop_seconds = _time(legacy_sensor_history, records, cutoff, 30)
+        pd.testing.assert_frame_equal(legacy, vectorized, check_dtype=False)
+        print(f"{size:>9} {len(vectorized):>7} {loop_seconds:>9.3f} {vector_seconds:>9.3f} "
+              f"{loop_seconds / vector_seconds:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
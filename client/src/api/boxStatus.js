@@ -0,0 +1,20 @@
+// Current status of one MediBox, served by GET /api/mediboxes/<box_id>/status
+// (a single keyed read kept up to date by sensor ingestion).
+export const boxStatusEndpoint = (boxId) => `mediboxes/${encodeURIComponent(boxId)}/status`;
+
+export const toBoxStatus = (record) => {
+  if (!record || typeof record !== 'object' || !record.box_id) {
+    return null;
+  }
+  const data = record.latest?.data || {};
+  return {
+    box_id: record.box_id,
+    temperature: typeof data.temperature === 'number' ? data.temperature : null,
+    humidity: typeof data.humidity === 'number' ? data.humidity : null,
+    ldr_value: typeof data.ldr_value === 'number' ? data.ldr_value : null,
+    recorded_at: record.latest?.recorded_at || null,
+    lid_state: record.lid_state || null,
+    pill_count: typeof record.pill_count === 'number' ? record.pill_count : null,
+    last_seen_at: record.last_seen_at || null,
+  };
+};
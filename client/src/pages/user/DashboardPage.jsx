@@ -1,5 +1,7 @@
 import React, { useMemo } from 'react';
 import AdherenceLogs from '../../components/AdherenceLogs.jsx';
+import { boxStatusEndpoint, toBoxStatus } from '../../api/boxStatus';
+import { useAuth } from '../../auth/AuthProvider';
 import useResource from '../../hooks/useResource';
 
 const HUMIDITY_THRESHOLD = 80;
@@ -64,8 +66,22 @@ const DashboardPage = () => {
 		}),
 	});
 
+	const { user } = useAuth();
+	const boxId = dashboardData?.boxStatus?.box_id || user?.box_id || null;
+	const { data: liveStatus } = useResource('boxStatus', boxId ? boxStatusEndpoint(boxId) : '', {
+		auto: Boolean(boxId),
+		transform: (payload) => toBoxStatus(payload),
+		watch: [boxId],
+	});
+
 	const history = dashboardData?.history || [];
-	const boxStatus = dashboardData?.boxStatus || null;
+	const boxStatus = useMemo(() => {
+		const live = liveStatus && liveStatus.box_id === boxId ? liveStatus : null;
+		if (!live) {
+			return dashboardData?.boxStatus || null;
+		}
+		return { ...(dashboardData?.boxStatus || {}), ...live };
+	}, [boxId, dashboardData, liveStatus]);
 	const temperatureTrend = dashboardData?.trend?.temperature || [];
 	const humidityTrend = dashboardData?.trend?.humidity || [];
 
@@ -208,6 +224,18 @@ const DashboardPage = () => {
 								<dt className="uppercase tracking-wide text-xs text-gray-400">Motion</dt>
 								<dd className="mt-1 text-xl font-semibold text-blue-300">{boxStatus.motion ? 'Detected' : 'Stable'}</dd>
 							</div>
+							{boxStatus.lid_state && (
+								<div>
+									<dt className="uppercase tracking-wide text-xs text-gray-400">Lid</dt>
+									<dd className="mt-1 text-xl font-semibold text-blue-300">{boxStatus.lid_state === 'open' ? 'Open' : 'Closed'}</dd>
+								</div>
+							)}
+							{typeof boxStatus.pill_count === 'number' && (
+								<div>
+									<dt className="uppercase tracking-wide text-xs text-gray-400">Pills left</dt>
+									<dd className="mt-1 text-xl font-semibold text-blue-300">{boxStatus.pill_count}</dd>
+								</div>
+							)}
 						</dl>
 						{environmentAlerts.length > 0 && (
 							<ul className="mt-4 space-y-2 text-xs text-red-300">
@@ -6,6 +6,7 @@ import network
 import ntptime
 import urequests as requests
 import json
+import struct
 
 # ========= Hardware Configuration ========= #
 led_pins = [2, 4, 5, 18]
@@ -33,6 +34,23 @@ BACKUP_SERVER = "http://192.168.43.229:8080"
 SERVER_URL = PRIMARY_SERVER
 BOX_ID = "protobox"
 
+# Binary telemetry frame, must match server/utils/telemetry_frame.py
+# magic, version, flags (bit0 = medicine_taken), box_id, temp*100, humidity*100, ldr, seq
+# Opt-in: only enable when SERVER_URL points at a server that decodes frames
+# (the Flask API's /api/send_data); otherwise readings are sent as JSON.
+USE_BINARY_FRAMES = False
+FRAME_FORMAT = "<2sBB16shHHI"
+FRAME_BOX_ID_BYTES = 16
+FRAME_MAGIC = b"MB"
+FRAME_VERSION = 2
+
+# Sequence numbers let the server drop retried readings. The counter is
+# persisted every SEQ_RESERVE values and skips ahead on boot so it never
+# repeats after a restart.
+SEQ_FILE = "seq.txt"
+SEQ_RESERVE = 100
+FRAME_CONTENT_TYPE = "application/vnd.medibox.telemetry"
+
 wifi_client = network.WLAN(network.STA_IF)
 
 # ========= Status Variables ========= #
@@ -75,6 +93,9 @@ sensor_update_interval = 10000
 
 debug_counter = 0
 
+seq_counter = 0
+seq_saved_until = 0
+
 # ========= Functions ========= #
 def connect_wifi():
     wifi_client.active(True)
@@ -466,6 +487,49 @@ def update_display():
             f"Pills taken: {jumlah_obat_diminum}"
         )
 
+def muat_seq():
+    global seq_counter, seq_saved_until
+    try:
+        with open(SEQ_FILE) as f:
+            seq_counter = int(f.read().strip() or "0")
+    except Exception:
+        seq_counter = 0
+    seq_saved_until = seq_counter
+    simpan_seq()
+
+def simpan_seq():
+    global seq_saved_until
+    seq_saved_until = seq_counter + SEQ_RESERVE
+    try:
+        with open(SEQ_FILE, "w") as f:
+            f.write(str(seq_saved_until))
+    except Exception as e:
+        print(f"⚠ Failed to persist seq: {e}")
+
+def seq_berikutnya():
+    global seq_counter
+    seq_counter += 1
+    if seq_counter >= seq_saved_until:
+        simpan_seq()
+    return seq_counter
+
+def buat_frame_sensor(temperature, humidity, ldr_value, medicine_taken, seq):
+    box_id = BOX_ID.encode()
+    if len(box_id) > FRAME_BOX_ID_BYTES:
+        # struct.pack would silently cut it to a different box_id
+        raise ValueError(f"BOX_ID is longer than {FRAME_BOX_ID_BYTES} bytes, use JSON")
+    return struct.pack(
+        FRAME_FORMAT,
+        FRAME_MAGIC,
+        FRAME_VERSION,
+        1 if medicine_taken else 0,
+        box_id,
+        int(temperature * 100),
+        int(humidity * 100),
+        ldr_value,
+        seq
+    )
+
 def kirim_data_ke_server():
     global last_sensor_update
     now = time.ticks_ms()
@@ -487,14 +551,31 @@ def kirim_data_ke_server():
             "humidity": humidity,
             "ldr_value": ldr_value,
             "box_id": BOX_ID,
-            "medicine_taken": jumlah_obat_diminum > 0
+            "medicine_taken": jumlah_obat_diminum > 0,
+            "seq": seq_berikutnya()
         }
         url = f"{SERVER_URL}/send_data"
-        headers = {'Content-Type': 'application/json'}
         print(f"📤 Sending data: {json.dumps(data)}")
-        response = requests.post(url, json=data, headers=headers)
+        if USE_BINARY_FRAMES:
+            frame = buat_frame_sensor(temperature, humidity, ldr_value, data["medicine_taken"], data["seq"])
+        # Retrying is safe: the server drops a repeated seq as a duplicate
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                if USE_BINARY_FRAMES:
+                    headers = {'Content-Type': FRAME_CONTENT_TYPE}
+                    response = requests.post(url, data=frame, headers=headers)
+                else:
+                    headers = {'Content-Type': 'application/json'}
+                    response = requests.post(url, json=data, headers=headers)
+                break
+            except Exception as e:
+                if attempt == max_retries - 1:
+                    raise
+                print(f"⚠ Send failed (attempt {attempt + 1}/{max_retries}): {e}")
+                time.sleep(1)
         print(f"📤 Data sent! Response: {response.status_code}")
-        if response.status_code == 200 and jumlah_obat_diminum > 0:
+        if response.status_code in (200, 201, 202) and jumlah_obat_diminum > 0:
             global obat_diminum
             obat_diminum = [False] * 5
         response.close()
@@ -542,6 +623,7 @@ def check_box_status():
 
 def loop():
     global reminder_active, display_mode, buzzer_active
+    muat_seq()
     connect_wifi()
     tampilkan_oled("MediBox", f"ID: {BOX_ID}", "Starting...", "")
     global reminder_blink_time
@@ -0,0 +1,131 @@
+"""Vectorized sensor history for the Streamlit dashboard.
+
+Pure pandas/numpy (no Streamlit), so the same code backs ``app.py`` and
+``benchmark_sensor_history.py``. Rows are kept exactly as the original
+per-record loop kept them:
+
+* the first reading,
+* every reading where the LDR crosses ``LDR_OPEN_THRESHOLD`` (lid opened
+  or closed),
+* otherwise a reading at least one hour after the last kept reading.
+
+Every lid opening after the config's ``last_updated`` counts as one dose.
+
+``fetch_sensor_records`` reads one box's readings after ``last_updated``
+straight from ``SensorSentinel``, backed by ``ensure_history_indexes``.
+"""
+import numpy as np
+import pandas as pd
+from pymongo import ASCENDING, DESCENDING
+
+LDR_OPEN_THRESHOLD = 1000
+HOURLY_GAP = np.timedelta64(1, "h").astype("timedelta64[ns]").astype(np.int64)
+LOCAL_TIMEZONE = "Asia/Jakarta"  # UTC+7, no DST: the old "+ timedelta(hours=7)"
+SENSOR_FIELDS = ["temperature", "humidity", "ldr_value", "timestamp"]
+HISTORY_PROJECTION = {"_id": 0, **{field: 1 for field in SENSOR_FIELDS}}
+HISTORY_INDEX = [("box_id", ASCENDING), ("timestamp", DESCENDING)]
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"  # get_local_timestamp() in app.py
+STATUS_OPEN = "TERBUKA 📂"
+STATUS_CLOSED = "TERTUTUP 📁"
+
+
+def _utc(value):
+    if value is None:
+        return None
+    stamp = pd.Timestamp(value)
+    return stamp.tz_localize("UTC") if stamp.tzinfo is None else stamp.tz_convert("UTC")
+
+
+def ensure_history_indexes(collection) -> None:
+    collection.create_index(HISTORY_INDEX, name="box_id_timestamp")
+
+
+def _timestamp_bound(operator: str, since) -> list:
+    # app.py stores timestamps as strings, older writers as BSON dates;
+    # each type only compares with its own kind.
+    return [{"timestamp": {operator: since}}, {"timestamp": {operator: since.strftime(TIMESTAMP_FORMAT)}}]
+
+
+def fetch_sensor_records(collection, box_id, since=None, limit=20000):
+    """Newest ``limit`` readings of ``box_id`` after ``since``, oldest first, plus a seed reading.
+
+    The seed is the last reading at or before ``since``: the first reading in
+    the window needs it to tell whether the lid was just opened. It is None
+    without ``since``, when the window was cut by ``limit``, or when the box
+    has no earlier reading.
+    """
+    query = {"box_id": box_id}
+    if since is not None:
+        query["$or"] = _timestamp_bound("$gt", since)
+    records = list(collection.find(query, HISTORY_PROJECTION).sort("timestamp", DESCENDING).limit(limit))
+    records.reverse()
+
+    seed = None
+    if since is not None and len(records) < limit:
+        seed = collection.find_one(
+            {"box_id": box_id, "$or": _timestamp_bound("$lte", since)},
+            HISTORY_PROJECTION,
+            sort=[("timestamp", DESCENDING)],
+        )
+    return records, seed
+
+
+def _kept_rows(stamps: np.ndarray, forced: np.ndarray) -> np.ndarray:
+    """Positions of the kept rows; ``forced`` rows (first row, crossings) are always kept."""
+    missing = stamps == np.iinfo(np.int64).min  # NaT
+    if not missing.any() and (np.diff(stamps) >= 0).all():
+        # Sorted timestamps: between two forced rows, jump straight to the
+        # first row an hour after the last kept one. Work is per kept row.
+        kept = []
+        anchors = np.flatnonzero(forced)
+        for start, stop in zip(anchors, np.append(anchors[1:], len(stamps))):
+            position = start
+            while position < stop:
+                kept.append(position)
+                position = max(int(np.searchsorted(stamps, stamps[position] + HOURLY_GAP)), position + 1)
+        return np.asarray(kept, dtype=np.intp)
+
+    # Unsorted or missing timestamps: the original rule, row by row.
+    kept = []
+    last = None
+    for position, (stamp, is_missing) in enumerate(zip(stamps.tolist(), missing.tolist())):
+        stamp = None if is_missing else stamp
+        if forced[position] or last is None or (stamp is not None and stamp - last >= HOURLY_GAP):
+            kept.append(position)
+            last = stamp
+    return np.asarray(kept, dtype=np.intp)
+
+
+def build_sensor_history(records, config_last_updated=None, initial_med_count=0, medications_taken=0) -> pd.DataFrame:
+    """Filtered sensor history of ``records`` (oldest first) as a DataFrame."""
+    frame = pd.DataFrame.from_records(records, columns=SENSOR_FIELDS)
+    if frame.empty:
+        return pd.DataFrame()
+
+    ldr = pd.to_numeric(frame["ldr_value"], errors="coerce").to_numpy(dtype=float)
+    opened = ldr >= LDR_OPEN_THRESHOLD
+    crossed = np.zeros(len(frame), dtype=bool)
+    crossed[1:] = (opened[1:] != opened[:-1]) & ~np.isnan(ldr[1:]) & ~np.isnan(ldr[:-1])
+
+    timestamps = pd.to_datetime(frame["timestamp"], utc=True, errors="coerce")
+    stamps = timestamps.dt.tz_convert(None).to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+    doses = crossed & opened
+    cutoff = _utc(config_last_updated)
+    if cutoff is None:
+        doses[:] = False
+    else:
+        doses &= (timestamps > cutoff).to_numpy(dtype=bool)
+    taken = medications_taken + np.cumsum(doses)
+
+    forced = crossed.copy()
+    forced[0] = True
+    kept = _kept_rows(stamps, forced)
+
+    history = frame.iloc[kept, :3].reset_index(drop=True)
+    history["status_kotak"] = np.where(opened[kept], STATUS_OPEN, STATUS_CLOSED)
+    history["timestamp"] = timestamps.iloc[kept].dt.tz_convert(LOCAL_TIMEZONE).dt.tz_localize(None).to_numpy()
+    history["jumlah_obat_awal"] = initial_med_count
+    history["jumlah_obat_diminum"] = taken[kept]
+    history["jumlah_obat_saat_ini"] = np.maximum(0, initial_med_count - taken[kept])
+    return history
@@ -6,13 +6,14 @@ load_dotenv()
 
 from flask import Flask, g, jsonify
 from flask_cors import CORS
-from flask_mqtt import Mqtt
 from flask_jwt_extended import JWTManager
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, ConfigurationError
 
 # Import blueprints
 from routes import auth, medibox, reminders, health, medicines, alerts
+from services.medibox_service import MediBoxService
+from services.mqtt_service import MqttService
 from utils.config import Config
 
 app = Flask(__name__)
@@ -41,14 +42,6 @@ CORS(app, resources={
 # Initialize JWT
 jwt = JWTManager(app)
 
-# Initialize MQTT
-try:
-    mqtt = Mqtt(app)
-    print("✅ MQTT initialized")
-except Exception as e:
-    print(f"⚠️ MQTT initialization failed: {e}")
-    mqtt = None
-
 # MongoDB connection
 def _connect(uri: str, db_name: str | None):
     """Connect to MongoDB"""
@@ -90,6 +83,17 @@ app.config["MONGO_DB_NAME"] = db.name
 app.config["MONGO_DB"] = db
 app.config["MONGO_URI_ACTIVE"] = active_uri
 
+# Shared sensor ingestion service (HTTP routes + MQTT)
+medibox_service = MediBoxService.from_config(db, app.config)
+if medibox_service.presence is not None:
+    medibox_service.presence.start()
+if medibox_service.journal_replayer is not None:
+    medibox_service.journal_replayer.start()
+    print(f"✅ Ingest journal: {medibox_service.journal.directory}")
+if medibox_service.retention is not None:
+    medibox_service.retention.start()
+    print(f"✅ Sensor retention: {medibox_service.retention.hot_days} hot days → {medibox_service.archive.directory}")
+
 # Register blueprints
 print("\n📋 Registering blueprints...")
 
@@ -99,12 +103,12 @@ try:
     print(f"  ✅ {auth.bp.name:15s} → {auth.bp.url_prefix or '/'}")
     
     # Medibox blueprint
-    medibox_bp = medibox.create_medibox_blueprint(db)
+    medibox_bp = medibox.create_medibox_blueprint(db, app.config, medibox_service=medibox_service)
     app.register_blueprint(medibox_bp)
     print(f"  ✅ {medibox_bp.name:15s} → {medibox_bp.url_prefix or '/'}")
     
     # Reminders blueprint
-    reminders_bp = reminders.create_reminder_blueprint(db)
+    reminders_bp = reminders.create_reminder_blueprint(db, app.config)
     app.register_blueprint(reminders_bp)
     print(f"  ✅ {reminders_bp.name:15s} → {reminders_bp.url_prefix or '/'}")
     
@@ -126,6 +130,16 @@ except Exception as e:
     print(f"❌ Blueprint registration failed: {e}")
     raise
 
+# Initialize MQTT (after the medibox blueprint: with INGEST_WORKERS, MQTT
+# readings go through the same worker pool as the HTTP routes)
+try:
+    mqtt_service = MqttService(app, medibox_service=medibox_service, ingest_pool=medibox_bp.ingest_pool)
+    mqtt = mqtt_service.mqtt
+    print("✅ MQTT initialized")
+except Exception as e:
+    print(f"⚠️ MQTT initialization failed: {e}")
+    mqtt = None
+
 # Root routes
 @app.route('/')
 def index():
@@ -1,11 +1,58 @@
-from flask import Blueprint, request, jsonify
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from services.exporter import FORMATS, DataExporter
+from services.ingest_workers import ShardedIngestPool, connect_database
 from services.medibox_service import MediBoxService
+from services.sensor_buffer import BufferFullError, SensorWriteBuffer
+from utils.rate_limit import TokenBucketLimiter, throttle_response
+from utils.telemetry_frame import decode_frames, is_binary_request, split_frames_by_box
 
 
-def create_medibox_blueprint(db):
+def create_medibox_blueprint(db, config=None, medibox_service=None, ingest_pool=None):
+    config = config or {}
     medibox_bp = Blueprint('medibox', __name__)
-    medibox_service = MediBoxService(db)
+
+    medibox_service = medibox_service or MediBoxService.from_config(db, config)
+    lid_detector = medibox_service.lid_detector
+    deadband = medibox_service.deadband
+
+    sensor_buffer = None
+    if config.get('SENSOR_BUFFER_ENABLED'):
+        sensor_buffer = SensorWriteBuffer(
+            medibox_service.persist_sensor_payloads,
+            max_size=config.get('SENSOR_BUFFER_MAX_SIZE', 10000),
+            flush_size=config.get('SENSOR_BUFFER_FLUSH_SIZE', 500),
+            flush_interval=config.get('SENSOR_BUFFER_FLUSH_INTERVAL', 1.0),
+            policy=config.get('SENSOR_BUFFER_POLICY', 'block'),
+            block_timeout=config.get('SENSOR_BUFFER_BLOCK_TIMEOUT', 1.0),
+            overflow_fn=medibox_service.journal.append if medibox_service.journal is not None else None,
+        ).start()
+    medibox_bp.sensor_buffer = sensor_buffer
+
+    if ingest_pool is None and config.get('INGEST_WORKERS'):
+        ingest_pool = ShardedIngestPool(
+            config['INGEST_WORKERS'],
+            connect_database,
+            (config.get('MONGO_URI_ACTIVE') or config.get('MONGO_URI'), config.get('MONGO_DB_NAME')),
+            config=config,
+            queue_size=config.get('INGEST_WORKER_QUEUE_SIZE', 10000),
+            batch_size=config.get('INGEST_WORKER_BATCH_SIZE', 200),
+        ).start()
+    medibox_bp.ingest_pool = ingest_pool
+
+    exporter = DataExporter(medibox_service, batch_rows=config.get('EXPORT_BATCH_SIZE', 5000))
+    exporter.ensure_indexes()
+
+    sensor_limiter = TokenBucketLimiter.from_config(db, config, 'sensor')
+    intake_limiter = TokenBucketLimiter.from_config(db, config, 'intake')
+
+    @medibox_bp.record_once
+    def _register_rate_limiters(state):
+        limiters = state.app.extensions.setdefault('medibox_rate_limits', {})
+        limiters.update({'sensor': sensor_limiter, 'intake': intake_limiter})
 
     def _optional_identity():
         try:
@@ -14,6 +61,88 @@ def create_medibox_blueprint(db):
         except Exception:
             return None
 
+    def _parse_datetime_arg(name):
+        value = request.args.get(name)
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError as exc:
+            raise ValueError(f'{name} must be an ISO-8601 timestamp') from exc
+
+    def _ingest_batch(readings):
+        max_size = current_app.config.get('SENSOR_BATCH_MAX_SIZE', 500)
+        if len(readings) > max_size:
+            return jsonify({'message': f'batch exceeds {max_size} readings'}), 413
+        if ingest_pool is not None:
+            return _submit_batch_to_workers(readings)
+
+        results = medibox_service.record_sensor_batch(readings)
+        rejected = sum(1 for item in results if item['status'] == 'rejected')
+        suppressed = sum(1 for item in results if item['status'] == 'suppressed')
+        return jsonify({
+            'accepted': len(results) - rejected - suppressed,
+            'suppressed': suppressed,
+            'rejected': rejected,
+            'results': results,
+        }), 207 if rejected else 201
+
+    def _submit_to_workers(box_id):
+        body = request.get_data(cache=False)
+        try:
+            if is_binary_request(request.content_type):
+                groups = split_frames_by_box(body)
+            else:
+                if not box_id:
+                    # Only the legacy route needs a parse here; devices posting
+                    # to /api/mediboxes/<box_id>/sensor are routed unread.
+                    payload = json.loads(body or b'{}')
+                    box_id = payload.get('box_id') if isinstance(payload, dict) else None
+                if not box_id:
+                    raise ValueError('box_id is required')
+                groups = {box_id: body}
+        except ValueError as exc:
+            return jsonify({'message': str(exc)}), 400
+
+        groups = [(group_box_id or box_id, group) for group_box_id, group in groups.items()]
+        if not _routable(groups):
+            return jsonify({'message': 'box_id is required'}), 400
+        for key, _ in groups:
+            throttled = throttle_response(sensor_limiter, key)
+            if throttled is not None:
+                return throttled
+        return _queue_on_workers(groups)
+
+    def _routable(groups):
+        # Workers are picked by hashing the box_id, so every group needs one.
+        return all(isinstance(key, str) and key for key, _ in groups)
+
+    def _queue_on_workers(groups, extra=None):
+        """Hand ``(box_id, body)`` pairs to the owning workers and answer 202."""
+        try:
+            for key, group in groups:
+                ingest_pool.submit(key, group)
+        except BufferFullError as exc:
+            response = jsonify({'message': str(exc)})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        return jsonify({'status': 'queued', 'box_ids': [key for key, _ in groups], **(extra or {})}), 202
+
+    def _submit_batch_to_workers(readings):
+        # Group by box so each box's readings go to the worker that owns it,
+        # in order; invalid items are rejected here like record_sensor_batch does.
+        groups, rejected = {}, []
+        for index, item in enumerate(readings):
+            box_id = item.get('box_id') if isinstance(item, dict) else None
+            if not isinstance(box_id, str) or not box_id:
+                rejected.append({'index': index, 'status': 'rejected', 'error': 'box_id is required'})
+                continue
+            groups.setdefault(box_id, []).append(item)
+        return _queue_on_workers(
+            [(box_id, json.dumps(group).encode()) for box_id, group in groups.items()],
+            {'rejected': len(rejected), 'results': rejected},
+        )
+
     @medibox_bp.route('/api/mediboxes/register', methods=['POST'])
     @medibox_bp.route('/api/register_box', methods=['POST'])
     def register_box():
@@ -57,28 +186,294 @@ def create_medibox_blueprint(db):
     @medibox_bp.route('/api/mediboxes/<box_id>/sensor', methods=['POST'])
     @medibox_bp.route('/api/send_data', methods=['POST'])
     def send_data(box_id=None):
+        if ingest_pool is not None:
+            return _submit_to_workers(box_id)
+
+        if is_binary_request(request.content_type):
+            try:
+                readings = decode_frames(request.get_data(cache=False))
+            except ValueError as exc:
+                return jsonify({'message': str(exc)}), 400
+            for reading in readings:
+                reading['box_id'] = reading['box_id'] or box_id
+            if len(readings) > 1:
+                throttled = throttle_response(sensor_limiter, box_id or readings[0]['box_id'])
+                if throttled is not None:
+                    return throttled
+                return _ingest_batch(readings)
+            payload = readings[0]
+        else:
+            payload = request.get_json() or {}
+
+        box_id = box_id or payload.get('box_id')
+        throttled = throttle_response(sensor_limiter, box_id)
+        if throttled is not None:
+            return throttled
+
+        sensor_data = payload.get('sensor_data') or payload
+        try:
+            if sensor_buffer is not None:
+                sensor_buffer.submit(medibox_service.build_sensor_payload(box_id, sensor_data))
+                return jsonify({'status': 'queued', 'box_id': box_id}), 202
+
+            record = medibox_service.record_sensor_data(box_id=box_id, sensor_data=sensor_data)
+            if record.get('journaled'):
+                return jsonify(record), 202
+            return jsonify(record), 200 if record.get('duplicate') else 201
+        except ValueError as exc:
+            return jsonify({'message': str(exc)}), 400
+        except BufferFullError as exc:
+            response = jsonify({'message': str(exc)})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+
+    @medibox_bp.route('/api/mediboxes/<box_id>/sensor', methods=['GET'])
+    def list_sensor_readings(box_id):
+        fields = request.args.get('fields')
+        order = request.args.get('order', 'desc').lower()
+        if order not in {'asc', 'desc'}:
+            return jsonify({'message': 'order must be asc or desc'}), 400
+        try:
+            page = medibox_service.page_sensor_readings(
+                box_id,
+                start=_parse_datetime_arg('from'),
+                end=_parse_datetime_arg('to'),
+                fields=[field.strip() for field in fields.split(',') if field.strip()] if fields else None,
+                limit=request.args.get('limit', default=200, type=int),
+                cursor=request.args.get('cursor'),
+                descending=order == 'desc',
+            )
+        except ValueError as exc:
+            return jsonify({'message': str(exc)}), 400
+        return jsonify(page), 200
+
+    @medibox_bp.route('/api/mediboxes/<box_id>/sensor/history', methods=['GET'])
+    def get_sensor_history(box_id):
+        try:
+            history = medibox_service.query_sensor_history(
+                box_id,
+                start=_parse_datetime_arg('from'),
+                end=_parse_datetime_arg('to'),
+                max_points=request.args.get('max_points', default=500, type=int),
+            )
+        except ValueError as exc:
+            return jsonify({'message': str(exc)}), 400
+        return jsonify(history), 200
+
+    @medibox_bp.route('/api/mediboxes/<box_id>/sensor/recent', methods=['GET'])
+    def get_recent_sensor_readings(box_id):
+        try:
+            recent = medibox_service.recent_sensor_readings(
+                box_id,
+                hours=request.args.get('hours', default=24, type=float),
+            )
+        except ValueError as exc:
+            return jsonify({'message': str(exc)}), 400
+        return jsonify(recent), 200
+
+    @medibox_bp.route('/api/mediboxes/<box_id>/sensor/latest', methods=['GET'])
+    def get_latest_sensor_reading(box_id):
+        latest = medibox_service.latest_sensor_reading(box_id)
+        if latest is None:
+            return jsonify({'message': 'No sensor data for this box'}), 404
+        return jsonify(latest), 200
+
+    @medibox_bp.route('/api/mediboxes/<box_id>/percentiles', methods=['GET'])
+    def get_sensor_percentiles(box_id):
+        try:
+            quantiles = [float(q) for q in request.args.get('q', '0.5,0.95,0.99').split(',') if q.strip()]
+            result = medibox_service.sensor_percentiles(
+                box_id,
+                request.args.get('metric', 'temperature'),
+                quantiles,
+                start=_parse_datetime_arg('from'),
+                end=_parse_datetime_arg('to'),
+            )
+        except RuntimeError as exc:
+            return jsonify({'message': str(exc)}), 409
+        except ValueError as exc:
+            return jsonify({'message': str(exc)}), 400
+        return jsonify(result), 200
+
+    @medibox_bp.route('/api/mediboxes/<box_id>/rollups', methods=['GET'])
+    def list_sensor_rollups(box_id):
+        try:
+            rollups = medibox_service.list_sensor_rollups(
+                box_id,
+                request.args.get('resolution', 'hour'),
+                start=_parse_datetime_arg('from'),
+                end=_parse_datetime_arg('to'),
+            )
+        except RuntimeError as exc:
+            return jsonify({'message': str(exc)}), 409
+        except ValueError as exc:
+            return jsonify({'message': str(exc)}), 400
+        return jsonify(rollups), 200
+
+    @medibox_bp.route('/api/mediboxes/sensor/batch', methods=['POST'])
+    @medibox_bp.route('/api/send_data_batch', methods=['POST'])
+    def send_data_batch():
+        if ingest_pool is not None and is_binary_request(request.content_type):
+            try:
+                groups = split_frames_by_box(request.get_data(cache=False))
+            except ValueError as exc:
+                return jsonify({'message': str(exc)}), 400
+            groups = list(groups.items())
+            if not _routable(groups):
+                return jsonify({'message': 'box_id is required'}), 400
+            return _queue_on_workers(groups)
+        if is_binary_request(request.content_type):
+            try:
+                readings = decode_frames(request.get_data(cache=False))
+            except ValueError as exc:
+                return jsonify({'message': str(exc)}), 400
+        else:
+            payload = request.get_json() or {}
+            readings = payload.get('readings') if isinstance(payload, dict) else payload
+            if not isinstance(readings, list) or not readings:
+                return jsonify({'message': 'readings must be a non-empty list'}), 400
+
+        return _ingest_batch(readings)
+
+    @medibox_bp.route('/api/ingest/stats', methods=['GET'])
+    def ingest_stats():
+        mqtt_service = current_app.extensions.get('medibox_mqtt')
+        rate_limits = current_app.extensions.get('medibox_rate_limits', {})
+        replayer = medibox_service.journal_replayer
+        return jsonify({
+            'sensor_buffer': sensor_buffer.stats() if sensor_buffer is not None else None,
+            'deadband': deadband.stats() if deadband is not None else None,
+            'mqtt': mqtt_service.stats() if mqtt_service is not None else None,
+            'sequences': {
+                'sensor': medibox_service.sensor_sequences.stats(),
+                'intake': medibox_service.intake_sequences.stats(),
+            } if medibox_service.sensor_sequences is not None else None,
+            'presence': medibox_service.presence.stats() if medibox_service.presence is not None else None,
+            'workers': ingest_pool.stats() if ingest_pool is not None else None,
+            'retention': medibox_service.retention.stats() if medibox_service.retention is not None else None,
+            'series_cache': medibox_service.series_cache.stats() if medibox_service.series_cache is not None else None,
+            'recent_window': medibox_service.recent_window.stats() if medibox_service.recent_window is not None else None,
+            'box_status': medibox_service.status.stats() if medibox_service.status is not None else None,
+            'journal': {
+                **medibox_service.journal.stats(),
+                'replay': replayer.stats() if replayer is not None else None,
+            } if medibox_service.journal is not None else None,
+            'rate_limits': {
+                name: limiter.stats() for name, limiter in rate_limits.items() if limiter is not None
+            },
+        }), 200
+
+    @medibox_bp.route('/api/exports/<dataset>', methods=['GET'])
+    def export_dataset(dataset):
+        fmt = request.args.get('format', 'arrow')
+        try:
+            chunks = exporter.stream(
+                dataset,
+                fmt,
+                box_id=request.args.get('box_id'),
+                start=_parse_datetime_arg('from'),
+                end=_parse_datetime_arg('to'),
+            )
+        except RuntimeError as exc:
+            return jsonify({'message': str(exc)}), 409
+        except ValueError as exc:
+            return jsonify({'message': str(exc)}), 400
+        mimetype, extension = FORMATS[fmt]
+        return Response(
+            chunks,
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={dataset}.{extension}'},
+        )
+
+    @medibox_bp.route('/api/mediboxes/silent', methods=['GET'])
+    def list_silent_boxes():
+        try:
+            boxes = medibox_service.list_silent_boxes(request.args.get('minutes', default=30, type=int))
+        except RuntimeError as exc:
+            return jsonify({'message': str(exc)}), 409
+        except ValueError as exc:
+            return jsonify({'message': str(exc)}), 400
+        return jsonify(boxes), 200
+
+    @medibox_bp.route('/api/mediboxes/<box_id>/status', methods=['GET'])
+    def get_box_status(box_id):
+        try:
+            status = medibox_service.get_box_status(box_id)
+        except RuntimeError as exc:
+            return jsonify({'message': str(exc)}), 409
+        except ValueError as exc:
+            return jsonify({'message': str(exc)}), 400
+        if status is None:
+            return jsonify({'message': 'No status recorded for this box'}), 404
+        return jsonify(status), 200
+
+    @medibox_bp.route('/api/mediboxes/<box_id>/events', methods=['GET'])
+    def list_box_events(box_id):
+        try:
+            events = medibox_service.list_box_events(
+                box_id,
+                since=_parse_datetime_arg('since'),
+                event_type=request.args.get('type'),
+                limit=request.args.get('limit', default=50, type=int),
+            )
+        except ValueError as exc:
+            return jsonify({'message': str(exc)}), 400
+        return jsonify(events), 200
+
+    @medibox_bp.route('/api/mediboxes/<box_id>/lid-settings', methods=['PUT'])
+    def update_lid_settings(box_id):
+        if lid_detector is None:
+            return jsonify({'message': 'Lid event detection is disabled'}), 409
         payload = request.get_json() or {}
         try:
-            record = medibox_service.record_sensor_data(
-                box_id=box_id or payload.get('box_id'),
-                sensor_data=payload.get('sensor_data') or payload,
+            settings = lid_detector.configure(
+                box_id,
+                threshold=payload.get('threshold'),
+                hysteresis=payload.get('hysteresis'),
             )
-            return jsonify(record), 201
+        except (TypeError, ValueError):
+            return jsonify({'message': 'threshold and hysteresis must be integers'}), 400
+        return jsonify(settings), 200
+
+    @medibox_bp.route('/api/mediboxes/<box_id>/inventory', methods=['GET'])
+    def get_inventory(box_id):
+        try:
+            record = medibox_service.get_inventory(box_id, at=_parse_datetime_arg('at'))
+        except ValueError as exc:
+            return jsonify({'message': str(exc)}), 400
+        if not record:
+            return jsonify({'message': 'Inventory not found'}), 404
+        return jsonify(record), 200
+
+    @medibox_bp.route('/api/mediboxes/<box_id>/inventory', methods=['PUT'])
+    def refill_inventory(box_id):
+        payload = request.get_json() or {}
+        try:
+            record = medibox_service.refill_inventory(box_id, payload.get('count'))
         except ValueError as exc:
             return jsonify({'message': str(exc)}), 400
+        return jsonify(record), 200
 
     @medibox_bp.route('/api/intake/logs', methods=['POST'])
     @medibox_bp.route('/api/log_intake', methods=['POST'])
     def log_intake():
         payload = request.get_json() or {}
+        throttled = throttle_response(intake_limiter, payload.get('box_id'))
+        if throttled is not None:
+            return throttled
+
         user_id = payload.get('user_id') or _optional_identity()
-        entry = medibox_service.log_intake(
-            medicine_id=payload.get('medicineId') or payload.get('medicine_id'),
-            confirmed=payload.get('confirmed', True),
-            user_id=user_id,
-            box_id=payload.get('box_id'),
-        )
-        return jsonify(entry), 201
+        try:
+            entry = medibox_service.log_intake(
+                medicine_id=payload.get('medicineId') or payload.get('medicine_id'),
+                confirmed=payload.get('confirmed', True),
+                user_id=user_id,
+                box_id=payload.get('box_id'),
+                seq=payload.get('seq'),
+            )
+        except ValueError as exc:
+            return jsonify({'message': str(exc)}), 400
+        return jsonify(entry), 200 if entry.get('duplicate') else 201
 
     @medibox_bp.route('/api/adherence/logs', methods=['GET'])
     @medibox_bp.route('/api/get_adherence_logs', methods=['GET'])
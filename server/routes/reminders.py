@@ -1,12 +1,20 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 from services.reminder_service import ReminderService
+from utils.rate_limit import TokenBucketLimiter, throttle_response
 
 
-def create_reminder_blueprint(db):
+def create_reminder_blueprint(db, config=None):
     reminder_bp = Blueprint('reminder', __name__)
     reminder_service = ReminderService(db)
 
+    # Boxes poll their reminders by box_id; user-facing listings are not limited.
+    poll_limiter = TokenBucketLimiter.from_config(db, config, 'reminder')
+
+    @reminder_bp.record_once
+    def _register_rate_limiter(state):
+        state.app.extensions.setdefault('medibox_rate_limits', {})['reminder'] = poll_limiter
+
     def _get_optional_identity():
         try:
             verify_jwt_in_request(optional=True)
@@ -21,6 +29,10 @@ def create_reminder_blueprint(db):
         user_id = request.args.get('user_id')
         box_id = request.args.get('box_id')
 
+        throttled = throttle_response(poll_limiter, box_id)
+        if throttled is not None:
+            return throttled
+
         if not user_id and scope in {'active', 'household', 'user'}:
             user_id = _get_optional_identity()
 
@@ -0,0 +1,49 @@
+"""Move sensor readings older than SENSOR_RETENTION_DAYS into the on-disk archive.
+
+The API process does this hourly on its own; run it by hand (from the
+server directory) to archive right away or with a different window:
+    python -m scripts.apply_retention --days 30 [--box MEDIBOX001]
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services.archive import SensorArchive  # noqa  # pylint: disable=wrong-import-position
+from services.retention import SensorRetention  # noqa  # pylint: disable=wrong-import-position
+from utils.config import Config  # noqa  # pylint: disable=wrong-import-position
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=Config.SENSOR_RETENTION_DAYS, help="days of raw data to keep")
+    parser.add_argument("--box", action="append", dest="boxes", help="box_id to archive (repeatable)")
+    parser.add_argument("--archive-dir", default=Config.SENSOR_ARCHIVE_DIR)
+    args = parser.parse_args()
+    if args.days < 1:
+        parser.error("set --days or SENSOR_RETENTION_DAYS to at least 1")
+    if Config.SENSOR_STORAGE_MODE != "documents":
+        parser.error("retention only applies to SENSOR_STORAGE_MODE=documents")
+
+    client = MongoClient(Config.MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client[Config.MONGO_DB] if Config.MONGO_DB else client.get_default_database()
+    archive = SensorArchive(args.archive_dir)
+    retention = SensorRetention(db["sensor_logs"], archive, hot_days=args.days)
+
+    moved = retention.run(box_ids=args.boxes)
+    stats = archive.stats()
+    print(f"archived {moved} readings before {retention.cutoff():%Y-%m-%d}; "
+          f"archive holds {stats['blocks']} blocks, {stats['bytes'] / (1024 * 1024):.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Rebuild sensor rollups (minute/hour/day) from raw sensor data.
+
+Run from the server directory; without --box every box with readings is
+rebuilt, and --from/--to (ISO dates) limit the rebuild to whole days:
+    python -m scripts.backfill_rollups --box MEDIBOX001 --from 2024-03-01
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services.medibox_service import STORAGE_BUCKETS, MediBoxService  # noqa  # pylint: disable=wrong-import-position
+from services.rollups import SensorRollupService  # noqa  # pylint: disable=wrong-import-position
+from utils.config import Config  # noqa  # pylint: disable=wrong-import-position
+
+
+def parse_date(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--box", action="append", dest="boxes", help="box_id to rebuild (repeatable)")
+    parser.add_argument("--from", dest="start", type=parse_date)
+    parser.add_argument("--to", dest="end", type=parse_date)
+    args = parser.parse_args()
+
+    client = MongoClient(Config.MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client[Config.MONGO_DB] if Config.MONGO_DB else client.get_default_database()
+    service = MediBoxService(db, storage_mode=Config.SENSOR_STORAGE_MODE)
+    rollups = SensorRollupService(db, minute_retention_days=Config.ROLLUP_MINUTE_RETENTION_DAYS)
+    rollups.ensure_indexes()
+
+    source = db["sensor_buckets"] if service.storage_mode == STORAGE_BUCKETS else db["sensor_logs"]
+    box_ids = args.boxes or sorted(source.distinct("box_id"))
+    for box_id in box_ids:
+        count = rollups.backfill(box_id, service.iter_sensor_readings, args.start, args.end)
+        print(f"{box_id}: folded {count} readings")
+
+
+if __name__ == "__main__":
+    main()
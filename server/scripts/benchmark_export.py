@@ -0,0 +1,77 @@
+"""Measure columnar export throughput and peak memory.
+
+Seeds synthetic sensor readings, then exports them through the same
+``DataExporter`` the ``/api/exports`` endpoint uses:
+    python -m scripts.benchmark_export --records 500000 --format parquet --batch-size 10000
+
+By default the source is the configured MongoDB (use a scratch database);
+``--mongomock`` runs against an in-memory database instead. Peak memory is
+traced with ``tracemalloc`` and should stay near one batch whatever
+``--records`` is. Requires pyarrow.
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import time
+import tracemalloc
+
+from dotenv import load_dotenv
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts.benchmark_journal_replay import get_database, synthetic_payloads  # noqa  # pylint: disable=wrong-import-position
+from services.exporter import FORMATS, DataExporter  # noqa  # pylint: disable=wrong-import-position
+from services.medibox_service import MediBoxService  # noqa  # pylint: disable=wrong-import-position
+
+
+class CountingSink:
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--boxes", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--format", dest="fmt", choices=sorted(FORMATS), default="arrow")
+    parser.add_argument("--db", default="medibox_export_bench")
+    parser.add_argument("--mongomock", action="store_true")
+    args = parser.parse_args()
+
+    db = get_database(args.mongomock, args.db)
+    db["sensor_logs"].delete_many({"box_id": {"$regex": "^bench-"}})
+    pending = []
+    for payload in synthetic_payloads(args.records, args.boxes):
+        pending.append(payload)
+        if len(pending) >= 10000:
+            db["sensor_logs"].insert_many(pending)
+            pending = []
+    if pending:
+        db["sensor_logs"].insert_many(pending)
+
+    exporter = DataExporter(MediBoxService(db), batch_rows=args.batch_size)
+    sink = CountingSink()
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = exporter.write(sink, "sensor", args.fmt)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"rows              {rows}")
+    print(f"output            {sink.size / (1024 * 1024):.1f} MiB ({args.fmt})")
+    print(f"throughput        {rows / elapsed:,.0f} rows/s ({elapsed:.2f}s, batch {args.batch_size})")
+    print(f"peak python heap  {peak / (1024 * 1024):.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
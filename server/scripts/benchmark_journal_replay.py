@@ -0,0 +1,102 @@
+"""Measure ingest-journal append and replay throughput.
+
+Writes synthetic sensor readings to a temporary journal, then replays them
+into ``sensor_logs`` the same way the background replayer does:
+    python -m scripts.benchmark_journal_replay --records 200000 --batch-size 1000
+
+By default the replay target is the configured MongoDB (use a scratch
+database); ``--mongomock`` runs against an in-memory database instead, which
+measures the journal itself rather than the server.
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services.ingest_journal import IngestJournal, JournalReplayer  # noqa  # pylint: disable=wrong-import-position
+from services.medibox_service import MediBoxService  # noqa  # pylint: disable=wrong-import-position
+from utils.config import Config  # noqa  # pylint: disable=wrong-import-position
+
+
+def get_database(use_mongomock: bool, db_name: str):
+    if use_mongomock:
+        import mongomock
+
+        return mongomock.MongoClient()[db_name]
+
+    from pymongo import MongoClient
+
+    client = MongoClient(Config.MONGO_URI, serverSelectionTimeoutMS=5000)
+    return client[db_name]
+
+
+def synthetic_payloads(count: int, boxes: int):
+    start = datetime.utcnow() - timedelta(seconds=count)
+    for index in range(count):
+        yield {
+            "box_id": f"bench-{index % boxes:05d}",
+            "data": {
+                "temperature": 25 + (index % 50) / 10,
+                "humidity": 60 + (index % 30) / 10,
+                "ldr_value": 300 + index % 900,
+                "medicine_taken": False,
+            },
+            "recorded_at": start + timedelta(seconds=index),
+        }
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--boxes", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--append-batch", type=int, default=1, help="payloads per journal append call")
+    parser.add_argument("--db", default="medibox_journal_bench")
+    parser.add_argument("--mongomock", action="store_true")
+    args = parser.parse_args()
+
+    db = get_database(args.mongomock, args.db)
+    db["sensor_logs"].delete_many({"box_id": {"$regex": "^bench-"}})
+    service = MediBoxService(db)
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = IngestJournal(directory)
+        pending = []
+        started = time.perf_counter()
+        for payload in synthetic_payloads(args.records, args.boxes):
+            pending.append(payload)
+            if len(pending) >= args.append_batch:
+                journal.append(pending)
+                pending = []
+        journal.append(pending)
+        append_seconds = time.perf_counter() - started
+        size_mb = journal.pending_bytes() / (1024 * 1024)
+
+        replayer = JournalReplayer(journal, service.replay_sensor_payloads, batch_size=args.batch_size)
+        started = time.perf_counter()
+        replayed = replayer.replay()
+        replay_seconds = time.perf_counter() - started
+        journal.close()
+
+    stored = db["sensor_logs"].count_documents({"box_id": {"$regex": "^bench-"}})
+    print(f"records           {args.records}")
+    print(f"journal size      {size_mb:.1f} MiB")
+    print(f"append            {args.records / append_seconds:,.0f} records/s ({append_seconds:.2f}s)")
+    print(f"replay            {replayed / replay_seconds:,.0f} records/s ({replay_seconds:.2f}s, "
+          f"batch {args.batch_size})")
+    print(f"sensor_logs rows  {stored}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Export raw sensor or intake data as Arrow IPC or Parquet.
+
+Run from the server directory; --box and --from/--to (ISO dates) narrow the
+export, otherwise every box is written, box by box:
+    python -m scripts.export_data sensor sensor.parquet --format parquet --box MEDIBOX001
+
+Requires pyarrow (``pip install pyarrow``).
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services.exporter import DATASETS, FORMATS, DataExporter  # noqa  # pylint: disable=wrong-import-position
+from services.medibox_service import MediBoxService  # noqa  # pylint: disable=wrong-import-position
+from utils.config import Config  # noqa  # pylint: disable=wrong-import-position
+
+
+def parse_date(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("output", help="file to write")
+    parser.add_argument("--format", dest="fmt", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--box", dest="box_id")
+    parser.add_argument("--from", dest="start", type=parse_date)
+    parser.add_argument("--to", dest="end", type=parse_date)
+    parser.add_argument("--batch-size", type=int, default=Config.EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    client = MongoClient(Config.MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client[Config.MONGO_DB] if Config.MONGO_DB else client.get_default_database()
+    exporter = DataExporter(MediBoxService(db, storage_mode=Config.SENSOR_STORAGE_MODE), batch_rows=args.batch_size)
+
+    started = time.perf_counter()
+    with open(args.output, "wb") as sink:
+        rows = exporter.write(sink, args.dataset, args.fmt, box_id=args.box_id, start=args.start, end=args.end)
+    elapsed = time.perf_counter() - started
+    print(f"wrote {rows} rows to {args.output} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
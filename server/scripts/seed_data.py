@@ -10,7 +10,7 @@ import sys
 from datetime import datetime, timedelta
 
 from dotenv import load_dotenv
-from pymongo import ASCENDING, MongoClient
+from pymongo import ASCENDING, DESCENDING, MongoClient
 from pymongo.errors import ConfigurationError, ServerSelectionTimeoutError
 from werkzeug.security import generate_password_hash
 
@@ -26,8 +26,17 @@ COLLECTIONS = {
     "mediboxes": "Links box IDs to users and metadata.",
     "reminders": "Stores reminder schedules for each box/user.",
     "sensor_logs": "Historical readings from ESP32 sensors.",
+    "sensor_buckets": "Hour-bucketed sensor readings (SENSOR_STORAGE_MODE=buckets).",
+    "sensor_rollups": "Minute/hour/day min/max/mean/count per box, updated at ingest.",
+    "sensor_sketches": "Hourly t-digest quantile sketches per box (temperature, humidity, LDR).",
+    "box_status": "Current status per box (_id = box_id): latest reading, lid state, pill count, last seen.",
+    "box_events": "Lid open/close transitions detected at ingest.",
+    "box_inventory": "Materialized pill count per box.",
+    "inventory_changes": "Append-only log of pill count changes.",
+    "inventory_snapshots": "Periodic copies of box_inventory for point-in-time reads.",
     "intake_logs": "Tracks when medicine was taken or skipped.",
     "refill_requests": "Requests for medicine refills.",
+    "rate_limits": "Per-box rate limiter state (RATE_LIMIT_SHARED=1).",
     "medicines": "Pharmacist-managed medicine catalogue.",
     "health_reports": "AI-generated adherence insights.",
 }
@@ -214,8 +223,31 @@ def ensure_indexes(db):
     db["reminders"].create_index([("box_id", ASCENDING), ("reminder_time", ASCENDING)])
     db["sensor_logs"].create_index("box_id")
     db["sensor_logs"].create_index("recorded_at")
+    db["sensor_logs"].create_index([("box_id", ASCENDING), ("recorded_at", DESCENDING), ("_id", DESCENDING)])
+    db["sensor_logs"].create_index(
+        [("box_id", ASCENDING), ("seq", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"seq": {"$exists": True}},
+    )
+    db["sensor_buckets"].create_index([("box_id", ASCENDING), ("bucket_start", ASCENDING)], unique=True)
+    db["sensor_rollups"].create_index(
+        [("box_id", ASCENDING), ("resolution", ASCENDING), ("bucket_start", ASCENDING)],
+        unique=True,
+    )
+    db["sensor_sketches"].create_index([("box_id", ASCENDING), ("hour", ASCENDING)], unique=True)
+    db["box_events"].create_index([("box_id", ASCENDING), ("at", DESCENDING)])
+    db["box_events"].create_index([("box_id", ASCENDING), ("type", ASCENDING), ("at", DESCENDING)])
+    db["box_inventory"].create_index("box_id", unique=True)
+    db["inventory_changes"].create_index([("box_id", ASCENDING), ("version", ASCENDING)])
+    db["inventory_snapshots"].create_index([("box_id", ASCENDING), ("at", DESCENDING)])
     db["intake_logs"].create_index("box_id")
     db["intake_logs"].create_index("taken_at")
+    db["intake_logs"].create_index([("box_id", ASCENDING), ("taken_at", ASCENDING)])
+    db["intake_logs"].create_index(
+        [("box_id", ASCENDING), ("seq", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"seq": {"$exists": True}},
+    )
     db["refill_requests"].create_index("box_id")
     db["medicines"].create_index("name", unique=True)
     db["health_reports"].create_index("box_id")
@@ -0,0 +1,350 @@
+"""Compressed on-disk archive of old sensor readings.
+
+Readings older than the hot window leave ``sensor_logs`` and are stored as
+one block file per box and UTC day (``<dir>/<box_id>/<YYYY-MM-DD>.blk``),
+compressed the way time-series databases do it:
+
+* timestamps (milliseconds) as delta-of-delta with variable-width buckets,
+  so a box reporting on a steady cadence costs about one bit per reading;
+* temperature, humidity and LDR values XORed with the previous value and
+  stored as the meaningful bits only, so slowly changing floats take a few
+  bits each;
+* ``medicine_taken`` and the int/float tag of every value as two-bit codes;
+* any other field of ``data``, and the reading's top-level ``seq``, in a
+  BSON side section, so archiving is lossless for the reading payload.
+"""
+import os
+import re
+import struct
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import bson
+
+BLOCK_MAGIC = b"MBA1"
+BLOCK_HEADER = struct.Struct("<4sI")  # magic, reading count
+SECTION_LENGTH = struct.Struct("<I")
+FLOAT_FIELDS = ("temperature", "humidity", "ldr_value")
+FLAG_FIELD = "medicine_taken"
+ARCHIVED_FIELDS = FLOAT_FIELDS + (FLAG_FIELD,)
+BLOCK_NAME = re.compile(r"^(\d{4}-\d{2}-\d{2})\.blk$")
+
+EPOCH = datetime(1970, 1, 1)
+TAG_MISSING, TAG_FLOAT, TAG_INT = 0, 1, 2
+FLAG_MISSING, FLAG_FALSE, FLAG_TRUE = 0, 1, 2
+MAX_EXACT_INT = 2 ** 53
+
+# Delta-of-delta value widths selected by a prefix of 1 to 5 one-bits ("10",
+# "110", "1110", "11110", "11111"); a single zero bit means "same delta".
+DOD_WIDTHS = (7, 9, 12, 20, 64)
+
+
+class BitWriter:
+    def __init__(self):
+        self._bytes = bytearray()
+        self._acc = 0
+        self._bits = 0
+
+    def write(self, value: int, bits: int) -> None:
+        self._acc = (self._acc << bits) | (value & ((1 << bits) - 1))
+        self._bits += bits
+        while self._bits >= 8:
+            self._bits -= 8
+            self._bytes.append((self._acc >> self._bits) & 0xFF)
+        self._acc &= (1 << self._bits) - 1
+
+    def getvalue(self) -> bytes:
+        if self._bits:
+            return bytes(self._bytes) + bytes([(self._acc << (8 - self._bits)) & 0xFF])
+        return bytes(self._bytes)
+
+
+class BitReader:
+    def __init__(self, data: bytes):
+        self._data = data
+        self._position = 0
+
+    def read(self, bits: int) -> int:
+        start = self._position
+        end = start + bits
+        if end > len(self._data) * 8:
+            raise ValueError("archive block is truncated")
+        chunk = int.from_bytes(self._data[start >> 3:(end + 7) >> 3], "big")
+        self._position = end
+        return (chunk >> ((-end) % 8)) & ((1 << bits) - 1)
+
+
+def _signed(value: int, bits: int) -> int:
+    return value - (1 << bits) if value >= 1 << (bits - 1) else value
+
+
+def encode_timestamps(values: List[int]) -> bytes:
+    writer = BitWriter()
+    previous, previous_delta = 0, 0
+    for index, value in enumerate(values):
+        if index == 0:
+            writer.write(value, 64)
+        else:
+            delta = value - previous
+            dod = delta - previous_delta
+            if dod == 0:
+                writer.write(0, 1)
+            else:
+                for ones, bits in enumerate(DOD_WIDTHS, start=1):
+                    if bits == 64 or -(1 << (bits - 1)) <= dod < 1 << (bits - 1):
+                        break
+                if ones < len(DOD_WIDTHS):
+                    writer.write(((1 << ones) - 1) << 1, ones + 1)
+                else:
+                    writer.write((1 << ones) - 1, ones)
+                writer.write(dod, bits)
+            previous_delta = delta
+        previous = value
+    return writer.getvalue()
+
+
+def decode_timestamps(data: bytes, count: int) -> List[int]:
+    reader = BitReader(data)
+    values: List[int] = []
+    previous, delta = 0, 0
+    for index in range(count):
+        if index == 0:
+            previous = _signed(reader.read(64), 64)
+            values.append(previous)
+            continue
+        ones = 0
+        while ones < len(DOD_WIDTHS) and reader.read(1):
+            ones += 1
+        if ones:
+            bits = DOD_WIDTHS[ones - 1]
+            delta += _signed(reader.read(bits), bits)
+        previous += delta
+        values.append(previous)
+    return values
+
+
+def encode_floats(values: List[float]) -> bytes:
+    writer = BitWriter()
+    previous = 0
+    leading, trailing = -1, 0
+    for index, value in enumerate(values):
+        bits = struct.unpack(">Q", struct.pack(">d", value))[0]
+        if index == 0:
+            writer.write(bits, 64)
+        else:
+            xor = bits ^ previous
+            if xor == 0:
+                writer.write(0, 1)
+            else:
+                writer.write(1, 1)
+                new_leading = min(64 - xor.bit_length(), 31)
+                new_trailing = (xor & -xor).bit_length() - 1
+                if leading >= 0 and new_leading >= leading and new_trailing >= trailing:
+                    writer.write(0, 1)
+                    writer.write(xor >> trailing, 64 - leading - trailing)
+                else:
+                    leading, trailing = new_leading, new_trailing
+                    meaningful = 64 - leading - trailing
+                    writer.write(1, 1)
+                    writer.write(leading, 5)
+                    writer.write(meaningful - 1, 6)
+                    writer.write(xor >> trailing, meaningful)
+        previous = bits
+    return writer.getvalue()
+
+
+def decode_floats(data: bytes, count: int) -> List[float]:
+    reader = BitReader(data)
+    values: List[float] = []
+    previous = 0
+    leading, trailing = 0, 0
+    for index in range(count):
+        if index == 0:
+            previous = reader.read(64)
+        elif reader.read(1):
+            if reader.read(1):
+                leading = reader.read(5)
+                meaningful = reader.read(6) + 1
+                trailing = 64 - leading - meaningful
+            previous ^= reader.read(64 - leading - trailing) << trailing
+        values.append(struct.unpack(">d", struct.pack(">Q", previous))[0])
+    return values
+
+
+def _tags(codes: List[int]) -> bytes:
+    writer = BitWriter()
+    for code in codes:
+        writer.write(code, 2)
+    return writer.getvalue()
+
+
+def _untags(data: bytes, count: int) -> List[int]:
+    reader = BitReader(data)
+    return [reader.read(2) for _ in range(count)]
+
+
+def _to_millis(moment: datetime) -> int:
+    return (moment - EPOCH) // timedelta(milliseconds=1)
+
+
+def encode_block(readings: List[dict]) -> bytes:
+    """Serialize readings (``sensor_logs`` shape, any order) into one block."""
+    readings = sorted(readings, key=lambda reading: reading["recorded_at"])
+    sections = [encode_timestamps([_to_millis(reading["recorded_at"]) for reading in readings])]
+    extras = [{} for _ in readings]
+
+    for field in FLOAT_FIELDS:
+        tags, values = [], []
+        for position, reading in enumerate(readings):
+            value = (reading.get("data") or {}).get(field, None)
+            if isinstance(value, float):
+                tags.append(TAG_FLOAT)
+                values.append(value)
+            elif isinstance(value, int) and not isinstance(value, bool) and abs(value) <= MAX_EXACT_INT:
+                tags.append(TAG_INT)
+                values.append(float(value))
+            else:
+                tags.append(TAG_MISSING)
+                if field in (reading.get("data") or {}):
+                    extras[position][field] = value
+        sections.append(_tags(tags))
+        sections.append(encode_floats(values))
+
+    flags = []
+    for position, reading in enumerate(readings):
+        data = reading.get("data") or {}
+        value = data.get(FLAG_FIELD)
+        if value is True or value is False:
+            flags.append(FLAG_TRUE if value else FLAG_FALSE)
+        else:
+            flags.append(FLAG_MISSING)
+            if FLAG_FIELD in data:
+                extras[position][FLAG_FIELD] = value
+        for key, value in data.items():
+            if key not in ARCHIVED_FIELDS:
+                extras[position][key] = value
+    sections.append(_tags(flags))
+    rows = []
+    for position, (reading, extra) in enumerate(zip(readings, extras)):
+        row = {"i": position, "d": extra}
+        if reading.get("seq") is not None:
+            row["s"] = reading["seq"]
+        if extra or "s" in row:
+            rows.append(row)
+    sections.append(bson.encode({"rows": rows}))
+
+    return BLOCK_HEADER.pack(BLOCK_MAGIC, len(readings)) + b"".join(
+        SECTION_LENGTH.pack(len(section)) + section for section in sections
+    )
+
+
+def decode_block(data: bytes, box_id: str) -> List[dict]:
+    magic, count = BLOCK_HEADER.unpack_from(data)
+    if magic != BLOCK_MAGIC:
+        raise ValueError("not a sensor archive block")
+    sections = []
+    offset = BLOCK_HEADER.size
+    while offset < len(data):
+        (length,) = SECTION_LENGTH.unpack_from(data, offset)
+        offset += SECTION_LENGTH.size
+        sections.append(data[offset:offset + length])
+        offset += length
+
+    stamps = decode_timestamps(sections[0], count)
+    readings = [
+        {"box_id": box_id, "data": {}, "recorded_at": EPOCH + timedelta(milliseconds=stamp)}
+        for stamp in stamps
+    ]
+    for index, field in enumerate(FLOAT_FIELDS):
+        tags = _untags(sections[1 + 2 * index], count)
+        values = iter(decode_floats(sections[2 + 2 * index], sum(1 for tag in tags if tag)))
+        for reading, tag in zip(readings, tags):
+            if tag == TAG_FLOAT:
+                reading["data"][field] = next(values)
+            elif tag == TAG_INT:
+                reading["data"][field] = int(next(values))
+    for reading, flag in zip(readings, _untags(sections[7], count)):
+        if flag != FLAG_MISSING:
+            reading["data"][FLAG_FIELD] = flag == FLAG_TRUE
+    for row in bson.decode(sections[8])["rows"]:
+        readings[row["i"]]["data"].update(row["d"])
+        if "s" in row:
+            readings[row["i"]]["seq"] = row["s"]
+    return readings
+
+
+def _reading_key(reading: dict) -> Tuple:
+    data = reading.get("data") or {}
+    return reading["recorded_at"], reading.get("seq"), bson.encode(dict(sorted(data.items())))
+
+
+class SensorArchive:
+    """Per-box, per-day archive blocks under ``directory``."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, box_id: str, day: date) -> str:
+        if not box_id or box_id in {".", ".."} or "/" in box_id or "\\" in box_id:
+            raise ValueError(f"box_id {box_id!r} cannot be archived")
+        return os.path.join(self.directory, box_id, f"{day.isoformat()}.blk")
+
+    def days(self, box_id: str) -> List[date]:
+        try:
+            names = os.listdir(os.path.join(self.directory, box_id))
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+        return sorted(date.fromisoformat(match.group(1)) for match in map(BLOCK_NAME.match, names) if match)
+
+    def read_day(self, box_id: str, day: date) -> List[dict]:
+        try:
+            with open(self.path(box_id, day), "rb") as handle:
+                return decode_block(handle.read(), box_id)
+        except FileNotFoundError:
+            return []
+
+    def write_day(self, box_id: str, day: date, readings: List[dict]) -> int:
+        """Add ``readings`` to the day's block; returns the block's reading count.
+
+        Readings already in the block are skipped, so re-archiving a day
+        after an interrupted run never duplicates data. The block is
+        replaced atomically.
+        """
+        merged: Dict[Tuple, dict] = {_reading_key(reading): reading for reading in self.read_day(box_id, day)}
+        for reading in readings:
+            merged.setdefault(_reading_key(reading), reading)
+        path = self.path(box_id, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as handle:
+            handle.write(encode_block(list(merged.values())))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, path)
+        return len(merged)
+
+    def iter_readings(
+        self,
+        box_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[dict]:
+        """Archived readings of ``box_id`` in ``start <= recorded_at < end``, oldest first."""
+        for day in self.days(box_id):
+            if start is not None and day < start.date():
+                continue
+            if end is not None and datetime.combine(day, datetime.min.time()) >= end:
+                break
+            for reading in self.read_day(box_id, day):
+                recorded_at = reading["recorded_at"]
+                if (start is None or recorded_at >= start) and (end is None or recorded_at < end):
+                    yield reading
+
+    def stats(self) -> dict:
+        blocks = size = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if BLOCK_NAME.match(name):
+                    blocks += 1
+                    size += os.path.getsize(os.path.join(root, name))
+        return {"blocks": blocks, "bytes": size}
@@ -0,0 +1,114 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from services.lid_events import EVENT_LID_CLOSED, EVENT_LID_OPENED
+
+LID_OPEN = "open"
+LID_CLOSED = "closed"
+
+
+class BoxStatusCache:
+    """One "current status" record per box, kept up to date by ingestion.
+
+    ``box_status`` documents are keyed by ``_id = box_id``::
+
+        {_id, latest: {data, recorded_at}, lid_state, lid_changed_at,
+         pill_count, pill_count_at, last_seen_at}
+
+    Every field is written with a guard on its own timestamp (``$max`` or a
+    "newer than" filter), so out-of-order batches and several writer
+    processes never move a field backwards. Reads are a single ``_id``
+    lookup; a record read in the last ``ttl`` seconds and not written by
+    this process since is answered from memory.
+    """
+
+    def __init__(self, db, ttl: float = 5.0):
+        self.collection = db["box_status"]
+        self.ttl = float(ttl)
+        self._cache: Dict[str, Tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.reads = 0
+
+    def get(self, box_id: str) -> Optional[dict]:
+        with self._lock:
+            cached = self._cache.get(box_id)
+            if cached is not None and time.monotonic() - cached[0] < self.ttl:
+                self.hits += 1
+                return dict(cached[1])
+        doc = self.collection.find_one({"_id": box_id})
+        self.reads += 1
+        if doc is not None:
+            self._remember(box_id, doc)
+        return doc
+
+    def observe(self, payloads: List[dict], events: Iterable[dict] = ()) -> None:
+        """Fold a batch of incoming readings and lid events into the status records."""
+        latest: Dict[str, dict] = {}
+        for payload in payloads:
+            current = latest.get(payload["box_id"])
+            if current is None or current["recorded_at"] <= payload["recorded_at"]:
+                latest[payload["box_id"]] = payload
+        lids: Dict[str, dict] = {}
+        for event in events:
+            if event.get("type") in (EVENT_LID_OPENED, EVENT_LID_CLOSED):
+                lids[event["box_id"]] = event
+        if not latest and not lids:
+            return
+
+        operations = []
+        for box_id in set(latest) | set(lids):
+            payload = latest.get(box_id)
+            seen_at = payload["recorded_at"] if payload is not None else lids[box_id]["at"]
+            operations.append(UpdateOne({"_id": box_id}, {"$max": {"last_seen_at": seen_at}}, upsert=True))
+            if payload is not None:
+                operations.append(self._newer(box_id, "latest.recorded_at", payload["recorded_at"], {
+                    "latest": {"data": payload.get("data") or {}, "recorded_at": payload["recorded_at"]},
+                }))
+            if box_id in lids:
+                event = lids[box_id]
+                operations.append(self._newer(box_id, "lid_changed_at", event["at"], {
+                    "lid_state": LID_OPEN if event["type"] == EVENT_LID_OPENED else LID_CLOSED,
+                    "lid_changed_at": event["at"],
+                }))
+        self.collection.bulk_write(operations, ordered=True)
+        self._forget(set(latest) | set(lids))
+
+    def set_pill_count(self, box_id: str, count: int, at: datetime) -> None:
+        self.collection.bulk_write([
+            UpdateOne({"_id": box_id}, {"$setOnInsert": {"pill_count_at": None}}, upsert=True),
+            self._newer(box_id, "pill_count_at", at, {"pill_count": count, "pill_count_at": at}),
+        ], ordered=True)
+        self._forget([box_id])
+
+    def seen(self, box_id: str, at: datetime) -> None:
+        self.collection.update_one({"_id": box_id}, {"$max": {"last_seen_at": at}}, upsert=True)
+        self._forget([box_id])
+
+    def stats(self) -> dict:
+        with self._lock:
+            cached = len(self._cache)
+        return {"cached_boxes": cached, "hits": self.hits, "reads": self.reads}
+
+    @staticmethod
+    def _newer(box_id: str, field: str, at: datetime, values: dict) -> UpdateOne:
+        return UpdateOne(
+            {"_id": box_id, "$or": [{field: {"$lt": at}}, {field: None}]},
+            {"$set": values},
+        )
+
+    def _remember(self, box_id: str, doc: dict) -> None:
+        with self._lock:
+            self._cache[box_id] = (time.monotonic(), dict(doc))
+
+    def _forget(self, box_ids: Iterable[str]) -> None:
+        # Writes are guarded in the database, so the next read refetches
+        # rather than trying to merge the update into the cached copy.
+        with self._lock:
+            for box_id in box_ids:
+                self._cache.pop(box_id, None)
@@ -0,0 +1,83 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+DEFAULT_TOLERANCES = {
+    "temperature": 0.5,
+    "humidity": 2.0,
+    "ldr_value": 50,
+}
+
+
+class DeadbandFilter:
+    """Decides whether a sensor reading differs enough from the last stored one.
+
+    A reading is stored when any field moves outside its tolerance, when the
+    LDR value crosses ``ldr_threshold`` (lid open/close must never be lost),
+    when ``medicine_taken`` flips, or when ``heartbeat_interval`` has passed
+    since the last stored reading of that box. The last stored values live in
+    an in-memory table keyed by box_id.
+    """
+
+    def __init__(
+        self,
+        tolerances: Optional[Dict[str, float]] = None,
+        heartbeat_interval: timedelta = timedelta(minutes=10),
+        ldr_threshold: Optional[int] = 1000,
+    ):
+        self.tolerances = dict(DEFAULT_TOLERANCES if tolerances is None else tolerances)
+        self.heartbeat_interval = heartbeat_interval
+        self.ldr_threshold = ldr_threshold
+        self._last: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+        self.stored = 0
+        self.suppressed = 0
+
+    def should_store(self, box_id: str, data: dict, recorded_at: Optional[datetime] = None) -> bool:
+        recorded_at = recorded_at or datetime.utcnow()
+        with self._lock:
+            previous = self._last.get(box_id)
+            if previous is None or self._differs(previous[0], data) or recorded_at - previous[1] >= self.heartbeat_interval:
+                self._last[box_id] = (dict(data), recorded_at)
+                self.stored += 1
+                return True
+            self.suppressed += 1
+            return False
+
+    def forget(self, box_id: str) -> None:
+        with self._lock:
+            self._last.pop(box_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "tracked_boxes": len(self._last),
+            "stored": self.stored,
+            "suppressed": self.suppressed,
+        }
+
+    def _differs(self, previous: dict, current: dict) -> bool:
+        if bool(previous.get("medicine_taken")) != bool(current.get("medicine_taken")):
+            return True
+
+        for field, tolerance in self.tolerances.items():
+            old, new = previous.get(field), current.get(field)
+            if old is None or new is None:
+                if old is not new:
+                    return True
+                continue
+            try:
+                if abs(float(new) - float(old)) > tolerance:
+                    return True
+            except (TypeError, ValueError):
+                return old != new
+
+        if self.ldr_threshold is not None:
+            old_ldr, new_ldr = previous.get("ldr_value"), current.get("ldr_value")
+            if old_ldr is not None and new_ldr is not None:
+                try:
+                    if (float(old_ldr) >= self.ldr_threshold) != (float(new_ldr) >= self.ldr_threshold):
+                        return True
+                except (TypeError, ValueError):
+                    return True
+        return False
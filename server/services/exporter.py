@@ -0,0 +1,273 @@
+"""Columnar bulk export of ``sensor_logs`` and ``intake_logs``.
+
+Documents are read from a server-side cursor and appended straight into one
+list per column; every ``batch_rows`` rows the lists become an Arrow record
+batch, are written to the output and are dropped. An export therefore holds
+at most one batch in memory, however many rows it covers. pyarrow is an
+optional dependency: it is only imported when an export is written.
+"""
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from services.medibox_service import STORAGE_BUCKETS
+
+DATASET_SENSOR = "sensor"
+DATASET_INTAKE = "intake"
+FORMAT_ARROW = "arrow"
+FORMAT_PARQUET = "parquet"
+FORMATS = {
+    FORMAT_ARROW: ("application/vnd.apache.arrow.stream", "arrows"),
+    FORMAT_PARQUET: ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def _integer(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        return None
+    return value
+
+
+def _flag(value):
+    return value if isinstance(value, bool) else None
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+def _timestamp(value):
+    return value if isinstance(value, datetime) else None
+
+
+# (column, arrow type, path inside the document, coercion)
+SENSOR_COLUMNS = [
+    ("box_id", "string", ("box_id",), _text),
+    ("recorded_at", "timestamp", ("recorded_at",), _timestamp),
+    ("temperature", "float64", ("data", "temperature"), _number),
+    ("humidity", "float64", ("data", "humidity"), _number),
+    ("ldr_value", "float64", ("data", "ldr_value"), _number),
+    ("medicine_taken", "bool", ("data", "medicine_taken"), _flag),
+    ("seq", "int64", ("seq",), _integer),
+]
+INTAKE_COLUMNS = [
+    ("box_id", "string", ("box_id",), _text),
+    ("taken_at", "timestamp", ("taken_at",), _timestamp),
+    ("user_id", "string", ("user_id",), _text),
+    ("medicine_id", "string", ("medicine_id",), _text),
+    ("confirmed", "bool", ("confirmed",), _flag),
+    ("status", "string", ("status",), _text),
+    ("seq", "int64", ("seq",), _integer),
+]
+DATASETS = {DATASET_SENSOR: SENSOR_COLUMNS, DATASET_INTAKE: INTAKE_COLUMNS}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as exc:
+        raise RuntimeError("Exports need pyarrow; install it with `pip install pyarrow`") from exc
+    return pyarrow
+
+
+def iter_column_batches(
+    docs: Iterable[dict],
+    columns: List[Tuple],
+    batch_rows: int,
+) -> Iterator[Dict[str, list]]:
+    """Group documents into ``{column: [values]}`` batches of ``batch_rows`` rows."""
+    batch_rows = max(int(batch_rows), 1)
+    getters: List[Tuple[list, Tuple[str, ...], Callable]] = []
+    batch: Dict[str, list] = {}
+
+    def reset():
+        batch.clear()
+        getters.clear()
+        for name, _, path, coerce in columns:
+            batch[name] = []
+            getters.append((batch[name], path, coerce))
+
+    reset()
+    rows = 0
+    for doc in docs:
+        for values, path, coerce in getters:
+            value = doc
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            values.append(coerce(value))
+        rows += 1
+        if rows >= batch_rows:
+            yield dict(batch)
+            reset()
+            rows = 0
+    if rows:
+        yield dict(batch)
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are drained after every batch."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+class DataExporter:
+    """Streams one box or time range of sensor or intake data as Arrow IPC or Parquet."""
+
+    def __init__(self, medibox_service, batch_rows: int = 5000):
+        self.medibox_service = medibox_service
+        self.batch_rows = max(int(batch_rows), 1)
+        self.rows_exported = 0
+
+    def ensure_indexes(self) -> None:
+        # Per-box intake exports walk (box_id, taken_at) in order.
+        try:
+            self.medibox_service.intake_logs.create_index(
+                [("box_id", ASCENDING), ("taken_at", ASCENDING)],
+                background=True,
+            )
+        except OperationFailure:  # pragma: no cover - index already exists with other options
+            pass
+
+    def stream(
+        self,
+        dataset: str,
+        fmt: str = FORMAT_ARROW,
+        box_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[bytes]:
+        """Validate the request, then return an iterator of encoded chunks.
+
+        Bad arguments and a missing pyarrow raise here rather than once the
+        response has started streaming.
+        """
+        if dataset not in DATASETS:
+            raise ValueError(f"dataset must be one of {', '.join(DATASETS)}")
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        if start is not None and end is not None and start >= end:
+            raise ValueError("from must be earlier than to")
+        pa = _require_pyarrow()
+        return self._encode(pa, dataset, fmt, self._documents(dataset, box_id, start, end))
+
+    def write(self, sink, dataset: str, fmt: str = FORMAT_ARROW, **filters) -> int:
+        """Write an export to a binary file object; returns the number of rows."""
+        before = self.rows_exported
+        for chunk in self.stream(dataset, fmt, **filters):
+            sink.write(chunk)
+        return self.rows_exported - before
+
+    def schema(self, pa, dataset: str):
+        types = {
+            "string": pa.string(),
+            "timestamp": pa.timestamp("ms"),
+            "float64": pa.float64(),
+            "int64": pa.int64(),
+            "bool": pa.bool_(),
+        }
+        return pa.schema([(name, types[kind]) for name, kind, _, _ in DATASETS[dataset]])
+
+    def _encode(self, pa, dataset: str, fmt: str, docs: Iterable[dict]) -> Iterator[bytes]:
+        schema = self.schema(pa, dataset)
+        sink = _ChunkSink()
+        if fmt == FORMAT_PARQUET:
+            import pyarrow.parquet as pq
+
+            writer = pq.ParquetWriter(sink, schema, compression="snappy")
+        else:
+            writer = pa.ipc.new_stream(sink, schema)
+
+        try:
+            for columns in iter_column_batches(docs, DATASETS[dataset], self.batch_rows):
+                batch = pa.RecordBatch.from_arrays(
+                    [pa.array(columns[field.name], type=field.type) for field in schema],
+                    schema=schema,
+                )
+                if fmt == FORMAT_PARQUET:
+                    # One row group per batch, flushed to the sink as it is written.
+                    writer.write_table(pa.Table.from_batches([batch], schema=schema))
+                else:
+                    writer.write_batch(batch)
+                self.rows_exported += len(columns[schema[0].name])
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    def _documents(
+        self,
+        dataset: str,
+        box_id: Optional[str],
+        start: Optional[datetime],
+        end: Optional[datetime],
+    ) -> Iterator[dict]:
+        if dataset == DATASET_INTAKE:
+            return self._find(self.medibox_service.intake_logs, INTAKE_COLUMNS, "taken_at", box_id, start, end)
+        if box_id:
+            return self._sensor_documents(box_id, start, end)
+        # One (box_id, recorded_at) index range per box keeps every cursor
+        # sorted by the index instead of an in-memory sort of the whole range.
+        source = (
+            self.medibox_service.sensor_buckets.collection
+            if self.medibox_service.storage_mode == STORAGE_BUCKETS
+            else self.medibox_service.sensor_logs
+        )
+        return (
+            doc
+            for box in sorted(source.distinct("box_id"))
+            for doc in self._sensor_documents(box, start, end)
+        )
+
+    def _sensor_documents(self, box_id: str, start: Optional[datetime], end: Optional[datetime]) -> Iterator[dict]:
+        if self.medibox_service.storage_mode == STORAGE_BUCKETS:
+            return self.medibox_service.sensor_buckets.iter_readings(box_id, start, end)
+        return self._find(self.medibox_service.sensor_logs, SENSOR_COLUMNS, "recorded_at", box_id, start, end)
+
+    def _find(self, collection, columns: List[Tuple], time_field: str, box_id, start, end) -> Iterator[dict]:
+        query = {}
+        if box_id:
+            query["box_id"] = box_id
+        bounds = {}
+        if start is not None:
+            bounds["$gte"] = start
+        if end is not None:
+            bounds["$lt"] = end
+        if bounds:
+            query[time_field] = bounds
+        projection = {"_id": 0}
+        projection.update({".".join(path): 1 for _, _, path, _ in columns})
+        return (
+            collection.find(query, projection)
+            .sort(time_field, ASCENDING)
+            .batch_size(self.batch_rows)
+        )
@@ -0,0 +1,288 @@
+"""Append-only local journal for sensor payloads that could not reach Mongo.
+
+Records are appended to numbered segment files (``<n>.seg``) with buffered
+sequential writes. Each record is::
+
+    length  I   size of the BSON body
+    crc32   I   checksum of the BSON body
+    body        BSON-encoded payload (datetimes and ObjectIds round-trip)
+
+A checkpoint file remembers how far the replayer got, so a restart resumes
+where it stopped. Segments are only created when something is journaled and
+are deleted once fully replayed.
+"""
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+import bson
+
+logger = logging.getLogger(__name__)
+
+RECORD_HEADER = struct.Struct("<II")
+SEGMENT_SUFFIX = ".seg"
+CHECKPOINT_FILE = "checkpoint.json"
+
+Position = Tuple[int, int]
+
+
+class IngestJournal:
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 16 * 1024 * 1024,
+        buffer_bytes: int = 1024 * 1024,
+        fsync: bool = False,
+    ):
+        self.directory = directory
+        self.segment_bytes = max(int(segment_bytes), RECORD_HEADER.size)
+        self.buffer_bytes = int(buffer_bytes)
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._file = None
+        # A restart never appends behind a possibly torn tail: new records
+        # always go to a fresh segment.
+        self._active_segment = max(self._segments(), default=0) + 1
+        self._committed = 0
+
+        self.appended = 0
+        self.appended_bytes = 0
+        self.corrupt_records = 0
+
+    def append(self, payloads: List[dict]) -> None:
+        """Durably queue ``payloads`` for replay (one buffered write per record)."""
+        if not payloads:
+            return
+        with self._lock:
+            handle = self._writer()
+            for payload in payloads:
+                body = bson.encode(payload)
+                handle.write(RECORD_HEADER.pack(len(body), zlib.crc32(body)))
+                handle.write(body)
+                self.appended_bytes += RECORD_HEADER.size + len(body)
+            handle.flush()
+            if self.fsync:
+                os.fsync(handle.fileno())
+            self._committed = handle.tell()
+            self.appended += len(payloads)
+            if self._committed >= self.segment_bytes:
+                self._roll()
+
+    def read_batch(self, limit: int) -> Tuple[List[dict], Position]:
+        """Return up to ``limit`` payloads after the checkpoint and the position after them."""
+        segment, offset = self.load_checkpoint()
+        payloads: List[dict] = []
+        for number in self._segments():
+            if number < segment:
+                continue
+            if number > segment:
+                segment, offset = number, 0
+            with self._lock:
+                active = number == self._active_segment
+                end = self._committed if active else None
+            offset, complete = self._read_segment(number, offset, end, limit, payloads)
+            if len(payloads) >= limit or active or not complete:
+                break
+        return payloads, (segment, offset)
+
+    def load_checkpoint(self) -> Position:
+        try:
+            with open(self._path(CHECKPOINT_FILE), "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+            return int(data["segment"]), int(data["offset"])
+        except (OSError, ValueError, KeyError):
+            return 0, 0
+
+    def commit(self, position: Position) -> None:
+        """Persist the replay checkpoint and delete segments that are fully replayed."""
+        segment, offset = position
+        temp_path = self._path(CHECKPOINT_FILE + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump({"segment": segment, "offset": offset}, handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, self._path(CHECKPOINT_FILE))
+
+        for number in self._segments():
+            if number < segment:
+                os.remove(self._segment_path(number))
+
+    def pending_bytes(self) -> int:
+        segment, offset = self.load_checkpoint()
+        total = 0
+        for number in self._segments():
+            if number < segment:
+                continue
+            size = os.path.getsize(self._segment_path(number))
+            total += size - offset if number == segment else size
+        return max(total, 0)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "segments": len(self._segments()),
+            "pending_bytes": self.pending_bytes(),
+            "appended": self.appended,
+            "appended_bytes": self.appended_bytes,
+            "corrupt_records": self.corrupt_records,
+        }
+
+    def _writer(self):
+        if self._file is None:
+            self._file = open(self._segment_path(self._active_segment), "ab", buffering=self.buffer_bytes)
+            self._committed = self._file.tell()
+        return self._file
+
+    def _roll(self) -> None:
+        self._file.close()
+        self._file = None
+        self._active_segment += 1
+        self._committed = 0
+
+    def _read_segment(
+        self,
+        number: int,
+        offset: int,
+        end: Optional[int],
+        limit: int,
+        out: List[dict],
+    ) -> Tuple[int, bool]:
+        """Read records into ``out`` until it holds ``limit`` items.
+
+        Returns the new offset and whether the segment is exhausted.
+        """
+        with open(self._segment_path(number), "rb", buffering=self.buffer_bytes) as handle:
+            handle.seek(offset)
+            while len(out) < limit and (end is None or offset < end):
+                header = handle.read(RECORD_HEADER.size)
+                if not header:
+                    return offset, True
+                if len(header) < RECORD_HEADER.size:
+                    return self._skip_corrupt(number, offset)
+                length, checksum = RECORD_HEADER.unpack(header)
+                body = handle.read(length)
+                if len(body) < length or zlib.crc32(body) != checksum:
+                    return self._skip_corrupt(number, offset)
+                out.append(bson.decode(body))
+                offset += RECORD_HEADER.size + length
+            return offset, end is None and not handle.read(1)
+
+    def _skip_corrupt(self, number: int, offset: int) -> Tuple[int, bool]:
+        # Only a crash mid-write can leave a bad record, and it is always the
+        # tail of a closed segment: nothing after it is trustworthy.
+        self.corrupt_records += 1
+        logger.warning("Skipping corrupt journal tail in segment %d at offset %d", number, offset)
+        return offset, True
+
+    def _segments(self) -> List[int]:
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.endswith(SEGMENT_SUFFIX) and name[: -len(SEGMENT_SUFFIX)].isdigit():
+                numbers.append(int(name[: -len(SEGMENT_SUFFIX)]))
+        return sorted(numbers)
+
+    def _segment_path(self, number: int) -> str:
+        return self._path(f"{number:012d}{SEGMENT_SUFFIX}")
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+
+class JournalReplayer:
+    """Drains an ``IngestJournal`` through ``write_fn`` in bulk once Mongo is back.
+
+    ``write_fn`` receives a list of payloads and must be idempotent for
+    payloads that were already written (``MediBoxService.replay_sensor_payloads``
+    reuses the journaled ``_id`` so a replayed record is a no-op duplicate).
+    The checkpoint only advances after a batch was written, so a failure
+    simply leaves the rest for the next attempt.
+    """
+
+    def __init__(
+        self,
+        journal: IngestJournal,
+        write_fn: Callable[[List[dict]], object],
+        batch_size: int = 1000,
+        interval: float = 5.0,
+    ):
+        self.journal = journal
+        self.write_fn = write_fn
+        self.batch_size = max(int(batch_size), 1)
+        self.interval = float(interval)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._replay_lock = threading.Lock()
+
+        self.replayed = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_rate = 0.0
+
+    def replay(self) -> int:
+        """Replay everything pending; returns the number of payloads written."""
+        total = 0
+        started = time.perf_counter()
+        with self._replay_lock:
+            while True:
+                payloads, position = self.journal.read_batch(self.batch_size)
+                if not payloads:
+                    if position != self.journal.load_checkpoint():
+                        self.journal.commit(position)
+                    break
+                try:
+                    self.write_fn(payloads)
+                except Exception as exc:  # pragma: no cover - depends on database availability
+                    self.errors += 1
+                    self.last_error = str(exc)
+                    logger.warning("Journal replay paused after %d records: %s", total, exc)
+                    break
+                self.journal.commit(position)
+                total += len(payloads)
+                self.replayed += len(payloads)
+                self.batches += 1
+        elapsed = time.perf_counter() - started
+        if total:
+            self.last_rate = total / elapsed if elapsed > 0 else float(total)
+            logger.info("Replayed %d journaled sensor readings", total)
+        return total
+
+    def start(self) -> "JournalReplayer":
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ingest-journal-replay", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "replayed": self.replayed,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_rate_per_second": round(self.last_rate, 1),
+        }
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self.journal.pending_bytes():
+                self.replay()
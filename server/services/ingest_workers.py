@@ -0,0 +1,219 @@
+"""Multi-process sensor ingestion sharded by box_id.
+
+The API process only routes: it looks up the shard of each box on a
+consistent-hash ring and hands the raw request body to that shard's worker
+process over a ``multiprocessing`` queue (a local pipe). Every worker owns
+its own ``MediBoxService`` - deadband, sequence window and lid state - and
+consumes its queue on a single thread, so a box is only ever processed by
+one worker, in arrival order, without cross-process coordination.
+"""
+import atexit
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.sensor_buffer import BufferFullError
+from utils.telemetry_frame import decode_sensor_message
+
+logger = logging.getLogger(__name__)
+
+PLAIN_CONFIG_TYPES = (str, int, float, bool, type(None))
+
+
+class HashRing:
+    """Consistent-hash ring mapping box_ids to ``shards`` worker indexes."""
+
+    def __init__(self, shards: int, replicas: int = 64):
+        points = sorted(
+            (self._hash(f"shard-{shard}:{replica}"), shard)
+            for shard in range(max(int(shards), 1))
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+    def shard_for(self, box_id: str) -> int:
+        index = bisect.bisect(self._points, self._hash(box_id)) % len(self._points)
+        return self._shards[index]
+
+
+def connect_database(uri: str, db_name: Optional[str]):
+    """Default worker ``db_factory``: every process opens its own client."""
+    from pymongo import MongoClient
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+    return client.get_database(db_name) if db_name else client.get_default_database()
+
+
+class ShardWorker:
+    """Decodes and persists the messages of one shard."""
+
+    def __init__(self, medibox_service):
+        self.medibox_service = medibox_service
+
+    def handle(self, items: List[Tuple[str, bytes]]) -> Tuple[int, int]:
+        """Persist ``(box_id, body)`` messages in order; returns ``(readings, errors)``."""
+        payloads = []
+        errors = 0
+        for box_id, body in items:
+            try:
+                readings = decode_sensor_message(body, box_id)
+            except ValueError as exc:
+                errors += 1
+                logger.warning("Dropping undecodable sensor message for %s: %s", box_id, exc)
+                continue
+            for reading in readings:
+                try:
+                    payloads.append(self.medibox_service.build_sensor_payload(
+                        reading.get("box_id"),
+                        reading.get("sensor_data") or reading,
+                    ))
+                except ValueError:
+                    errors += 1
+        if payloads:
+            self.medibox_service.persist_sensor_payloads(payloads)
+        return len(payloads), errors
+
+
+def _worker_main(index, inbox, counters, db_factory, db_args, config, batch_size):
+    from services.medibox_service import MediBoxService
+
+    if config.get("INGEST_JOURNAL_DIR"):
+        # Journals are append-only per writer; give every shard its own.
+        config["INGEST_JOURNAL_DIR"] = os.path.join(config["INGEST_JOURNAL_DIR"], f"shard-{index}")
+    service = MediBoxService.from_config(db_factory(*db_args), config)
+    if service.presence is not None:
+        service.presence.start()
+    if service.journal_replayer is not None:
+        service.journal_replayer.start()
+    worker = ShardWorker(service)
+
+    stopping = False
+    while not stopping:
+        item = inbox.get()
+        if item is None:
+            break
+        items = [item]
+        while len(items) < batch_size:
+            try:
+                item = inbox.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stopping = True
+                break
+            items.append(item)
+        try:
+            processed, errors = worker.handle(items)
+        except Exception:  # pragma: no cover - depends on database availability
+            logger.exception("Ingest worker %d failed to persist %d messages", index, len(items))
+            processed, errors = 0, len(items)
+        with counters.get_lock():
+            counters[index * 2] += processed
+            counters[index * 2 + 1] += errors
+
+    if service.presence is not None:
+        service.presence.close()
+    if service.journal_replayer is not None:
+        service.journal_replayer.stop()
+    if service.journal is not None:
+        service.journal.close()
+
+
+class ShardedIngestPool:
+    """Front door for ``INGEST_WORKERS`` sensor ingestion processes.
+
+    ``db_factory(*db_args)`` runs inside each worker to open its database;
+    it must be a picklable, module-level callable. ``config`` is reduced to
+    its plain values before it is sent to the workers.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        db_factory: Callable = connect_database,
+        db_args: tuple = (),
+        config: Optional[dict] = None,
+        queue_size: int = 10000,
+        batch_size: int = 200,
+        submit_timeout: float = 1.0,
+    ):
+        self.workers = max(int(workers), 1)
+        self.db_factory = db_factory
+        self.db_args = db_args
+        self.config = {key: value for key, value in (config or {}).items() if isinstance(value, PLAIN_CONFIG_TYPES)}
+        self.batch_size = max(int(batch_size), 1)
+        self.submit_timeout = float(submit_timeout)
+        self.ring = HashRing(self.workers)
+
+        self._context = multiprocessing.get_context("spawn")
+        self._inboxes = [self._context.Queue(maxsize=max(int(queue_size), 1)) for _ in range(self.workers)]
+        self._counters = self._context.Array("q", self.workers * 2)
+        self._processes: List = []
+
+        self.submitted = 0
+        self.rejected = 0
+
+    def start(self) -> "ShardedIngestPool":
+        if self._processes:
+            return self
+        for index, inbox in enumerate(self._inboxes):
+            process = self._context.Process(
+                target=_worker_main,
+                args=(index, inbox, self._counters, self.db_factory, self.db_args, dict(self.config), self.batch_size),
+                name=f"ingest-shard-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+        atexit.register(self.close)
+        return self
+
+    def submit(self, box_id: str, body: bytes) -> int:
+        """Queue a raw message for the worker owning ``box_id``; returns the shard."""
+        shard = self.ring.shard_for(box_id)
+        try:
+            self._inboxes[shard].put((box_id, bytes(body)), timeout=self.submit_timeout)
+        except queue.Full as exc:
+            self.rejected += 1
+            raise BufferFullError(f"ingest shard {shard} is full") from exc
+        self.submitted += 1
+        return shard
+
+    def close(self, timeout: float = 10.0) -> None:
+        for inbox, process in zip(self._inboxes, self._processes):
+            if process.is_alive():
+                inbox.put(None)
+        for process in self._processes:
+            process.join(timeout)
+        self._processes = []
+
+    def processed(self) -> int:
+        with self._counters.get_lock():
+            return sum(self._counters[index * 2] for index in range(self.workers))
+
+    def stats(self) -> dict:
+        with self._counters.get_lock():
+            counters = list(self._counters)
+        shards: List[Dict] = []
+        for index, inbox in enumerate(self._inboxes):
+            try:
+                depth = inbox.qsize()
+            except NotImplementedError:  # pragma: no cover - macOS
+                depth = None
+            shards.append({
+                "shard": index,
+                "alive": index < len(self._processes) and self._processes[index].is_alive(),
+                "queue_depth": depth,
+                "readings": counters[index * 2],
+                "errors": counters[index * 2 + 1],
+            })
+        return {"submitted": self.submitted, "rejected": self.rejected, "shards": shards}
@@ -0,0 +1,197 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import OperationFailure
+
+REASON_LID_OPENED = "lid_opened"
+REASON_CONFIRMED = "confirmed"
+REASON_REFILL = "refill"
+
+
+class InventoryService:
+    """Materialized pill count per box.
+
+    ``box_inventory`` holds one document per box that is updated in place,
+    so reading the current count is a single keyed lookup::
+
+        {box_id, initial_count, taken_count, current_count, version,
+         awaiting_confirmation, refilled_at, last_change_at}
+
+    Every change is also appended to ``inventory_changes`` (``delta`` and the
+    ``version`` it produced) and a full copy of the counters is written to
+    ``inventory_snapshots`` after a refill, every ``snapshot_every`` changes
+    or once ``snapshot_interval`` has passed. ``count_at`` rebuilds the count
+    at a past moment from the nearest snapshot plus the few changes after it.
+
+    A lid opening counts as one dose taken. A device confirmation for that
+    same opening does not count again; a confirmation without a preceding
+    opening (e.g. lid detection disabled) does.
+    """
+
+    def __init__(
+        self,
+        db,
+        snapshot_every: int = 50,
+        snapshot_interval: timedelta = timedelta(hours=24),
+    ):
+        self.inventory = db["box_inventory"]
+        self.changes = db["inventory_changes"]
+        self.snapshots = db["inventory_snapshots"]
+        self.snapshot_every = max(int(snapshot_every), 1)
+        self.snapshot_interval = snapshot_interval
+        self._last_taken_flag: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def ensure_indexes(self) -> None:
+        try:
+            self.inventory.create_index("box_id", unique=True, background=True)
+            self.changes.create_index([("box_id", ASCENDING), ("version", ASCENDING)], background=True)
+            self.snapshots.create_index([("box_id", ASCENDING), ("at", DESCENDING)], background=True)
+        except OperationFailure:  # pragma: no cover - index already exists with other options
+            pass
+
+    def get(self, box_id: str) -> Optional[dict]:
+        return self.inventory.find_one({"box_id": box_id})
+
+    def refill(self, box_id: str, count: int, at: Optional[datetime] = None) -> dict:
+        if count is None or int(count) < 0:
+            raise ValueError("count must be a non-negative integer")
+        at = at or datetime.utcnow()
+        count = int(count)
+
+        doc = self.inventory.find_one_and_update(
+            {"box_id": box_id},
+            {
+                "$set": {
+                    "initial_count": count,
+                    "taken_count": 0,
+                    "current_count": count,
+                    "awaiting_confirmation": False,
+                    "refilled_at": at,
+                    "last_change_at": at,
+                    "changes_since_snapshot": 0,
+                    "snapshot_at": at,
+                },
+                "$inc": {"version": 1},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self.changes.insert_one({
+            "box_id": box_id,
+            "at": at,
+            "delta": 0,
+            "reason": REASON_REFILL,
+            "version": doc["version"],
+        })
+        self._write_snapshot(doc, at)
+        return doc
+
+    def on_lid_opened(self, box_id: str, at: datetime) -> Optional[dict]:
+        return self._apply(box_id, -1, REASON_LID_OPENED, at, extra_set={"awaiting_confirmation": True})
+
+    def on_confirmation(self, box_id: str, at: Optional[datetime] = None) -> Optional[dict]:
+        at = at or datetime.utcnow()
+        claimed = self.inventory.update_one(
+            {"box_id": box_id, "awaiting_confirmation": True},
+            {"$set": {"awaiting_confirmation": False}},
+        )
+        if claimed.modified_count:
+            return None
+        return self._apply(box_id, -1, REASON_CONFIRMED, at)
+
+    def observe_readings(self, payloads: List[dict]) -> None:
+        """Treat a rising ``medicine_taken`` flag on device readings as a confirmation."""
+        rising = []
+        with self._lock:
+            for payload in payloads:
+                box_id = payload["box_id"]
+                taken = bool((payload.get("data") or {}).get("medicine_taken"))
+                if taken and not self._last_taken_flag.get(box_id, False):
+                    rising.append((box_id, payload["recorded_at"]))
+                self._last_taken_flag[box_id] = taken
+        for box_id, at in rising:
+            self.on_confirmation(box_id, at)
+
+    def count_at(self, box_id: str, at: datetime) -> Optional[dict]:
+        snapshot = self.snapshots.find_one(
+            {"box_id": box_id, "at": {"$lte": at}},
+            sort=[("at", DESCENDING)],
+        )
+        if not snapshot:
+            return None
+
+        taken = snapshot["taken_count"]
+        current = snapshot["current_count"]
+        version = snapshot["version"]
+        changes = self.changes.find({
+            "box_id": box_id,
+            "version": {"$gt": version},
+            "at": {"$lte": at},
+        }).sort("version", ASCENDING)
+        for change in changes:
+            if change["reason"] == REASON_REFILL:
+                break
+            current += change["delta"]
+            taken -= change["delta"]
+            version = change["version"]
+
+        return {
+            "box_id": box_id,
+            "at": at,
+            "initial_count": snapshot["initial_count"],
+            "taken_count": taken,
+            "current_count": current,
+            "version": version,
+        }
+
+    def _apply(self, box_id: str, delta: int, reason: str, at: datetime, extra_set: Optional[dict] = None) -> Optional[dict]:
+        update = {
+            "$inc": {
+                "current_count": delta,
+                "taken_count": -delta,
+                "version": 1,
+                "changes_since_snapshot": 1,
+            },
+            "$set": {"last_change_at": at, **(extra_set or {})},
+        }
+        doc = self.inventory.find_one_and_update(
+            {"box_id": box_id},
+            update,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            # Nothing to count against until the box has been filled once.
+            return None
+
+        self.changes.insert_one({
+            "box_id": box_id,
+            "at": at,
+            "delta": delta,
+            "reason": reason,
+            "version": doc["version"],
+        })
+
+        snapshot_at = doc.get("snapshot_at")
+        if (
+            doc.get("changes_since_snapshot", 0) >= self.snapshot_every
+            or (snapshot_at is not None and at - snapshot_at >= self.snapshot_interval)
+        ):
+            self._write_snapshot(doc, at)
+            self.inventory.update_one(
+                {"box_id": box_id, "version": doc["version"]},
+                {"$set": {"changes_since_snapshot": 0, "snapshot_at": at}},
+            )
+        return doc
+
+    def _write_snapshot(self, doc: dict, at: datetime) -> None:
+        self.snapshots.insert_one({
+            "box_id": doc["box_id"],
+            "at": at,
+            "version": doc["version"],
+            "initial_count": doc.get("initial_count", 0),
+            "taken_count": doc.get("taken_count", 0),
+            "current_count": doc.get("current_count", 0),
+        })
@@ -0,0 +1,153 @@
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+EVENT_LID_OPENED = "lid_opened"
+EVENT_LID_CLOSED = "lid_closed"
+
+
+class _LidState:
+    __slots__ = ("threshold", "hysteresis", "is_open", "opened_at", "last_at")
+
+    def __init__(self, threshold: int, hysteresis: int, is_open: bool = False, opened_at: Optional[datetime] = None):
+        self.threshold = threshold
+        self.hysteresis = hysteresis
+        self.is_open = is_open
+        self.opened_at = opened_at
+        self.last_at = opened_at
+
+
+class LidEventDetector:
+    """Turns the LDR stream of each box into lid open/close events.
+
+    The lid counts as open once ``ldr_value >= threshold`` and as closed again
+    only when it drops below ``threshold - hysteresis``, so readings jittering
+    around the threshold do not produce an event per sample. Thresholds can be
+    overridden per box through the ``lid_threshold``/``lid_hysteresis`` fields
+    of its ``mediboxes`` document.
+
+    Events are stored in ``box_events``::
+
+        {box_id, type: "lid_opened", at}
+        {box_id, type: "lid_closed", at, opened_at, duration_seconds}
+    """
+
+    def __init__(self, db, threshold: int = 1000, hysteresis: int = 50):
+        self.events = db["box_events"]
+        self.mediboxes = db["mediboxes"]
+        self.threshold = threshold
+        self.hysteresis = hysteresis
+        self._states: Dict[str, _LidState] = {}
+        self._lock = threading.Lock()
+
+    def ensure_indexes(self) -> None:
+        try:
+            self.events.create_index([("box_id", ASCENDING), ("at", DESCENDING)], background=True)
+            self.events.create_index(
+                [("box_id", ASCENDING), ("type", ASCENDING), ("at", DESCENDING)],
+                background=True,
+            )
+        except OperationFailure:  # pragma: no cover - index already exists with other options
+            pass
+
+    def configure(self, box_id: str, threshold: Optional[int] = None, hysteresis: Optional[int] = None) -> dict:
+        update = {}
+        if threshold is not None:
+            update["lid_threshold"] = int(threshold)
+        if hysteresis is not None:
+            update["lid_hysteresis"] = int(hysteresis)
+        if update:
+            self.mediboxes.update_one({"box_id": box_id}, {"$set": update})
+
+        with self._lock:
+            state = self._state_for(box_id)
+            state.threshold = update.get("lid_threshold", state.threshold)
+            state.hysteresis = update.get("lid_hysteresis", state.hysteresis)
+            return {"box_id": box_id, "threshold": state.threshold, "hysteresis": state.hysteresis}
+
+    def observe(self, payloads: List[dict]) -> List[dict]:
+        """Feed prepared sensor payloads in arrival order and persist any transitions."""
+        detected = []
+        with self._lock:
+            for payload in payloads:
+                event = self._observe_one(payload)
+                if event:
+                    detected.append(event)
+        if detected:
+            self.events.insert_many(detected, ordered=True)
+        return detected
+
+    def is_open(self, box_id: str) -> Optional[bool]:
+        state = self._states.get(box_id)
+        return state.is_open if state else None
+
+    def list_events(
+        self,
+        box_id: str,
+        since: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[dict]:
+        query = {"box_id": box_id}
+        if since is not None:
+            query["at"] = {"$gt": since}
+        if event_type:
+            query["type"] = event_type
+        return list(self.events.find(query).sort("at", DESCENDING).limit(max(limit, 1)))
+
+    def count_openings(self, box_id: str, since: Optional[datetime] = None) -> int:
+        query = {"box_id": box_id, "type": EVENT_LID_OPENED}
+        if since is not None:
+            query["at"] = {"$gt": since}
+        return self.events.count_documents(query)
+
+    def _observe_one(self, payload: dict) -> Optional[dict]:
+        ldr = (payload.get("data") or {}).get("ldr_value")
+        if ldr is None:
+            return None
+        try:
+            ldr = float(ldr)
+        except (TypeError, ValueError):
+            return None
+
+        box_id = payload["box_id"]
+        at = payload["recorded_at"]
+        state = self._state_for(box_id)
+        if state.last_at is not None and at < state.last_at:
+            return None
+        state.last_at = at
+
+        if not state.is_open and ldr >= state.threshold:
+            state.is_open = True
+            state.opened_at = at
+            return {"box_id": box_id, "type": EVENT_LID_OPENED, "at": at, "ldr_value": ldr}
+
+        if state.is_open and ldr < state.threshold - state.hysteresis:
+            opened_at = state.opened_at
+            state.is_open = False
+            state.opened_at = None
+            event = {"box_id": box_id, "type": EVENT_LID_CLOSED, "at": at, "ldr_value": ldr, "opened_at": opened_at}
+            if opened_at is not None:
+                event["duration_seconds"] = round((at - opened_at).total_seconds(), 3)
+            return event
+        return None
+
+    def _state_for(self, box_id: str) -> _LidState:
+        state = self._states.get(box_id)
+        if state is not None:
+            return state
+
+        box = self.mediboxes.find_one({"box_id": box_id}, {"lid_threshold": 1, "lid_hysteresis": 1}) or {}
+        last_event = self.events.find_one({"box_id": box_id}, sort=[("at", DESCENDING)])
+        is_open = bool(last_event and last_event.get("type") == EVENT_LID_OPENED)
+        state = _LidState(
+            threshold=box.get("lid_threshold", self.threshold),
+            hysteresis=box.get("lid_hysteresis", self.hysteresis),
+            is_open=is_open,
+            opened_at=last_event.get("at") if is_open else None,
+        )
+        self._states[box_id] = state
+        return state
@@ -1,18 +1,271 @@
-from datetime import datetime
-from typing import List, Optional
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional
 
 from bson import ObjectId
-from pymongo import ReturnDocument
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from services.archive import SensorArchive
+from services.box_status import BoxStatusCache
+from services.deadband import DeadbandFilter
+from services.ingest_journal import IngestJournal, JournalReplayer
+from services.inventory_service import InventoryService
+from services.lid_events import EVENT_LID_OPENED, LidEventDetector
+from services.presence import FIELD_INTAKE, FIELD_SEEN, FIELD_SENSOR, PresenceTracker
+from services.recent_window import RecentWindowStore, window_reading
+from services.retention import SensorRetention
+from services.rollups import SensorRollupService
+from services.sensor_buckets import SensorBucketStore
+from services.sensor_history import SensorHistoryPlanner
+from services.series_cache import SeriesCache
+from services.sequence_tracker import DUPLICATE, SequenceTracker
+from services.sketches import SensorSketchStore, percentiles
+from utils.pagination import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+STORAGE_DOCUMENTS = "documents"
+STORAGE_BUCKETS = "buckets"
+
+STATUS_STORED = "stored"
+STATUS_SUPPRESSED = "suppressed"
+STATUS_DUPLICATE = "duplicate"
+STATUS_JOURNALED = "journaled"
+DUPLICATE_KEY_ERROR = 11000
+SENSOR_PAGE_MAX = 1000
+
 
 class MediBoxService:
-    def __init__(self, db):
+    def __init__(
+        self,
+        db,
+        storage_mode: str = STORAGE_DOCUMENTS,
+        deadband: Optional[DeadbandFilter] = None,
+        lid_detector: Optional[LidEventDetector] = None,
+        inventory: Optional[InventoryService] = None,
+        sequence_window: Optional[int] = None,
+        journal: Optional[IngestJournal] = None,
+        presence: Optional[PresenceTracker] = None,
+        rollups: Optional[SensorRollupService] = None,
+        sketches: Optional[SensorSketchStore] = None,
+        archive: Optional[SensorArchive] = None,
+        status: Optional[BoxStatusCache] = None,
+    ):
+        if storage_mode not in {STORAGE_DOCUMENTS, STORAGE_BUCKETS}:
+            raise ValueError(f"Unknown sensor storage mode: {storage_mode}")
+
         self.db = db
         self.mediboxes = db["mediboxes"]
         self.sensor_logs = db["sensor_logs"]
         self.intake_logs = db["intake_logs"]
         self.refill_requests = db["refill_requests"]
+        self.storage_mode = storage_mode
+        self.deadband = deadband
+        self.lid_detector = lid_detector
+        self.inventory = inventory
+        self.journal = journal
+        self.journal_replayer = None
+        self.presence = presence
+        self.rollups = rollups
+        self.sketches = sketches
+        self.archive = archive
+        self.status = status
+        self.retention = None
+        self.series_cache = None
+        self.recent_window = None
+        self.history = SensorHistoryPlanner(self)
+        self.sensor_buckets = SensorBucketStore(db)
+        if storage_mode == STORAGE_BUCKETS:
+            self.sensor_buckets.ensure_indexes()
+        else:
+            self._ensure_sensor_indexes()
+
+        self.sensor_sequences = None
+        self.intake_sequences = None
+        if sequence_window:
+            self.sensor_sequences = SequenceTracker(sequence_window, loader=self._sequence_loader(self.sensor_logs))
+            self.intake_sequences = SequenceTracker(sequence_window, loader=self._sequence_loader(self.intake_logs))
+            self._ensure_sequence_indexes()
+
+    @classmethod
+    def from_config(cls, db, config=None) -> "MediBoxService":
+        """Build the service and its optional ingest collaborators from app config."""
+        config = config or {}
+
+        deadband = None
+        if config.get("SENSOR_DEADBAND_ENABLED"):
+            deadband = DeadbandFilter(
+                tolerances={
+                    "temperature": config.get("SENSOR_DEADBAND_TEMPERATURE", 0.5),
+                    "humidity": config.get("SENSOR_DEADBAND_HUMIDITY", 2.0),
+                    "ldr_value": config.get("SENSOR_DEADBAND_LDR", 50),
+                },
+                heartbeat_interval=timedelta(seconds=config.get("SENSOR_HEARTBEAT_SECONDS", 600)),
+            )
+
+        lid_detector = None
+        if config.get("LID_EVENTS_ENABLED"):
+            lid_detector = LidEventDetector(
+                db,
+                threshold=config.get("LID_LDR_THRESHOLD", 1000),
+                hysteresis=config.get("LID_LDR_HYSTERESIS", 50),
+            )
+            lid_detector.ensure_indexes()
+
+        inventory = None
+        if config.get("INVENTORY_ENABLED"):
+            inventory = InventoryService(
+                db,
+                snapshot_every=config.get("INVENTORY_SNAPSHOT_EVERY", 50),
+                snapshot_interval=timedelta(hours=config.get("INVENTORY_SNAPSHOT_HOURS", 24)),
+            )
+            inventory.ensure_indexes()
+
+        journal = None
+        if config.get("INGEST_JOURNAL_ENABLED"):
+            journal = IngestJournal(
+                config.get("INGEST_JOURNAL_DIR", "data/ingest-journal"),
+                segment_bytes=config.get("INGEST_JOURNAL_SEGMENT_MB", 16) * 1024 * 1024,
+                fsync=config.get("INGEST_JOURNAL_FSYNC", False),
+            )
+
+        presence = None
+        if config.get("PRESENCE_TRACKING_ENABLED"):
+            presence = PresenceTracker(db, flush_interval=config.get("PRESENCE_FLUSH_SECONDS", 5.0))
+            presence.load()
+
+        rollups = None
+        if config.get("ROLLUPS_ENABLED"):
+            rollups = SensorRollupService(db, minute_retention_days=config.get("ROLLUP_MINUTE_RETENTION_DAYS", 7))
+            rollups.ensure_indexes()
+
+        sketches = None
+        if config.get("SENSOR_SKETCHES_ENABLED"):
+            sketches = SensorSketchStore(db, compression=config.get("SENSOR_SKETCH_COMPRESSION", 100))
+            sketches.ensure_indexes()
+
+        status = None
+        if config.get("BOX_STATUS_ENABLED"):
+            status = BoxStatusCache(db, ttl=config.get("BOX_STATUS_CACHE_SECONDS", 5.0))
+
+        archive = None
+        storage_mode = config.get("SENSOR_STORAGE_MODE", STORAGE_DOCUMENTS)
+        if config.get("SENSOR_RETENTION_DAYS") and storage_mode == STORAGE_DOCUMENTS:
+            archive = SensorArchive(config.get("SENSOR_ARCHIVE_DIR", "data/sensor-archive"))
+
+        service = cls(
+            db,
+            storage_mode=storage_mode,
+            deadband=deadband,
+            lid_detector=lid_detector,
+            inventory=inventory,
+            sequence_window=config.get("SEQUENCE_WINDOW", 64) if config.get("SEQUENCE_TRACKING_ENABLED") else None,
+            journal=journal,
+            presence=presence,
+            rollups=rollups,
+            sketches=sketches,
+            archive=archive,
+            status=status,
+        )
+        if config.get("RECENT_WINDOW_ENABLED") and not config.get("INGEST_WORKERS"):
+            service.recent_window = RecentWindowStore(
+                service.iter_sensor_readings,
+                hours=config.get("RECENT_WINDOW_HOURS", 24),
+                capacity=config.get("RECENT_WINDOW_CAPACITY", 8640),
+                max_boxes=config.get("RECENT_WINDOW_MAX_BOXES", 256),
+            )
+        if config.get("SERIES_CACHE_ENABLED") and not config.get("INGEST_WORKERS"):
+            # Worker processes would append to files this process owns.
+            service.series_cache = SeriesCache(
+                config.get("SERIES_CACHE_DIR", "data/series-cache"),
+                service.iter_sensor_readings,
+                window_days=config.get("SERIES_CACHE_DAYS", 30),
+                max_boxes=config.get("SERIES_CACHE_MAX_BOXES", 256),
+            )
+        if archive is not None:
+            service.retention = SensorRetention(
+                service.sensor_logs,
+                archive,
+                hot_days=config["SENSOR_RETENTION_DAYS"],
+                interval=config.get("SENSOR_RETENTION_INTERVAL", 3600.0),
+            )
+        if journal is not None:
+            service.journal_replayer = JournalReplayer(
+                journal,
+                service.replay_sensor_payloads,
+                batch_size=config.get("INGEST_JOURNAL_REPLAY_BATCH", 1000),
+                interval=config.get("INGEST_JOURNAL_REPLAY_INTERVAL", 5.0),
+            )
+        return service
+
+    def _sequence_loader(self, collection):
+        def load_high_water(box_id: str) -> Optional[int]:
+            doc = collection.find_one(
+                {"box_id": box_id, "seq": {"$exists": True}},
+                {"seq": 1},
+                sort=[("seq", DESCENDING)],
+            )
+            return doc["seq"] if doc else None
+        return load_high_water
+
+    def _ensure_sensor_indexes(self) -> None:
+        # Serves the per-box time-range pages of page_sensor_readings; _id is
+        # the keyset tiebreaker, so the sort never happens in memory.
+        try:
+            self.sensor_logs.create_index(
+                [("box_id", ASCENDING), ("recorded_at", DESCENDING), ("_id", DESCENDING)],
+                background=True,
+            )
+        except OperationFailure:  # pragma: no cover - index already exists with other options
+            pass
+
+    def _ensure_sequence_indexes(self) -> None:
+        # Backstop for retries that fall outside the in-memory window (or
+        # arrive while another worker still holds the box in memory).
+        for collection in (self.sensor_logs, self.intake_logs):
+            try:
+                collection.create_index(
+                    [("box_id", ASCENDING), ("seq", ASCENDING)],
+                    unique=True,
+                    partialFilterExpression={"seq": {"$exists": True}},
+                    background=True,
+                )
+            except OperationFailure:  # pragma: no cover - index already exists with other options
+                pass
+
+    @staticmethod
+    def _parse_seq(value) -> Optional[int]:
+        if value is None:
+            return None
+        if isinstance(value, bool):
+            raise ValueError("seq must be a non-negative integer")
+        try:
+            seq = int(value)
+        except (TypeError, ValueError) as exc:
+            raise ValueError("seq must be a non-negative integer") from exc
+        if seq < 0:
+            raise ValueError("seq must be a non-negative integer")
+        return seq
+
+    @staticmethod
+    def _is_duplicate(tracker: Optional[SequenceTracker], box_id: Optional[str], seq: Optional[int]) -> bool:
+        if tracker is None or seq is None or not box_id:
+            return False
+        # Stale numbers (older than the window) go on to the write, where the
+        # unique (box_id, seq) index decides.
+        return tracker.check(box_id, seq) == DUPLICATE
+
+    @staticmethod
+    def _forget_seqs(tracker: Optional[SequenceTracker], payloads: List[dict]) -> None:
+        """Un-record the sequence numbers of payloads whose write failed."""
+        if tracker is None:
+            return
+        for payload in payloads:
+            if payload.get("seq") is not None and payload.get("box_id"):
+                tracker.forget(payload["box_id"], payload["seq"])
 
     @staticmethod
     def _serialize(doc: dict) -> dict:
@@ -66,28 +319,540 @@ class MediBoxService:
         record = self.mediboxes.find_one({"box_id": box_id})
         return self._serialize(record)
 
-    def record_sensor_data(self, box_id: str, sensor_data: dict) -> dict:
+    @staticmethod
+    def build_sensor_payload(box_id: str, sensor_data: dict, recorded_at: Optional[datetime] = None) -> dict:
         if not box_id:
             raise ValueError("box_id is required")
+        if not isinstance(sensor_data, dict):
+            raise ValueError("sensor_data must be an object")
         payload = {
             "box_id": box_id,
             "data": sensor_data,
-            "recorded_at": datetime.utcnow(),
+            "recorded_at": recorded_at or datetime.utcnow(),
         }
-        result = self.sensor_logs.insert_one(payload)
-        payload["_id"] = result.inserted_id
-        self.mediboxes.update_one(
-            {"box_id": box_id},
-            {"$set": {"last_sensor_at": datetime.utcnow()}}
-        )
+        seq = MediBoxService._parse_seq(sensor_data.get("seq"))
+        if seq is not None:
+            payload["seq"] = seq
+        return payload
+
+    def record_sensor_data(self, box_id: str, sensor_data: dict) -> dict:
+        payload = self.build_sensor_payload(box_id, sensor_data)
+        status = self.persist_sensor_payloads([payload])[0]
+        if status == STATUS_SUPPRESSED:
+            payload["suppressed"] = True
+        elif status == STATUS_DUPLICATE:
+            payload["duplicate"] = True
+        elif status == STATUS_JOURNALED:
+            payload["journaled"] = True
         return self._serialize(payload)
 
+    def _observe_sensor_payloads(self, payloads: List[dict]) -> List[dict]:
+        """Derive state from every incoming reading, stored or not; returns the lid events."""
+        events = self.lid_detector.observe(payloads) if self.lid_detector is not None else []
+        if self.inventory is not None:
+            for event in events:
+                if event["type"] == EVENT_LID_OPENED:
+                    self._update_pill_count(self.inventory.on_lid_opened(event["box_id"], event["at"]), event["at"])
+            self.inventory.observe_readings(payloads)
+        if self.status is not None:
+            self.status.observe(payloads, events)
+        return events
+
+    def _update_pill_count(self, doc: Optional[dict], at: datetime) -> None:
+        if doc is not None and self.status is not None:
+            self.status.set_pill_count(doc["box_id"], doc.get("current_count", 0), at)
+
+    def _should_store(self, payload: dict) -> bool:
+        if self.deadband is None:
+            return True
+        return self.deadband.should_store(payload["box_id"], payload["data"], payload["recorded_at"])
+
+    def record_sensor_batch(self, readings: List[dict]) -> List[dict]:
+        """Persist many readings with one insert and one update per box.
+
+        Each reading is either ``{"box_id": ..., "sensor_data": {...}}`` or a
+        flat sensor payload carrying its own ``box_id``, mirroring what
+        ``/api/send_data`` accepts. Invalid items are rejected individually and
+        never block the rest of the batch.
+        """
+        results: List[dict] = [None] * len(readings)
+        accepted = []
+        now = datetime.utcnow()
+
+        for index, item in enumerate(readings):
+            if not isinstance(item, dict):
+                results[index] = {"index": index, "status": "rejected", "error": "reading must be an object"}
+                continue
+            try:
+                payload = self.build_sensor_payload(
+                    item.get("box_id"),
+                    item.get("sensor_data") or item,
+                    recorded_at=now,
+                )
+            except ValueError as exc:
+                results[index] = {"index": index, "status": "rejected", "error": str(exc)}
+                continue
+            accepted.append((index, payload))
+
+        if not accepted:
+            return results
+
+        statuses = self.persist_sensor_payloads([payload for _, payload in accepted])
+        for (index, payload), status in zip(accepted, statuses):
+            results[index] = {
+                "index": index,
+                "status": "accepted" if status == STATUS_STORED else status,
+                "id": str(payload["_id"]) if "_id" in payload else None,
+                "box_id": payload["box_id"],
+            }
+        return results
+
+    def persist_sensor_payloads(self, payloads: List[dict]) -> List[str]:
+        """Write prepared sensor payloads (see ``build_sensor_payload``) in bulk.
+
+        Returns one status per payload: ``stored``, ``suppressed`` (inside the
+        deadband, still counts as a sign of life for the box), ``duplicate``
+        (a retried sequence number, dropped before any write) or ``journaled``
+        (Mongo was unavailable and the reading went to the local journal).
+        Only readings whose write failed are journaled; derived state
+        (rollups, sketches, caches, last-seen) is best effort once the
+        readings are stored.
+        """
+        statuses = [STATUS_STORED] * len(payloads)
+        fresh = []
+        for position, payload in enumerate(payloads):
+            if self._is_duplicate(self.sensor_sequences, payload["box_id"], payload.get("seq")):
+                statuses[position] = STATUS_DUPLICATE
+            else:
+                fresh.append((position, payload))
+        if not fresh:
+            return statuses
+
+        events = []
+        try:
+            events = self._observe_sensor_payloads([payload for _, payload in fresh])
+        except PyMongoError:
+            if self.journal is None:
+                self._forget_seqs(self.sensor_sequences, [payload for _, payload in fresh])
+                raise
+            logger.exception("Lid, inventory or status update failed; storing the readings anyway")
+
+        stored = []
+        for position, payload in fresh:
+            if self._should_store(payload):
+                stored.append((position, payload))
+            else:
+                statuses[position] = STATUS_SUPPRESSED
+
+        batch = [payload for _, payload in stored]
+        try:
+            duplicates, failed = self._write_sensor_payloads(batch), []
+        except BulkWriteError as exc:
+            if self.journal is None:
+                self._forget_seqs(self.sensor_sequences, [payload for _, payload in fresh])
+                raise
+            # Unordered insert: everything without a write error was stored.
+            errors = exc.details.get("writeErrors", [])
+            duplicates = [error["index"] for error in errors if error.get("code") == DUPLICATE_KEY_ERROR]
+            failed = [error["index"] for error in errors if error.get("code") != DUPLICATE_KEY_ERROR]
+            for index in duplicates:
+                batch[index].pop("_id", None)
+        except PyMongoError:
+            if self.journal is None:
+                # Nothing was kept, so the device's retry must not be answered
+                # as a duplicate; anything that did get stored is caught by
+                # the unique (box_id, seq) index on the retry.
+                self._forget_seqs(self.sensor_sequences, [payload for _, payload in fresh])
+                raise
+            # Outcome unknown: replay skips documents whose _id already landed.
+            duplicates, failed = [], list(range(len(batch)))
+
+        for index in duplicates:
+            statuses[stored[index][0]] = STATUS_DUPLICATE
+        if failed:
+            self.journal.append([batch[index] for index in failed])
+            for index in failed:
+                statuses[stored[index][0]] = STATUS_JOURNALED
+
+        written = [payload for position, payload in stored if statuses[position] == STATUS_STORED]
+        try:
+            self._after_sensor_write(written, events)
+            self._touch_sensor_boxes([payload for position, payload in fresh if statuses[position] != STATUS_JOURNALED])
+        except PyMongoError:
+            logger.exception("Derived sensor state failed to update for %d stored readings", len(written))
+        return statuses
+
+    def _after_sensor_write(self, written: List[dict], events: Iterable[dict] = ()) -> None:
+        if self.rollups is not None:
+            self.rollups.observe(written, events)
+        if self.sketches is not None:
+            self.sketches.observe(written)
+        if self.series_cache is not None:
+            self.series_cache.append(written)
+        if self.recent_window is not None:
+            self.recent_window.observe(written)
+
+    def replay_sensor_payloads(self, payloads: List[dict]) -> int:
+        """Write journaled payloads straight to storage; returns how many were new.
+
+        Sequence, lid and deadband processing already happened at ingest, so
+        only the write and the ``last_sensor_at`` update are repeated. Payloads
+        that carry the ``_id`` of an earlier, partially successful attempt are
+        skipped as duplicates.
+        """
+        if not payloads:
+            return 0
+        duplicates = set(self._write_sensor_payloads(payloads))
+        written = [payload for index, payload in enumerate(payloads) if index not in duplicates]
+        self._after_sensor_write(written)
+        self._touch_sensor_boxes(payloads)
+        return len(payloads) - len(duplicates)
+
+    def _write_sensor_payloads(self, payloads: List[dict]) -> List[int]:
+        """Store payloads; returns the indexes rejected by a unique index."""
+        if not payloads:
+            return []
+        if self.storage_mode == STORAGE_BUCKETS:
+            self.sensor_buckets.append(payloads)
+            return []
+        try:
+            self.sensor_logs.insert_many(payloads, ordered=False)
+        except BulkWriteError as exc:
+            errors = exc.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            for error in errors:
+                payloads[error["index"]].pop("_id", None)
+            return [error["index"] for error in errors]
+        return []
+
+    def _touch_sensor_boxes(self, payloads: List[dict]) -> None:
+        if self.presence is not None:
+            for payload in payloads:
+                self.presence.touch(payload["box_id"], FIELD_SENSOR, payload["recorded_at"])
+            return
+
+        last_seen = {}
+        for payload in payloads:
+            box_id = payload["box_id"]
+            last_seen[box_id] = max(last_seen.get(box_id, payload["recorded_at"]), payload["recorded_at"])
+
+        self.mediboxes.bulk_write(
+            [
+                UpdateOne({"box_id": box_id}, {"$set": {FIELD_SENSOR: seen_at}})
+                for box_id, seen_at in last_seen.items()
+            ],
+            ordered=False,
+        )
+
+    def list_sensor_readings(
+        self,
+        box_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 500,
+    ) -> List[dict]:
+        """Newest-first readings of one box, regardless of the storage mode."""
+        if not box_id:
+            raise ValueError("box_id is required")
+        limit = max(limit, 1)
+
+        if self.storage_mode == STORAGE_BUCKETS:
+            readings = []
+            for reading in self.sensor_buckets.iter_readings(box_id, start, end, descending=True):
+                readings.append(self._serialize(reading))
+                if len(readings) >= limit:
+                    break
+            return readings
+
+        query = {"box_id": box_id}
+        bounds = {}
+        if start is not None:
+            bounds["$gte"] = start
+        if end is not None:
+            bounds["$lt"] = end
+        if bounds:
+            query["recorded_at"] = bounds
+        docs = self.sensor_logs.find(query).sort("recorded_at", -1).limit(limit)
+        return [self._serialize(doc) for doc in docs]
+
+    def iter_sensor_readings(
+        self,
+        box_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[dict]:
+        """Stream a box's stored readings oldest first, archived ones included."""
+        if self.archive is not None:
+            yield from heapq.merge(
+                self.archive.iter_readings(box_id, start, end),
+                self._iter_hot_sensor_readings(box_id, start, end),
+                key=lambda reading: reading["recorded_at"],
+            )
+            return
+        yield from self._iter_hot_sensor_readings(box_id, start, end)
+
+    def _iter_hot_sensor_readings(
+        self,
+        box_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[dict]:
+        if self.storage_mode == STORAGE_BUCKETS:
+            yield from self.sensor_buckets.iter_readings(box_id, start, end)
+            return
+        query = {"box_id": box_id}
+        bounds = {}
+        if start is not None:
+            bounds["$gte"] = start
+        if end is not None:
+            bounds["$lt"] = end
+        if bounds:
+            query["recorded_at"] = bounds
+        cursor = (
+            self.sensor_logs.find(query, {"box_id": 1, "seq": 1, "data": 1, "recorded_at": 1})
+            .sort("recorded_at", ASCENDING)
+            .batch_size(2000)
+        )
+        yield from cursor
+
+    def page_sensor_readings(
+        self,
+        box_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        fields: Optional[List[str]] = None,
+        limit: int = 200,
+        cursor: Optional[str] = None,
+        descending: bool = True,
+    ) -> dict:
+        """One page of a box's readings in ``start <= recorded_at < end``.
+
+        Pages are keyset-paginated on ``(recorded_at, _id)``: ``cursor`` is the
+        ``next_cursor`` of the previous page, so each page costs one index
+        range scan of ``limit`` entries and readings inserted meanwhile never
+        shift or repeat earlier results. ``fields`` limits the returned
+        ``data`` keys.
+        """
+        if not box_id:
+            raise ValueError("box_id is required")
+        limit = min(max(int(limit), 1), SENSOR_PAGE_MAX)
+        after_at, after_key = decode_cursor(cursor)
+        if fields is not None:
+            invalid = [field for field in fields if not field.isidentifier()]
+            if invalid:
+                raise ValueError(f"unknown fields: {', '.join(invalid)}")
+
+        if self.storage_mode == STORAGE_BUCKETS:
+            items, last = self._page_bucket_readings(box_id, start, end, limit, after_at, after_key, descending)
+        else:
+            items, last = self._page_sensor_logs(box_id, start, end, fields, limit, after_at, after_key, descending)
+
+        if fields is not None:
+            for item in items:
+                item["data"] = {key: value for key, value in item.get("data", {}).items() if key in fields}
+        return {
+            "box_id": box_id,
+            "items": [self._serialize(item) for item in items],
+            "next_cursor": encode_cursor(*last) if last else None,
+        }
+
+    def _page_sensor_logs(self, box_id, start, end, fields, limit, after_at, after_id, descending):
+        bounds = {}
+        if start is not None:
+            bounds["$gte"] = start
+        if end is not None:
+            bounds["$lt"] = end
+        query = {"box_id": box_id}
+        if bounds:
+            query["recorded_at"] = bounds
+        if after_at is not None:
+            try:
+                after_id = ObjectId(after_id)
+            except (TypeError, ValueError) as exc:
+                raise ValueError("cursor is invalid") from exc
+            beyond = "$lt" if descending else "$gt"
+            query["$or"] = [
+                {"recorded_at": {beyond: after_at}},
+                {"recorded_at": after_at, "_id": {beyond: after_id}},
+            ]
+
+        projection = None
+        if fields is not None:
+            projection = {"box_id": 1, "recorded_at": 1, "seq": 1, **{f"data.{field}": 1 for field in fields}}
+        direction = DESCENDING if descending else ASCENDING
+        docs = list(
+            self.sensor_logs.find(query, projection)
+            .sort([("recorded_at", direction), ("_id", direction)])
+            .limit(limit + 1)
+        )
+        if len(docs) <= limit:
+            return docs, None
+        docs = docs[:limit]
+        return docs, (docs[-1]["recorded_at"], str(docs[-1]["_id"]))
+
+    def _page_bucket_readings(self, box_id, start, end, limit, after_at, after_count, descending):
+        # Bucketed readings have no _id: the tiebreaker is how many readings
+        # with exactly ``after_at`` the previous pages already returned.
+        skip_at = 0
+        if after_at is not None:
+            if not isinstance(after_count, int):
+                raise ValueError("cursor is invalid")
+            skip_at = after_count
+            # Mongo stores milliseconds, so bound the bucket scan loosely and
+            # drop readings on the wrong side of the cursor here.
+            if descending:
+                upper = after_at + timedelta(milliseconds=1)
+                end = min(end, upper) if end else upper
+            else:
+                start = max(start, after_at) if start else after_at
+
+        items = []
+        for reading in self.sensor_buckets.iter_readings(box_id, start, end, descending=descending):
+            if after_at is not None and (reading["recorded_at"] > after_at if descending
+                                         else reading["recorded_at"] < after_at):
+                continue
+            if skip_at and reading["recorded_at"] == after_at:
+                skip_at -= 1
+                continue
+            items.append(reading)
+            if len(items) > limit:
+                break
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        last_at = items[-1]["recorded_at"]
+        ties = sum(1 for item in items if item["recorded_at"] == last_at)
+        if after_at == last_at:
+            ties += after_count
+        return items, (last_at, ties)
+
+    def query_sensor_history(
+        self,
+        box_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        max_points: int = 500,
+    ) -> dict:
+        """Sensor series for charts, served from raw data or rollups (see ``SensorHistoryPlanner``)."""
+        result = self.history.query(box_id, start, end, max_points)
+        result["points"] = [self._serialize(point) for point in result["points"]]
+        return self._serialize(result)
+
+    def recent_sensor_readings(self, box_id: str, hours: float = 24) -> dict:
+        """Readings of the last ``hours``, from the in-memory window when it covers them."""
+        if not box_id:
+            raise ValueError("box_id is required")
+        if hours <= 0:
+            raise ValueError("hours must be positive")
+        now = datetime.utcnow()
+        since = now - timedelta(hours=hours)
+        readings = self.recent_window.recent(box_id, since, now) if self.recent_window is not None else None
+        source = "memory"
+        if readings is None:
+            readings = [window_reading(box_id, reading) for reading in self.iter_sensor_readings(box_id, since, None)]
+            source = "database"
+        return {
+            "box_id": box_id,
+            "from": since.isoformat(),
+            "source": source,
+            "readings": [self._serialize(reading) for reading in readings],
+        }
+
+    def latest_sensor_reading(self, box_id: str) -> Optional[dict]:
+        if self.recent_window is not None:
+            latest = self.recent_window.latest(box_id)
+            if latest is not None:
+                return self._serialize(latest)
+        if self.storage_mode == STORAGE_BUCKETS:
+            latest = next(self.sensor_buckets.iter_readings(box_id, descending=True), None)
+        else:
+            latest = self.sensor_logs.find_one({"box_id": box_id}, sort=[("recorded_at", DESCENDING)])
+        return self._serialize(window_reading(box_id, latest)) if latest else None
+
+    def sensor_percentiles(
+        self,
+        box_id: str,
+        metric: str,
+        quantiles: List[float],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> dict:
+        """Percentiles of one metric over whole hours overlapping ``[start, end)``."""
+        if self.sketches is None:
+            raise RuntimeError("Sensor sketches are disabled")
+        if not quantiles:
+            raise ValueError("at least one quantile is required")
+        if any(not 0 <= q <= 1 for q in quantiles):
+            raise ValueError("quantiles must be between 0 and 1")
+        digest, hours = self.sketches.merged(box_id, metric, start, end)
+        return {
+            "box_id": box_id,
+            "metric": metric,
+            "count": digest.count,
+            "hours": hours,
+            "min": digest.min if digest.count else None,
+            "max": digest.max if digest.count else None,
+            "percentiles": percentiles(digest, quantiles),
+        }
+
+    def list_sensor_rollups(
+        self,
+        box_id: str,
+        resolution: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[dict]:
+        if self.rollups is None:
+            raise RuntimeError("Sensor rollups are disabled")
+        return [self._serialize(doc) for doc in self.rollups.query(box_id, resolution, start, end)]
+
+    def list_box_events(
+        self,
+        box_id: str,
+        since: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[dict]:
+        if not box_id:
+            raise ValueError("box_id is required")
+        if self.lid_detector is None:
+            return []
+        events = self.lid_detector.list_events(box_id, since=since, event_type=event_type, limit=limit)
+        return [self._serialize(event) for event in events]
+
+    def get_inventory(self, box_id: str, at: Optional[datetime] = None) -> Optional[dict]:
+        if not box_id:
+            raise ValueError("box_id is required")
+        if self.inventory is None:
+            return None
+        doc = self.inventory.count_at(box_id, at) if at is not None else self.inventory.get(box_id)
+        if not doc:
+            return None
+        data = self._serialize(doc)
+        data.pop("changes_since_snapshot", None)
+        data["remaining"] = max(0, doc.get("current_count", 0))
+        return data
+
+    def refill_inventory(self, box_id: str, count) -> dict:
+        if not box_id:
+            raise ValueError("box_id is required")
+        if self.inventory is None:
+            raise ValueError("inventory tracking is disabled")
+        try:
+            count = int(count)
+        except (TypeError, ValueError) as exc:
+            raise ValueError("count must be a non-negative integer") from exc
+        self._update_pill_count(self.inventory.refill(box_id, count), datetime.utcnow())
+        return self.get_inventory(box_id)
+
     def log_intake(
         self,
         medicine_id: Optional[str],
         confirmed: bool,
         user_id: Optional[str] = None,
         box_id: Optional[str] = None,
+        seq=None,
     ) -> dict:
         entry = {
             "medicine_id": medicine_id,
@@ -97,13 +862,27 @@ class MediBoxService:
             "taken_at": datetime.utcnow(),
             "status": "taken" if confirmed else "skipped",
         }
-        result = self.intake_logs.insert_one(entry)
+        seq = self._parse_seq(seq)
+        if seq is not None:
+            entry["seq"] = seq
+        if self._is_duplicate(self.intake_sequences, box_id, seq):
+            entry["duplicate"] = True
+            return self._serialize(entry)
+
+        try:
+            result = self.intake_logs.insert_one(entry)
+        except DuplicateKeyError:
+            entry.pop("_id", None)
+            entry["duplicate"] = True
+            return self._serialize(entry)
+        except PyMongoError:
+            self._forget_seqs(self.intake_sequences, [entry])
+            raise
         entry["_id"] = result.inserted_id
+        if box_id and entry["confirmed"] and self.inventory is not None:
+            self._update_pill_count(self.inventory.on_confirmation(box_id, entry["taken_at"]), entry["taken_at"])
         if box_id:
-            self.mediboxes.update_one(
-                {"box_id": box_id},
-                {"$set": {"last_intake_at": datetime.utcnow()}}
-            )
+            self._touch(box_id, FIELD_INTAKE)
         return self._serialize(entry)
 
     def list_adherence_logs(
@@ -220,6 +999,42 @@ class MediBoxService:
 
         return self._serialize(result)
 
+    def _touch(self, box_id: str, field: str) -> None:
+        if self.status is not None:
+            self.status.seen(box_id, datetime.utcnow())
+        if self.presence is not None:
+            self.presence.touch(box_id, field)
+        else:
+            self.mediboxes.update_one({"box_id": box_id}, {"$set": {field: datetime.utcnow()}})
+
+    def get_box_status(self, box_id: str) -> Optional[dict]:
+        """Current status of one box: latest reading, lid state, pill count and last-seen time."""
+        if self.status is None:
+            raise RuntimeError("Box status tracking is disabled")
+        if not box_id:
+            raise ValueError("box_id is required")
+        doc = self.status.get(box_id)
+        if doc is None:
+            return None
+        latest = doc.get("latest")
+        if latest:
+            latest = self._serialize(latest)
+        return self._serialize({
+            "box_id": box_id,
+            "latest": latest,
+            "lid_state": doc.get("lid_state"),
+            "lid_changed_at": doc.get("lid_changed_at"),
+            "pill_count": doc.get("pill_count"),
+            "last_seen_at": doc.get("last_seen_at"),
+        })
+
+    def list_silent_boxes(self, minutes: int) -> List[dict]:
+        if self.presence is None:
+            raise RuntimeError("Presence tracking is disabled")
+        if minutes <= 0:
+            raise ValueError("minutes must be positive")
+        return [self._serialize(item) for item in self.presence.silent_boxes(timedelta(minutes=minutes))]
+
     def get_box(self, box_id: str) -> Optional[dict]:
         if not box_id:
             return None
@@ -238,10 +1053,7 @@ class MediBoxService:
 
         stored_hash = record.get("box_secret_hash")
         if stored_hash and check_password_hash(stored_hash, provided_token):
-            self.mediboxes.update_one(
-                {"box_id": box_id},
-                {"$set": {"last_seen_at": datetime.utcnow()}}
-            )
+            self._touch(box_id, FIELD_SEEN)
             return self._serialize(record)
 
         legacy_secret = record.get("box_secret") or record.get("box_token")
@@ -249,11 +1061,11 @@ class MediBoxService:
             self.mediboxes.update_one(
                 {"box_id": box_id},
                 {"$set": {
-                    "last_seen_at": datetime.utcnow(),
                     "box_secret_hash": generate_password_hash(legacy_secret),
                     "box_secret": None,
                 }}
             )
+            self._touch(box_id, FIELD_SEEN)
             refreshed = self.mediboxes.find_one({"box_id": box_id})
             return self._serialize(refreshed)
 
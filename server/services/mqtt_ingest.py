@@ -0,0 +1,202 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from services.sensor_buffer import POLICY_DROP_OLDEST, BufferFullError, SensorWriteBuffer
+from utils.telemetry_frame import decode_sensor_message
+
+logger = logging.getLogger(__name__)
+
+SENSOR_TOPIC_PREFIX = "medibox/data/"
+
+
+class MqttSensorIngestor:
+    """Moves MQTT sensor messages from the paho thread into bulk writes.
+
+    The paho callback only calls ``submit``, which puts the raw bytes on a
+    bounded queue and returns. ``workers`` threads decode the messages (JSON
+    or binary telemetry frames) and feed a ``SensorWriteBuffer`` that persists
+    micro-batches through ``MediBoxService.persist_sensor_payloads`` - the
+    same service layer the HTTP routes use. With an ``ingest_pool``
+    (``INGEST_WORKERS``), decoded readings are instead handed to the worker
+    owning each box, so a box's ingest state only ever lives in one process.
+
+    The box_id always comes from the topic (``medibox/data/<box_id>``); a
+    box_id inside the payload is ignored. ``limiter`` is the same per-box
+    token bucket the HTTP sensor routes use, charged once per message.
+    """
+
+    def __init__(
+        self,
+        medibox_service,
+        workers: int = 2,
+        queue_size: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 0.5,
+        ingest_pool=None,
+        limiter=None,
+    ):
+        self.medibox_service = medibox_service
+        self.workers = max(int(workers), 1)
+        self.ingest_pool = ingest_pool
+        self.limiter = limiter
+        self._raw = queue.Queue(maxsize=max(int(queue_size), 1))
+        self.buffer = None
+        if ingest_pool is None:
+            self.buffer = SensorWriteBuffer(
+                medibox_service.persist_sensor_payloads,
+                max_size=max(int(queue_size), 1),
+                flush_size=batch_size,
+                flush_interval=flush_interval,
+                policy=POLICY_DROP_OLDEST,
+                overflow_fn=medibox_service.journal.append if medibox_service.journal is not None else None,
+            )
+        self._threads: List[threading.Thread] = []
+        self._counter_lock = threading.Lock()
+
+        self.received = 0
+        self.dropped = 0
+        self.decoded = 0
+        self.decode_errors = 0
+        self.throttled = 0
+        self.max_lag_ms = 0.0
+        self.last_lag_ms = 0.0
+
+    def start(self) -> "MqttSensorIngestor":
+        if self._threads:
+            return self
+        if self.buffer is not None:
+            self.buffer.start()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"mqtt-ingest-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        atexit.register(self.close)
+        return self
+
+    def submit(self, topic: str, payload: bytes) -> bool:
+        """Queue one raw MQTT message; returns False when it had to be dropped."""
+        try:
+            self._raw.put_nowait((topic, payload, time.monotonic()))
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped += 1
+            return False
+        with self._counter_lock:
+            self.received += 1
+        return True
+
+    def drain(self) -> None:
+        """Decode everything queued so far and flush it (used on shutdown and in tests)."""
+        while True:
+            try:
+                item = self._raw.get_nowait()
+            except queue.Empty:
+                break
+            self._handle(*item)
+            self._raw.task_done()
+        if self.buffer is not None:
+            self.buffer.flush()
+
+    def close(self) -> None:
+        for _ in self._threads:
+            self._raw.put((None, None, None))
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        self.drain()
+        if self.buffer is not None:
+            self.buffer.close()
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "decoded": self.decoded,
+            "decode_errors": self.decode_errors,
+            "throttled": self.throttled,
+            "raw_queue_depth": self._raw.qsize(),
+            "last_lag_ms": round(self.last_lag_ms, 3),
+            "max_lag_ms": round(self.max_lag_ms, 3),
+            "buffer": self.buffer.stats() if self.buffer is not None else None,
+        }
+
+    def _work(self) -> None:
+        while True:
+            topic, payload, received_at = self._raw.get()
+            try:
+                if topic is None:
+                    return
+                self._handle(topic, payload, received_at)
+            finally:
+                self._raw.task_done()
+
+    def _handle(self, topic: str, payload: bytes, received_at: float) -> None:
+        lag_ms = (time.monotonic() - received_at) * 1000
+        try:
+            readings = self._decode(topic, payload)
+        except ValueError as exc:
+            with self._counter_lock:
+                self.decode_errors += 1
+            logger.warning("Dropping undecodable MQTT message on %s: %s", topic, exc)
+            return
+        if self.limiter is not None and not self.limiter.acquire(readings[0]["box_id"])[0]:
+            with self._counter_lock:
+                self.throttled += 1
+            return
+
+        if self.ingest_pool is not None:
+            self._submit_to_workers(topic, readings)
+        else:
+            self._buffer(readings)
+        with self._counter_lock:
+            self.decoded += len(readings)
+            self.last_lag_ms = lag_ms
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+
+    def _buffer(self, readings: List[dict]) -> None:
+        for reading in readings:
+            try:
+                prepared = self.medibox_service.build_sensor_payload(
+                    reading.get("box_id"),
+                    reading.get("sensor_data") or reading,
+                )
+            except ValueError:
+                with self._counter_lock:
+                    self.decode_errors += 1
+                continue
+            self.buffer.submit(prepared)
+
+    def _submit_to_workers(self, topic: str, readings: List[dict]) -> None:
+        groups: Dict[str, List[dict]] = {}
+        for reading in readings:
+            if not reading.get("box_id"):
+                with self._counter_lock:
+                    self.decode_errors += 1
+                continue
+            groups.setdefault(reading["box_id"], []).append(reading)
+        for box_id, group in groups.items():
+            try:
+                self.ingest_pool.submit(box_id, json.dumps(group).encode())
+            except BufferFullError:
+                with self._counter_lock:
+                    self.dropped += 1
+                logger.warning("Ingest worker queue full, dropped MQTT message on %s", topic)
+
+    @staticmethod
+    def _decode(topic: str, payload: bytes) -> List[dict]:
+        topic_box_id: Optional[str] = None
+        if topic.startswith(SENSOR_TOPIC_PREFIX):
+            topic_box_id = topic[len(SENSOR_TOPIC_PREFIX):].split("/", 1)[0] or None
+        if topic_box_id is None:
+            raise ValueError("sensor topics must name the box: medibox/data/<box_id>")
+        readings = decode_sensor_message(payload, topic_box_id)
+        if not readings:
+            raise ValueError("sensor message has no readings")
+        for reading in readings:
+            reading["box_id"] = topic_box_id
+        return readings
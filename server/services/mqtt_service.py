@@ -1,41 +1,72 @@
 from flask_mqtt import Mqtt
-from flask import current_app
 import json
 
+from services.mqtt_ingest import MqttSensorIngestor
+
+
 class MqttService:
-    def __init__(self, app=None):
+    def __init__(self, app=None, medibox_service=None, ingest_pool=None):
+        self.ingestor = None
         if app is not None:
-            self.init_app(app)
+            self.init_app(app, medibox_service, ingest_pool)
 
-    def init_app(self, app):
+    def init_app(self, app, medibox_service=None, ingest_pool=None):
+        self.logger = app.logger
+        ingest = medibox_service is not None and app.config.get('MQTT_INGEST_ENABLED', False)
+        if ingest and not (app.config.get('MQTT_USERNAME') or app.config.get('MQTT_TLS_ENABLED')):
+            # Anyone can publish on an open broker; only log readings there.
+            app.logger.warning("MQTT ingest needs MQTT_USERNAME or MQTT_TLS_ENABLED; sensor messages are only logged")
+            ingest = False
+        if ingest:
+            self.ingestor = MqttSensorIngestor(
+                medibox_service,
+                workers=app.config.get('MQTT_INGEST_WORKERS', 2),
+                queue_size=app.config.get('MQTT_INGEST_QUEUE_SIZE', 10000),
+                batch_size=app.config.get('MQTT_INGEST_BATCH_SIZE', 200),
+                flush_interval=app.config.get('MQTT_INGEST_FLUSH_INTERVAL', 0.5),
+                ingest_pool=ingest_pool,
+                limiter=app.extensions.get('medibox_rate_limits', {}).get('sensor'),
+            ).start()
+
+        app.extensions['medibox_mqtt'] = self
         self.mqtt = Mqtt(app)
 
         @self.mqtt.on_connect()
         def handle_connect(client, userdata, flags, rc):
-            current_app.logger.info("Connected to MQTT Broker")
+            self.logger.info("Connected to MQTT Broker")
             self.mqtt.subscribe("medibox/data/#")
             self.mqtt.subscribe("medibox/reminder/#")
 
         @self.mqtt.on_message()
         def handle_message(client, userdata, message):
             topic = message.topic
-            payload = json.loads(message.payload.decode())
-            current_app.logger.info(f"Received message on {topic}: {payload}")
-            # Handle incoming messages based on the topic
+            # Handle incoming messages based on the topic. Sensor payloads are
+            # decoded off the paho network thread by the ingestor.
             if topic.startswith("medibox/data/"):
-                self.handle_sensor_data(payload)
+                self.handle_sensor_data(topic, message.payload)
             elif topic.startswith("medibox/reminder/"):
+                try:
+                    payload = json.loads(message.payload.decode())
+                except ValueError:
+                    self.logger.warning(f"Ignoring malformed reminder message on {topic}")
+                    return
                 self.handle_reminder_message(payload)
 
-    def handle_sensor_data(self, data):
-        # Process sensor data
-        current_app.logger.info(f"Processing sensor data: {data}")
+    def handle_sensor_data(self, topic, payload):
+        if self.ingestor is None:
+            self.logger.info(f"Received sensor data on {topic} (ingestion disabled)")
+            return
+        if not self.ingestor.submit(topic, payload):
+            self.logger.warning(f"MQTT ingest queue full, dropped message on {topic}")
 
     def handle_reminder_message(self, data):
         # Process reminder messages
-        current_app.logger.info(f"Processing reminder message: {data}")
+        self.logger.info(f"Processing reminder message: {data}")
 
     def publish_reminder(self, box_id, message):
         topic = f"medibox/reminder/{box_id}"
         self.mqtt.publish(topic, json.dumps(message))
-        current_app.logger.info(f"Published reminder to {topic}: {message}")
\ No newline at end of file
+        self.logger.info(f"Published reminder to {topic}: {message}")
+
+    def stats(self):
+        return self.ingestor.stats() if self.ingestor is not None else None
@@ -0,0 +1,145 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+FIELD_SENSOR = "last_sensor_at"
+FIELD_INTAKE = "last_intake_at"
+FIELD_SEEN = "last_seen_at"
+PRESENCE_FIELDS = (FIELD_SENSOR, FIELD_INTAKE, FIELD_SEEN)
+
+
+class PresenceTracker:
+    """Coalesces per-box presence timestamps in memory.
+
+    Requests call ``touch`` instead of updating the box document; a daemon
+    thread writes every box touched since the last flush with a single
+    ``bulk_write`` of ``$max`` updates (so several processes flushing out of
+    order never move a timestamp backwards). The latest timestamp per box is
+    also kept in memory, which makes ``silent_boxes`` a dictionary scan.
+    """
+
+    def __init__(self, db, flush_interval: float = 5.0):
+        self.mediboxes = db["mediboxes"]
+        self.flush_interval = float(flush_interval)
+        self._pending: Dict[str, Dict[str, datetime]] = {}
+        self._last_active: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.touches = 0
+        self.written = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+
+    def load(self) -> None:
+        """Seed the in-memory view from ``mediboxes`` (run once at startup)."""
+        projection = {"box_id": 1, **{field: 1 for field in PRESENCE_FIELDS}}
+        with self._lock:
+            for doc in self.mediboxes.find({}, projection):
+                seen = [doc[field] for field in PRESENCE_FIELDS if isinstance(doc.get(field), datetime)]
+                if doc.get("box_id") and seen:
+                    self._remember(doc["box_id"], max(seen))
+
+    def touch(self, box_id: str, field: str, at: Optional[datetime] = None) -> None:
+        if not box_id:
+            return
+        at = at or datetime.utcnow()
+        with self._lock:
+            fields = self._pending.setdefault(box_id, {})
+            if field not in fields or fields[field] < at:
+                fields[field] = at
+            self._remember(box_id, at)
+            self.touches += 1
+
+    def flush(self) -> int:
+        """Write pending timestamps; returns the number of boxes updated."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                self.mediboxes.bulk_write(
+                    [UpdateOne({"box_id": box_id}, {"$max": fields}) for box_id, fields in pending.items()],
+                    ordered=False,
+                )
+            except PyMongoError:
+                self.flush_errors += 1
+                logger.exception("Failed to flush presence for %d boxes", len(pending))
+                self._restore(pending)
+                return 0
+
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            self.flush_count += 1
+            self.written += len(pending)
+            return len(pending)
+
+    def last_active(self, box_id: str) -> Optional[datetime]:
+        with self._lock:
+            return self._last_active.get(box_id)
+
+    def silent_boxes(self, silent_for: timedelta, now: Optional[datetime] = None) -> List[dict]:
+        """Boxes with no sensor data, intake or auth for at least ``silent_for``, quietest first."""
+        cutoff = (now or datetime.utcnow()) - silent_for
+        with self._lock:
+            silent = [(at, box_id) for box_id, at in self._last_active.items() if at < cutoff]
+        return [{"box_id": box_id, "last_active_at": at} for at, box_id in sorted(silent)]
+
+    def start(self) -> "PresenceTracker":
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="presence-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        return self
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(self.flush_interval + 1)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+            tracked = len(self._last_active)
+        return {
+            "tracked_boxes": tracked,
+            "pending_boxes": pending,
+            "touches": self.touches,
+            "written": self.written,
+            "flush_count": self.flush_count,
+            "flush_errors": self.flush_errors,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+    def _remember(self, box_id: str, at: datetime) -> None:
+        current = self._last_active.get(box_id)
+        if current is None or current < at:
+            self._last_active[box_id] = at
+
+    def _restore(self, pending: Dict[str, Dict[str, datetime]]) -> None:
+        with self._lock:
+            for box_id, fields in pending.items():
+                current = self._pending.setdefault(box_id, {})
+                for field, at in fields.items():
+                    if field not in current or current[field] < at:
+                        current[field] = at
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
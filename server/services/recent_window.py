@@ -0,0 +1,183 @@
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional
+
+EPOCH = datetime(1970, 1, 1)
+RING_FIELDS = ("temperature", "humidity", "ldr_value")
+NAN = float("nan")
+
+
+def _to_millis(moment: datetime) -> int:
+    return (moment - EPOCH) // timedelta(milliseconds=1)
+
+
+def _ring_value(value) -> float:
+    return NAN if isinstance(value, bool) or not isinstance(value, (int, float)) else float(value)
+
+
+def window_reading(box_id: str, reading: dict) -> dict:
+    """A stored reading in the shape the rings return it, for database fallbacks."""
+    data = {}
+    for field in RING_FIELDS:
+        value = _ring_value((reading.get("data") or {}).get(field))
+        if value == value:  # skip NaN
+            data[field] = value
+    return {
+        "box_id": box_id,
+        "data": data,
+        "recorded_at": EPOCH + timedelta(milliseconds=_to_millis(reading["recorded_at"])),
+    }
+
+
+class _Ring:
+    """Preallocated circular columns of the newest ``capacity`` readings of one box."""
+
+    __slots__ = ("capacity", "stamps", "values", "start", "size", "loaded_from")
+
+    def __init__(self, capacity: int, loaded_from: int):
+        self.capacity = capacity
+        self.stamps = array("q", bytes(8 * capacity))
+        self.values = [array("d", [NAN]) * capacity for _ in RING_FIELDS]
+        self.start = 0
+        self.size = 0
+        self.loaded_from = loaded_from  # readings before this were never loaded
+
+    def push(self, millis: int, data: dict) -> bool:
+        """Append one reading; False if it is older than the newest one."""
+        if self.size and millis < self.stamps[(self.start + self.size - 1) % self.capacity]:
+            return False
+        if self.size < self.capacity:
+            slot = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+            self.loaded_from = self.stamps[self.start]
+        self.stamps[slot] = millis
+        for column, field in zip(self.values, RING_FIELDS):
+            column[slot] = _ring_value(data.get(field))
+        return True
+
+    def first_at_or_after(self, millis: int) -> int:
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.stamps[(self.start + middle) % self.capacity] < millis:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def reading(self, box_id: str, position: int) -> dict:
+        slot = (self.start + position) % self.capacity
+        data = {}
+        for column, field in zip(self.values, RING_FIELDS):
+            value = column[slot]
+            if value == value:  # skip NaN
+                data[field] = value
+        return {
+            "box_id": box_id,
+            "data": data,
+            "recorded_at": EPOCH + timedelta(milliseconds=self.stamps[slot]),
+        }
+
+
+class RecentWindowStore:
+    """Last ``hours`` of sensor readings for the ``max_boxes`` most recently viewed boxes.
+
+    Every box gets the same preallocated ring of ``capacity`` readings
+    (timestamp plus temperature, humidity and LDR, 32 bytes each), so memory
+    is fixed at ``max_boxes * capacity * 32`` bytes. A box is loaded from
+    ``loader`` on its first view, kept current by the ingest path, and
+    evicted when it becomes the least recently viewed box over the limit.
+    Windows the ring no longer covers (a box that reported more than
+    ``capacity`` readings in the window) return None, and callers fall back
+    to the database.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str, Optional[datetime], Optional[datetime]], Iterable[dict]],
+        hours: int = 24,
+        capacity: int = 8640,
+        max_boxes: int = 256,
+    ):
+        self.loader = loader
+        self.window = timedelta(hours=max(int(hours), 1))
+        self.capacity = max(int(capacity), 1)
+        self.max_boxes = max(int(max_boxes), 1)
+        self._rings: "OrderedDict[str, _Ring]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def recent(self, box_id: str, since: datetime, now: Optional[datetime] = None) -> Optional[List[dict]]:
+        """Readings of ``box_id`` recorded at or after ``since``, oldest first, or None if not covered."""
+        now = now or datetime.utcnow()
+        if since < now - self.window:
+            self.misses += 1
+            return None
+        with self._lock:
+            ring = self._view(box_id, now)
+            millis = _to_millis(since)
+            if millis < ring.loaded_from:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return [ring.reading(box_id, position) for position in range(ring.first_at_or_after(millis), ring.size)]
+
+    def latest(self, box_id: str, now: Optional[datetime] = None) -> Optional[dict]:
+        with self._lock:
+            ring = self._view(box_id, now or datetime.utcnow())
+            self.hits += 1
+            return ring.reading(box_id, ring.size - 1) if ring.size else None
+
+    def observe(self, payloads: List[dict]) -> None:
+        """Push stored readings of viewed boxes into their rings."""
+        if not self._rings:
+            return
+        with self._lock:
+            for payload in payloads:
+                ring = self._rings.get(payload["box_id"])
+                if ring is None:
+                    continue
+                millis = _to_millis(payload["recorded_at"])
+                if millis < ring.loaded_from:
+                    continue
+                if not ring.push(millis, payload.get("data") or {}):
+                    # A late reading cannot go into the ring in order; reload on the next view.
+                    del self._rings[payload["box_id"]]
+
+    def stats(self) -> dict:
+        with self._lock:
+            boxes = len(self._rings)
+            readings = sum(ring.size for ring in self._rings.values())
+        return {
+            "boxes": boxes,
+            "readings": readings,
+            "bytes_per_box": self.capacity * 8 * (1 + len(RING_FIELDS)),
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+    def _view(self, box_id: str, now: datetime) -> _Ring:
+        ring = self._rings.get(box_id)
+        if ring is None:
+            since = now - self.window
+            ring = _Ring(self.capacity, _to_millis(since))
+            for reading in self.loader(box_id, since, None):
+                ring.push(_to_millis(reading["recorded_at"]), reading.get("data") or {})
+            self.loads += 1
+            self._rings[box_id] = ring
+            while len(self._rings) > self.max_boxes:
+                self._rings.popitem(last=False)
+                self.evictions += 1
+        self._rings.move_to_end(box_id)
+        return ring
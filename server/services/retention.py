@@ -0,0 +1,122 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+from services.archive import SensorArchive
+
+logger = logging.getLogger(__name__)
+
+
+class SensorRetention:
+    """Moves ``sensor_logs`` readings older than ``hot_days`` into the archive.
+
+    Readings are archived one box and day at a time: the day's block is
+    written and synced first, then exactly the archived documents are
+    deleted by ``_id``. A run interrupted between those steps archives the
+    same documents again on the next run; the block merge skips them. The
+    cutoff is aligned to midnight UTC, so a day is only ever archived once
+    it is fully outside the hot window. Rollups and sketches stay in Mongo.
+    """
+
+    def __init__(self, sensor_logs, archive: SensorArchive, hot_days: int, interval: float = 3600.0):
+        if hot_days < 1:
+            raise ValueError("hot_days must be at least 1")
+        self.sensor_logs = sensor_logs
+        self.archive = archive
+        self.hot_days = int(hot_days)
+        self.interval = float(interval)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.runs = 0
+        self.archived = 0
+        self.errors = 0
+        self.last_run_ms = 0.0
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """Start of the hot window; everything recorded before it is archived."""
+        moment = (now or datetime.utcnow()) - timedelta(days=self.hot_days)
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def run(self, now: Optional[datetime] = None, box_ids: Optional[List[str]] = None) -> int:
+        """Archive every cold reading (of ``box_ids`` if given); returns the number moved."""
+        started = time.perf_counter()
+        cutoff = self.cutoff(now)
+        if box_ids is None:
+            box_ids = sorted(self.sensor_logs.distinct("box_id", {"recorded_at": {"$lt": cutoff}}))
+
+        moved = 0
+        for box_id in box_ids:
+            try:
+                moved += self.archive_box(box_id, cutoff)
+            except ValueError as exc:
+                logger.warning("Skipping retention for %r: %s", box_id, exc)
+        self.runs += 1
+        self.archived += moved
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+        return moved
+
+    def archive_box(self, box_id: str, cutoff: datetime) -> int:
+        self.archive.path(box_id, cutoff.date())  # reject unsafe box_ids before reading
+        cursor = (
+            self.sensor_logs.find(
+                {"box_id": box_id, "recorded_at": {"$lt": cutoff}},
+                {"box_id": 1, "seq": 1, "data": 1, "recorded_at": 1},
+            )
+            .sort("recorded_at", ASCENDING)
+            .batch_size(5000)
+        )
+        moved = 0
+        day, readings = None, []
+        for doc in cursor:
+            if day is not None and doc["recorded_at"].date() != day:
+                moved += self._archive_day(box_id, day, readings)
+                readings = []
+            day = doc["recorded_at"].date()
+            readings.append(doc)
+        if readings:
+            moved += self._archive_day(box_id, day, readings)
+        return moved
+
+    def _archive_day(self, box_id: str, day, readings: List[dict]) -> int:
+        self.archive.write_day(box_id, day, readings)
+        self.sensor_logs.delete_many({"_id": {"$in": [reading["_id"] for reading in readings]}})
+        return len(readings)
+
+    def start(self) -> "SensorRetention":
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sensor-retention", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        return self
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(5)
+
+    def stats(self) -> dict:
+        return {
+            "hot_days": self.hot_days,
+            "runs": self.runs,
+            "archived": self.archived,
+            "errors": self.errors,
+            "last_run_ms": round(self.last_run_ms, 3),
+            **self.archive.stats(),
+        }
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run()
+            except (OSError, PyMongoError):
+                self.errors += 1
+                logger.exception("Sensor retention run failed")
@@ -0,0 +1,277 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+
+from services.lid_events import EVENT_LID_OPENED
+
+RESOLUTION_MINUTE = "minute"
+RESOLUTION_HOUR = "hour"
+RESOLUTION_DAY = "day"
+MINUTE_TTL_INDEX = "minute_rollups_ttl"
+RESOLUTIONS = OrderedDict([
+    (RESOLUTION_MINUTE, timedelta(minutes=1)),
+    (RESOLUTION_HOUR, timedelta(hours=1)),
+    (RESOLUTION_DAY, timedelta(days=1)),
+])
+
+# Field name inside the reading's ``data`` dict -> statistic name in a rollup.
+ROLLUP_METRICS = OrderedDict([
+    ("temperature", "temperature"),
+    ("humidity", "humidity"),
+    ("ldr_value", "ldr"),
+])
+
+
+def truncate(moment: datetime, resolution: str) -> datetime:
+    if resolution == RESOLUTION_MINUTE:
+        return moment.replace(second=0, microsecond=0)
+    if resolution == RESOLUTION_HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if resolution == RESOLUTION_DAY:
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+
+class _Accumulator:
+    __slots__ = ("count", "lid_opens", "stats")
+
+    def __init__(self):
+        self.count = 0
+        self.lid_opens = 0
+        self.stats: Dict[str, List[float]] = {}
+
+    def add_reading(self, data: dict) -> None:
+        self.count += 1
+        for field, name in ROLLUP_METRICS.items():
+            value = data.get(field)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            stat = self.stats.get(name)
+            if stat is None:
+                self.stats[name] = [value, value, value, 1]
+            else:
+                stat[0] = min(stat[0], value)
+                stat[1] = max(stat[1], value)
+                stat[2] += value
+                stat[3] += 1
+
+    def update(self) -> dict:
+        inc = {"count": self.count, "lid_opens": self.lid_opens}
+        minimum, maximum = {}, {}
+        for name, (low, high, total, count) in self.stats.items():
+            inc[f"{name}.sum"] = total
+            inc[f"{name}.count"] = count
+            minimum[f"{name}.min"] = low
+            maximum[f"{name}.max"] = high
+        update = {"$inc": inc}
+        if minimum:
+            update["$min"] = minimum
+            update["$max"] = maximum
+        return update
+
+    def document(self, box_id: str, resolution: str, bucket_start: datetime) -> dict:
+        doc = {
+            "box_id": box_id,
+            "resolution": resolution,
+            "bucket_start": bucket_start,
+            "count": self.count,
+            "lid_opens": self.lid_opens,
+        }
+        for name, (low, high, total, count) in self.stats.items():
+            doc[name] = {"min": low, "max": high, "sum": total, "count": count}
+        return doc
+
+
+class SensorRollupService:
+    """Minute, hour and day aggregates of every box's sensor stream.
+
+    Each ``sensor_rollups`` document covers one box, resolution and bucket::
+
+        {box_id, resolution, bucket_start, count, lid_opens,
+         temperature: {min, max, sum, count}, humidity: {...}, ldr: {...}}
+
+    ``observe`` folds a batch of readings and lid events into one upsert per
+    touched bucket (``$inc`` for counts and sums, ``$min``/``$max`` for the
+    extremes), so rollups stay current at ingest without rereading raw data.
+    Means are computed on read as ``sum / count``.
+
+    Minute buckets add up to 1440 documents per box and day, so with
+    ``minute_retention_days`` a partial TTL index expires them once they are
+    that old. Hour and day buckets are kept.
+    """
+
+    def __init__(self, db, minute_retention_days: int = 0):
+        self.collection = db["sensor_rollups"]
+        self.events = db["box_events"]
+        self.minute_retention = timedelta(days=int(minute_retention_days)) if minute_retention_days else None
+
+    def ensure_indexes(self) -> None:
+        try:
+            self.collection.create_index(
+                [("box_id", ASCENDING), ("resolution", ASCENDING), ("bucket_start", ASCENDING)],
+                unique=True,
+                background=True,
+            )
+        except OperationFailure:  # pragma: no cover - index already exists with other options
+            pass
+        if self.minute_retention is not None:
+            self._ensure_minute_ttl(int(self.minute_retention.total_seconds()))
+
+    def _ensure_minute_ttl(self, seconds: int) -> None:
+        try:
+            self.collection.create_index(
+                [("bucket_start", ASCENDING)],
+                name=MINUTE_TTL_INDEX,
+                expireAfterSeconds=seconds,
+                partialFilterExpression={"resolution": RESOLUTION_MINUTE},
+                background=True,
+            )
+        except OperationFailure:
+            # The index exists with another retention; change it in place.
+            self.collection.database.command(
+                "collMod",
+                self.collection.name,
+                index={"name": MINUTE_TTL_INDEX, "expireAfterSeconds": seconds},
+            )
+
+    def minute_horizon(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Oldest minute bucket still kept, or None when minute buckets never expire."""
+        if self.minute_retention is None:
+            return None
+        return (now or datetime.utcnow()) - self.minute_retention
+
+    def observe(self, payloads: List[dict], events: Iterable[dict] = ()) -> None:
+        """Fold prepared sensor payloads and lid events into their rollup buckets."""
+        buckets = self._accumulate(payloads, events)
+        if not buckets:
+            return
+        self.collection.bulk_write(
+            [
+                UpdateOne(
+                    {"box_id": box_id, "resolution": resolution, "bucket_start": bucket_start},
+                    accumulator.update(),
+                    upsert=True,
+                )
+                for (box_id, resolution, bucket_start), accumulator in buckets.items()
+            ],
+            ordered=False,
+        )
+
+    def backfill(
+        self,
+        box_id: str,
+        read_readings: Callable[[str, Optional[datetime], Optional[datetime]], Iterable[dict]],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        chunk_size: int = 5000,
+    ) -> int:
+        """Rebuild every rollup of ``box_id`` between ``start`` and ``end`` from raw data.
+
+        The window is widened to whole days so no bucket is rebuilt from a
+        partial range. Returns the number of readings folded in.
+        """
+        if start is not None:
+            start = truncate(start, RESOLUTION_DAY)
+        if end is not None:
+            end_day = truncate(end, RESOLUTION_DAY)
+            end = end_day if end_day == end else end_day + RESOLUTIONS[RESOLUTION_DAY]
+
+        bounds = {}
+        if start is not None:
+            bounds["$gte"] = start
+        if end is not None:
+            bounds["$lt"] = end
+        query = {"box_id": box_id}
+        if bounds:
+            query["bucket_start"] = bounds
+        self.collection.delete_many(query)
+
+        event_query = {"box_id": box_id, "type": EVENT_LID_OPENED}
+        if bounds:
+            event_query["at"] = bounds
+        self.observe([], self.events.find(event_query, {"box_id": 1, "type": 1, "at": 1}))
+
+        total = 0
+        chunk = []
+        for reading in read_readings(box_id, start, end):
+            chunk.append(reading)
+            if len(chunk) >= chunk_size:
+                self.observe(chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            self.observe(chunk)
+            total += len(chunk)
+        return total
+
+    def query(
+        self,
+        box_id: str,
+        resolution: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[dict]:
+        """Rollup buckets of one box, oldest first, with ``mean`` filled in."""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+        query = {"box_id": box_id, "resolution": resolution}
+        bounds = {}
+        if start is not None:
+            bounds["$gte"] = truncate(start, resolution)
+        if end is not None:
+            bounds["$lt"] = end
+        if bounds:
+            query["bucket_start"] = bounds
+        docs = self.collection.find(query, {"_id": 0}).sort("bucket_start", ASCENDING)
+        return [self.present(doc) for doc in docs]
+
+    def summarize(
+        self,
+        box_id: str,
+        resolution: str,
+        bucket_start: datetime,
+        end: datetime,
+        payloads: Iterable[dict],
+    ) -> dict:
+        """Build a bucket for ``[bucket_start, end)`` from raw readings, shaped like ``query`` results."""
+        accumulator = _Accumulator()
+        for payload in payloads:
+            accumulator.add_reading(payload.get("data") or {})
+        accumulator.lid_opens = self.events.count_documents({
+            "box_id": box_id,
+            "type": EVENT_LID_OPENED,
+            "at": {"$gte": bucket_start, "$lt": end},
+        })
+        return self.present(accumulator.document(box_id, resolution, bucket_start))
+
+    @staticmethod
+    def present(doc: dict) -> dict:
+        for name in ROLLUP_METRICS.values():
+            stat = doc.get(name)
+            if stat and stat.get("count"):
+                stat["mean"] = stat.pop("sum") / stat["count"]
+        return doc
+
+    @staticmethod
+    def _accumulate(payloads: Iterable[dict], events: Iterable[dict]) -> Dict[Tuple[str, str, datetime], _Accumulator]:
+        buckets: Dict[Tuple[str, str, datetime], _Accumulator] = OrderedDict()
+
+        def bucket(box_id: str, resolution: str, at: datetime) -> _Accumulator:
+            key = (box_id, resolution, truncate(at, resolution))
+            accumulator = buckets.get(key)
+            if accumulator is None:
+                accumulator = buckets[key] = _Accumulator()
+            return accumulator
+
+        for payload in payloads:
+            for resolution in RESOLUTIONS:
+                bucket(payload["box_id"], resolution, payload["recorded_at"]).add_reading(payload.get("data") or {})
+        for event in events:
+            if event.get("type") != EVENT_LID_OPENED:
+                continue
+            for resolution in RESOLUTIONS:
+                bucket(event["box_id"], resolution, event["at"]).lid_opens += 1
+        return buckets
@@ -0,0 +1,130 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+
+# Field name inside the reading's ``data`` dict -> array name inside a bucket.
+BUCKET_FIELDS = OrderedDict([
+    ("temperature", "temperature"),
+    ("humidity", "humidity"),
+    ("ldr_value", "ldr"),
+    ("medicine_taken", "taken"),
+])
+
+
+def bucket_start_for(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class SensorBucketStore:
+    """Hour-bucketed storage for sensor readings.
+
+    One document holds every reading of a box within one clock hour as
+    parallel arrays::
+
+        {box_id, bucket_start, count, first_at, last_at,
+         offsets: [seconds since bucket_start, ...],
+         temperature: [...], humidity: [...], ldr: [...], taken: [...]}
+
+    Appends are ``$push`` upserts, so a box writes to a single document per
+    hour instead of creating one document per reading.
+    """
+
+    def __init__(self, db, collection_name: str = "sensor_buckets"):
+        self.collection = db[collection_name]
+
+    def ensure_indexes(self) -> None:
+        try:
+            self.collection.create_index(
+                [("box_id", ASCENDING), ("bucket_start", ASCENDING)],
+                unique=True,
+                background=True,
+            )
+        except OperationFailure:  # pragma: no cover - index already exists with other options
+            pass
+
+    def append(self, payloads: List[dict]) -> None:
+        """Push prepared sensor payloads (``box_id``/``data``/``recorded_at``) into their buckets."""
+        grouped = OrderedDict()
+        for payload in payloads:
+            recorded_at = payload["recorded_at"]
+            key = (payload["box_id"], bucket_start_for(recorded_at))
+            grouped.setdefault(key, []).append(payload)
+
+        operations = []
+        for (box_id, bucket_start), items in grouped.items():
+            data = [item.get("data") or {} for item in items]
+            push = {
+                "offsets": {"$each": [
+                    round((item["recorded_at"] - bucket_start).total_seconds(), 3) for item in items
+                ]},
+            }
+            for field, column in BUCKET_FIELDS.items():
+                push[column] = {"$each": [entry.get(field) for entry in data]}
+
+            times = [item["recorded_at"] for item in items]
+            operations.append(UpdateOne(
+                {"box_id": box_id, "bucket_start": bucket_start},
+                {
+                    "$push": push,
+                    "$inc": {"count": len(items)},
+                    "$min": {"first_at": min(times)},
+                    "$max": {"last_at": max(times)},
+                },
+                upsert=True,
+            ))
+
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+    def iter_readings(
+        self,
+        box_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        descending: bool = False,
+    ) -> Iterator[dict]:
+        """Yield readings in ``sensor_logs`` shape for ``start <= recorded_at < end``."""
+        query = {"box_id": box_id}
+        bounds = {}
+        if start is not None:
+            bounds["$gte"] = bucket_start_for(start)
+        if end is not None:
+            bounds["$lt"] = end
+        if bounds:
+            query["bucket_start"] = bounds
+
+        cursor = self.collection.find(query).sort("bucket_start", DESCENDING if descending else ASCENDING)
+        for bucket in cursor:
+            readings = self.flatten(bucket)
+            if descending:
+                readings.reverse()
+            for reading in readings:
+                recorded_at = reading["recorded_at"]
+                if start is not None and recorded_at < start:
+                    continue
+                if end is not None and recorded_at >= end:
+                    continue
+                yield reading
+
+    @staticmethod
+    def flatten(bucket: dict) -> List[dict]:
+        """Expand one bucket into per-reading dicts, ordered by time."""
+        bucket_start = bucket["bucket_start"]
+        columns = {column: bucket.get(column) or [] for column in BUCKET_FIELDS.values()}
+        readings = []
+        for position, offset in enumerate(bucket.get("offsets") or []):
+            data = {}
+            for field, column in BUCKET_FIELDS.items():
+                values = columns[column]
+                if position < len(values) and values[position] is not None:
+                    data[field] = values[position]
+            readings.append({
+                "box_id": bucket["box_id"],
+                "data": data,
+                "recorded_at": bucket_start + timedelta(seconds=offset),
+            })
+        readings.sort(key=lambda reading: reading["recorded_at"])
+        return readings
@@ -0,0 +1,206 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+POLICY_BLOCK = "block"
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_REJECT = "reject"
+POLICIES = {POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_REJECT}
+
+
+class BufferFullError(Exception):
+    """Raised when a reading cannot be queued under the configured policy."""
+
+
+class SensorWriteBuffer:
+    """Bounded write-behind queue for sensor payloads.
+
+    Producers call ``submit`` and return immediately; a daemon thread hands
+    queued payloads to ``flush_fn`` in bulk once ``flush_size`` readings are
+    waiting or ``flush_interval`` seconds have passed since the last flush.
+    When the queue is full the ``policy`` decides what happens:
+
+    - ``block``: wait up to ``block_timeout`` seconds for room, then reject
+    - ``drop_oldest``: discard the oldest queued reading to make room
+    - ``reject``: fail immediately so the route can answer 503
+
+    With an ``overflow_fn`` (the ingest journal) nothing is lost: readings the
+    policy would drop or reject, and batches whose flush fails, are handed to
+    it instead.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[dict]], None],
+        max_size: int = 10000,
+        flush_size: int = 500,
+        flush_interval: float = 1.0,
+        policy: str = POLICY_BLOCK,
+        block_timeout: float = 1.0,
+        overflow_fn: Optional[Callable[[List[dict]], None]] = None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown buffer policy: {policy}")
+
+        self.flush_fn = flush_fn
+        self.max_size = max(int(max_size), 1)
+        self.flush_size = max(min(int(flush_size), self.max_size), 1)
+        self.flush_interval = float(flush_interval)
+        self.policy = policy
+        self.block_timeout = float(block_timeout)
+        self.overflow_fn = overflow_fn
+
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.spilled = 0
+        self.flushed = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def start(self) -> "SensorWriteBuffer":
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="sensor-write-buffer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        return self
+
+    def submit(self, payload: dict) -> None:
+        overflow = None
+        with self._lock:
+            if len(self._queue) >= self.max_size:
+                if self.policy == POLICY_DROP_OLDEST:
+                    oldest = self._queue.popleft()
+                    if self.overflow_fn is not None:
+                        overflow = oldest
+                    else:
+                        self.dropped += 1
+                elif self.policy == POLICY_BLOCK:
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._queue) >= self.max_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or self._stopping:
+                            break
+                        self._not_full.wait(remaining)
+                    if len(self._queue) >= self.max_size:
+                        overflow = self._reject(payload)
+                else:
+                    overflow = self._reject(payload)
+
+            if overflow is not payload:
+                self._queue.append(payload)
+                self.enqueued += 1
+                if len(self._queue) >= self.flush_size:
+                    self._not_empty.notify()
+
+        if overflow is not None:
+            self._spill([overflow])
+
+    def flush(self) -> int:
+        """Write everything currently queued; returns the number of readings flushed."""
+        total = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._queue:
+                        break
+                    count = min(len(self._queue), self.flush_size)
+                    batch = [self._queue.popleft() for _ in range(count)]
+                    self._not_full.notify_all()
+                self._write(batch)
+                total += len(batch)
+        return total
+
+    def close(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            self._stopping = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            depth = len(self._queue)
+        return {
+            "policy": self.policy,
+            "queue_depth": depth,
+            "max_size": self.max_size,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "spilled": self.spilled,
+            "flushed": self.flushed,
+            "flush_count": self.flush_count,
+            "flush_errors": self.flush_errors,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self.total_flush_ms / self.flush_count, 3) if self.flush_count else 0.0,
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        while True:
+            with self._lock:
+                while not self._stopping and len(self._queue) < self.flush_size:
+                    remaining = self.flush_interval - (time.monotonic() - last_flush)
+                    if remaining <= 0:
+                        break
+                    self._not_empty.wait(remaining)
+                if self._stopping:
+                    return
+            self.flush()
+            last_flush = time.monotonic()
+
+    def _write(self, batch: List[dict]) -> None:
+        started = time.perf_counter()
+        try:
+            self.flush_fn(batch)
+        except Exception:  # pragma: no cover - depends on database availability
+            self.flush_errors += 1
+            if self.overflow_fn is not None:
+                logger.exception("Failed to flush %d buffered sensor readings, journaling them", len(batch))
+                self._spill(batch)
+            else:
+                logger.exception("Failed to flush %d buffered sensor readings", len(batch))
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushed += len(batch)
+        self.flush_count += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+
+    def _reject(self, payload: dict) -> dict:
+        if self.overflow_fn is None:
+            self.rejected += 1
+            raise BufferFullError("sensor buffer is full")
+        return payload
+
+    def _spill(self, payloads: List[dict]) -> None:
+        self.overflow_fn(payloads)
+        with self._lock:
+            self.spilled += len(payloads)
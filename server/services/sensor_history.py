@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Optional
+
+from services.recent_window import window_reading
+from services.rollups import RESOLUTION_MINUTE, RESOLUTIONS, truncate
+
+TIER_RAW = "raw"
+SOURCE_CACHE = "cache"
+SOURCE_DATABASE = "database"
+DEFAULT_WINDOW = timedelta(hours=24)
+MAX_POINTS_LIMIT = 5000
+
+
+class SensorHistoryPlanner:
+    """Answers "readings of a box between two times, at most N points".
+
+    The planner first tries raw readings, reading no more than
+    ``max_points + 1`` of them. If the window holds more, it picks the finest
+    rollup resolution (minute, hour, day) whose bucket count fits
+    ``max_points``. Every query therefore reads O(max_points) documents,
+    however long the window. The last bucket is rebuilt from raw readings
+    when it is still open or ends past ``end``, so the series never reports
+    data outside the window. The chosen tier is returned with the points.
+
+    With a series cache, raw readings come from the box's memory-mapped
+    columns instead: counting the window is a binary search, so the tier is
+    chosen without reading any raw documents from the database. Raw points
+    from the database are projected to the cached shape (``window_reading``),
+    so a point looks the same whichever source served it.
+    """
+
+    def __init__(self, medibox_service):
+        self.medibox_service = medibox_service
+
+    def query(
+        self,
+        box_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        max_points: int = 500,
+        now: Optional[datetime] = None,
+    ) -> dict:
+        if not box_id:
+            raise ValueError("box_id is required")
+        max_points = min(max(int(max_points), 1), MAX_POINTS_LIMIT)
+        now = now or datetime.utcnow()
+        end = end or now
+        start = start or end - DEFAULT_WINDOW
+        if start >= end:
+            raise ValueError("from must be earlier than to")
+
+        result = {"box_id": box_id, "from": start, "to": end, "max_points": max_points}
+        cache = self.medibox_service.series_cache
+        cached = cache.slice(box_id, start, end, now) if cache is not None else None
+        result["source"] = SOURCE_CACHE if cached is not None else SOURCE_DATABASE
+        if cached is not None:
+            count = len(cached)
+            raw = cached.head(max_points).readings() if count <= max_points or self.medibox_service.rollups is None else []
+        else:
+            readings = islice(self.medibox_service.iter_sensor_readings(box_id, start, end), max_points + 1)
+            raw = [window_reading(box_id, reading) for reading in readings]
+            count = len(raw)
+        rollups = self.medibox_service.rollups
+        if count <= max_points or rollups is None:
+            result.update({
+                "tier": TIER_RAW,
+                "truncated": count > max_points,
+                "points": raw[:max_points],
+            })
+            return result
+
+        resolution = self.choose_resolution(start, end, max_points, rollups.minute_horizon(now))
+        points = rollups.query(box_id, resolution, start, end)
+        stitched = False
+        upper = min(end, now)
+        tail_start = truncate(upper - timedelta(microseconds=1), resolution)
+        if tail_start + RESOLUTIONS[resolution] > upper:
+            points = [point for point in points if point["bucket_start"] < tail_start]
+            tail = rollups.summarize(
+                box_id,
+                resolution,
+                tail_start,
+                upper,
+                self._readings(cached, box_id, max(tail_start, start), upper, now),
+            )
+            if tail["count"] or tail["lid_opens"]:
+                points.append(tail)
+            stitched = True
+
+        result.update({
+            "tier": resolution,
+            "truncated": False,
+            "stitched_tail": stitched,
+            "points": points,
+        })
+        return result
+
+    def _readings(self, cached, box_id: str, start: datetime, end: datetime, now: datetime):
+        if cached is not None:
+            window = self.medibox_service.series_cache.slice(box_id, start, end, now)
+            if window is not None:
+                return window.readings()
+        return self.medibox_service.iter_sensor_readings(box_id, start, end)
+
+    @staticmethod
+    def choose_resolution(
+        start: datetime,
+        end: datetime,
+        max_points: int,
+        minute_horizon: Optional[datetime] = None,
+    ) -> str:
+        """Finest rollup resolution whose bucket count over ``[start, end)`` fits ``max_points``.
+
+        Minute buckets are skipped for windows reaching back past
+        ``minute_horizon``, where they have already expired.
+        """
+        for resolution, width in RESOLUTIONS.items():
+            if resolution == RESOLUTION_MINUTE and minute_horizon is not None and start < minute_horizon:
+                continue
+            buckets = -(-(end - truncate(start, resolution)) // width)
+            if buckets <= max_points:
+                return resolution
+        return next(reversed(RESOLUTIONS))
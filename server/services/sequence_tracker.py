@@ -0,0 +1,87 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+STALE = "stale"
+
+
+class SequenceTracker:
+    """Per-box duplicate detection for device sequence numbers.
+
+    Each box keeps a high-water mark plus a ``window``-bit mask of the
+    sequence numbers just below it that have already been seen (the classic
+    anti-replay window), so a check is O(1) and the state per box is two
+    integers. Numbers older than the window are reported as ``stale``; the
+    tracker cannot tell those apart, so callers leave them to the index.
+
+    ``loader`` is called once per box on first sight to restore the
+    high-water mark after a restart; the unique ``(box_id, seq)`` index on the
+    target collection remains the backstop for anything inside the window.
+    """
+
+    def __init__(self, window: int = 64, loader: Optional[Callable[[str], Optional[int]]] = None):
+        self.window = max(int(window), 1)
+        self._full_mask = (1 << self.window) - 1
+        self.loader = loader
+        self._state: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+        self.accepted = 0
+        self.duplicates = 0
+        self.stale = 0
+
+    def check(self, box_id: str, seq: int) -> str:
+        """Record ``seq`` for ``box_id`` and return ``accepted``, ``duplicate`` or ``stale``."""
+        with self._lock:
+            state = self._state.get(box_id)
+            if state is None:
+                high_water = self.loader(box_id) if self.loader else None
+                if high_water is None:
+                    self._state[box_id] = [seq, 1]
+                    self.accepted += 1
+                    return ACCEPTED
+                state = self._state[box_id] = [high_water, 1]
+
+            high_water, mask = state
+            if seq > high_water:
+                shift = seq - high_water
+                state[0] = seq
+                state[1] = ((mask << shift) | 1) & self._full_mask if shift < self.window else 1
+                self.accepted += 1
+                return ACCEPTED
+
+            distance = high_water - seq
+            if distance >= self.window:
+                self.stale += 1
+                return STALE
+            bit = 1 << distance
+            if mask & bit:
+                self.duplicates += 1
+                return DUPLICATE
+            state[1] = mask | bit
+            self.accepted += 1
+            return ACCEPTED
+
+    def forget(self, box_id: str, seq: int) -> None:
+        """Un-record ``seq`` after its write failed, so the device's retry is accepted again."""
+        with self._lock:
+            state = self._state.get(box_id)
+            if state is None:
+                return
+            distance = state[0] - seq
+            if 0 <= distance < self.window:
+                state[1] &= ~(1 << distance)
+
+    def reset(self, box_id: str) -> None:
+        """Drop the in-memory window of a box; the next check consults ``loader`` again."""
+        with self._lock:
+            self._state.pop(box_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "tracked_boxes": len(self._state),
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "stale": self.stale,
+        }
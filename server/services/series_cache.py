@@ -0,0 +1,327 @@
+"""Memory-mapped per-box sensor series for history reads.
+
+Each cached box is a directory of fixed-width, append-only column files::
+
+    <dir>/<box_id>/recorded_at.col   int64 milliseconds since the epoch
+    <dir>/<box_id>/temperature.col   float64 (NaN when missing)
+    <dir>/<box_id>/humidity.col      float64
+    <dir>/<box_id>/ldr_value.col     float64
+
+Readers map the files and cast them to typed ``memoryview`` columns, so a
+time range is a binary search over ``recorded_at`` plus a zero-copy slice
+of every column. A box is loaded on its first read (the last
+``window_days`` of data) and then kept current by the ingest path, which
+appends every stored reading of a cached box. A reading older than the
+newest cached one cannot be appended in order, so it drops the box from
+the cache and the next read rebuilds it.
+
+Loading a box streams up to ``window_days`` of readings, so it runs
+outside the cache lock: ingest and reads of other boxes carry on, readers
+of the same box wait for the one load, and readings stored meanwhile are
+held back and appended once the box is in.
+"""
+import bisect
+import math
+import mmap
+import os
+import shutil
+import struct
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+EPOCH = datetime(1970, 1, 1)
+SERIES_COLUMNS = OrderedDict([
+    ("recorded_at", "q"),
+    ("temperature", "d"),
+    ("humidity", "d"),
+    ("ldr_value", "d"),
+])
+VALUE_COLUMNS = tuple(SERIES_COLUMNS)[1:]
+COLUMN_WIDTH = 8
+
+
+def _to_millis(moment: datetime) -> int:
+    return (moment - EPOCH) // timedelta(milliseconds=1)
+
+
+def _number(value) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return math.nan
+    return float(value)
+
+
+class SeriesSlice:
+    """Zero-copy view of one box's cached readings in a time range."""
+
+    def __init__(self, box_id: str, columns: Dict[str, memoryview]):
+        self.box_id = box_id
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns["recorded_at"])
+
+    def head(self, count: int) -> "SeriesSlice":
+        return SeriesSlice(self.box_id, {name: column[:count] for name, column in self.columns.items()})
+
+    def readings(self) -> List[dict]:
+        """Materialize the slice in ``sensor_logs`` shape (missing values left out)."""
+        stamps = self.columns["recorded_at"]
+        values = [self.columns[name] for name in VALUE_COLUMNS]
+        readings = []
+        for index in range(len(stamps)):
+            data = {}
+            for name, column in zip(VALUE_COLUMNS, values):
+                value = column[index]
+                if value == value:  # skip NaN
+                    data[name] = value
+            readings.append({
+                "box_id": self.box_id,
+                "data": data,
+                "recorded_at": EPOCH + timedelta(milliseconds=stamps[index]),
+            })
+        return readings
+
+
+class _BoxSeries:
+    def __init__(self, directory: str, coverage_start: datetime):
+        self.directory = directory
+        self.coverage_start = coverage_start
+        self.rows = self._consistent_rows()
+        self.last_millis = None
+        self._views: Optional[Dict[str, memoryview]] = None
+        if self.rows:
+            self.last_millis = self.view()["recorded_at"][-1]
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.col")
+
+    def _consistent_rows(self) -> int:
+        # A crash between column appends leaves the files at different
+        # lengths; cut them back to the rows every column has.
+        os.makedirs(self.directory, exist_ok=True)
+        sizes = []
+        for name in SERIES_COLUMNS:
+            with open(self.path(name), "ab") as handle:
+                sizes.append(handle.tell())
+        rows = min(sizes) // COLUMN_WIDTH
+        for name, size in zip(SERIES_COLUMNS, sizes):
+            if size != rows * COLUMN_WIDTH:
+                os.truncate(self.path(name), rows * COLUMN_WIDTH)
+        return rows
+
+    def append(self, rows: List[tuple]) -> None:
+        for position, (name, code) in enumerate(SERIES_COLUMNS.items()):
+            with open(self.path(name), "ab") as handle:
+                handle.write(struct.pack(f"<{len(rows)}{code}", *(row[position] for row in rows)))
+        self.rows += len(rows)
+        self.last_millis = rows[-1][0]
+        self._views = None  # remap on the next read; old views stay valid until released
+
+    def view(self) -> Dict[str, memoryview]:
+        if self._views is None:
+            views = {}
+            for name, code in SERIES_COLUMNS.items():
+                if not self.rows:
+                    views[name] = memoryview(b"").cast(code)
+                    continue
+                with open(self.path(name), "rb") as handle:
+                    mapped = mmap.mmap(handle.fileno(), self.rows * COLUMN_WIDTH, access=mmap.ACCESS_READ)
+                views[name] = memoryview(mapped).cast(code)
+            self._views = views
+        return self._views
+
+
+class SeriesCache:
+    """Local, memory-mapped series of the ``max_boxes`` most recently read boxes.
+
+    ``loader(box_id, start, end)`` yields stored readings oldest first; it
+    fills a box on its first read and catches up on readings stored while
+    the process was down. The cache belongs to one process: it must be the
+    only writer of ``directory``.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        loader: Callable[[str, Optional[datetime], Optional[datetime]], Iterable[dict]],
+        window_days: int = 30,
+        max_boxes: int = 256,
+    ):
+        self.directory = directory
+        self.loader = loader
+        self.window = timedelta(days=max(int(window_days), 1))
+        self.max_boxes = max(int(max_boxes), 1)
+        self._boxes: "OrderedDict[str, _BoxSeries]" = OrderedDict()
+        self._loading: Dict[str, threading.Event] = {}
+        self._pending: Dict[str, List[dict]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.appended = 0
+        self.invalidations = 0
+
+    def slice(
+        self,
+        box_id: str,
+        start: datetime,
+        end: datetime,
+        now: Optional[datetime] = None,
+    ) -> Optional[SeriesSlice]:
+        """Cached readings in ``start <= recorded_at < end``, or None if the range is not covered."""
+        if not self._safe(box_id):
+            return None
+        now = now or datetime.utcnow()
+        while True:
+            with self._lock:
+                series = self._boxes.get(box_id)
+                if series is not None and series.coverage_start < now - 2 * self.window:
+                    self._drop(box_id)  # trim: rebuild rather than keep growing
+                    series = None
+                coverage_start = series.coverage_start if series is not None else self._coverage_start(now)
+                if start < coverage_start:
+                    self.misses += 1
+                    return None
+                if series is not None:
+                    self._boxes.move_to_end(box_id)
+                    columns = series.view()
+                    break
+                loading = self._loading.get(box_id)
+                loader = loading is None
+                if loader:
+                    loading = self._loading[box_id] = threading.Event()
+                    self._pending[box_id] = []
+            if not loader:
+                loading.wait()
+                continue
+            series = None
+            try:
+                series = self._load(box_id, now)
+            finally:
+                with self._lock:
+                    del self._loading[box_id]
+                    pending = self._pending.pop(box_id)
+                    if series is not None:
+                        self._install(box_id, series, pending)
+                loading.set()
+
+        stamps = columns["recorded_at"]
+        low = bisect.bisect_left(stamps, _to_millis(start))
+        high = bisect.bisect_left(stamps, _to_millis(end), low)
+        self.hits += 1
+        return SeriesSlice(box_id, {name: column[low:high] for name, column in columns.items()})
+
+    def append(self, payloads: List[dict]) -> None:
+        """Append stored readings of boxes that are already cached."""
+        if not self._boxes and not self._loading:
+            return
+        grouped: Dict[str, List[dict]] = {}
+        for payload in payloads:
+            if payload["box_id"] in self._boxes or payload["box_id"] in self._loading:
+                grouped.setdefault(payload["box_id"], []).append(payload)
+        with self._lock:
+            for box_id, group in grouped.items():
+                pending = self._pending.get(box_id)
+                if pending is not None:
+                    pending.extend(group)
+                    continue
+                series = self._boxes.get(box_id)
+                if series is not None and not self._extend(series, group):
+                    self._drop(box_id)
+                    self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            boxes = len(self._boxes)
+            rows = sum(series.rows for series in self._boxes.values())
+        return {
+            "boxes": boxes,
+            "rows": rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "appended": self.appended,
+            "invalidations": self.invalidations,
+        }
+
+    def _coverage_start(self, now: datetime) -> datetime:
+        return (now - self.window).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def _install(self, box_id: str, series: _BoxSeries, pending: List[dict]) -> None:
+        # Readings stored during the load that the loader already returned
+        # are at or before the new tail; only the later ones are appended.
+        if series.last_millis is not None:
+            pending = [payload for payload in pending if _to_millis(payload["recorded_at"]) > series.last_millis]
+        if not self._extend(series, pending):
+            shutil.rmtree(series.directory, ignore_errors=True)
+            self.invalidations += 1
+            return
+        self.loads += 1
+        self._boxes[box_id] = series
+        while len(self._boxes) > self.max_boxes:
+            self._drop(next(iter(self._boxes)))
+
+    def _load(self, box_id: str, now: datetime) -> _BoxSeries:
+        """Build or catch up the box's column files; runs without the cache lock."""
+        directory = os.path.join(self.directory, box_id)
+        coverage_path = os.path.join(directory, "coverage_start")
+        coverage_start = None
+        try:
+            with open(coverage_path) as handle:
+                coverage_start = datetime.fromisoformat(handle.read().strip())
+        except (FileNotFoundError, ValueError):
+            shutil.rmtree(directory, ignore_errors=True)
+
+        if coverage_start is None or coverage_start < now - 2 * self.window:
+            shutil.rmtree(directory, ignore_errors=True)
+            coverage_start = self._coverage_start(now)
+            os.makedirs(directory, exist_ok=True)
+            with open(coverage_path, "w") as handle:
+                handle.write(coverage_start.isoformat())
+
+        series = _BoxSeries(directory, coverage_start)
+        # Catch up from the newest cached reading (everything, for a new box).
+        since = coverage_start
+        if series.last_millis is not None:
+            since = EPOCH + timedelta(milliseconds=series.last_millis + 1)
+        if not self._extend(series, self.loader(box_id, since, None), chunk_size=10000):
+            shutil.rmtree(directory, ignore_errors=True)
+            return self._load(box_id, now)
+        return series
+
+    def _extend(self, series: _BoxSeries, readings: Iterable[dict], chunk_size: int = 1000) -> bool:
+        """Append readings in time order; False if one is older than the cached tail."""
+        rows = []
+        last = series.last_millis
+        for reading in readings:
+            millis = _to_millis(reading["recorded_at"])
+            if millis < _to_millis(series.coverage_start):
+                continue
+            if last is not None and millis < last:
+                if rows:
+                    series.append(rows)
+                    self.appended += len(rows)
+                return False
+            data = reading.get("data") or {}
+            rows.append((millis, *(_number(data.get(name)) for name in VALUE_COLUMNS)))
+            last = millis
+            if len(rows) >= chunk_size:
+                series.append(rows)
+                self.appended += len(rows)
+                rows = []
+        if rows:
+            series.append(rows)
+            self.appended += len(rows)
+        return True
+
+    def _drop(self, box_id: str) -> None:
+        series = self._boxes.pop(box_id, None)
+        if series is not None:
+            shutil.rmtree(series.directory, ignore_errors=True)
+
+    @staticmethod
+    def _safe(box_id: str) -> bool:
+        return bool(box_id) and box_id not in {".", ".."} and "/" not in box_id and "\\" not in box_id
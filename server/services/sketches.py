@@ -0,0 +1,282 @@
+import struct
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from bson.binary import Binary
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+
+from services.rollups import ROLLUP_METRICS
+
+SKETCH_VERSION = 1
+SKETCH_HEADER = struct.Struct("<BHddI")  # version, compression, min, max, centroid count
+COMPACT_AFTER_PARTS = 8
+
+
+class TDigest:
+    """Mergeable quantile sketch (merging t-digest).
+
+    Values are kept as weighted centroids whose size is bounded by
+    ``4 * n * q * (1 - q) / compression``: tails stay nearly exact while the
+    middle of the distribution is summarised coarsely. Two digests merge by
+    concatenating their centroids and compressing again, which is what lets
+    per-hour sketches combine into any longer range.
+    """
+
+    def __init__(self, compression: int = 100):
+        self.compression = max(int(compression), 10)
+        self.centroids: List[List[float]] = []  # [mean, weight], sorted by mean
+        self._buffer: List[float] = []
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    @property
+    def count(self) -> int:
+        return int(sum(weight for _, weight in self.centroids)) + len(self._buffer)
+
+    def add(self, value: float) -> None:
+        value = float(value)
+        self._buffer.append(value)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self.compression * 5:
+            self._compress()
+
+    def extend(self, values: Iterable[float]) -> "TDigest":
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        other._compress()
+        self._compress()
+        self.centroids.extend([list(centroid) for centroid in other.centroids])
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(force=True)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not 0 <= q <= 1:
+            raise ValueError("quantiles must be between 0 and 1")
+        self._compress()
+        if not self.centroids:
+            return None
+        if q == 0:
+            return self.min
+        if q == 1:
+            return self.max
+
+        total = sum(weight for _, weight in self.centroids)
+        target = q * total
+        cumulative = 0.0
+        previous_mean, previous_mid = self.min, 0.0
+        for mean, weight in self.centroids:
+            mid = cumulative + weight / 2
+            if target < mid:
+                span = mid - previous_mid
+                if span <= 0:
+                    return mean
+                return previous_mean + (mean - previous_mean) * (target - previous_mid) / span
+            previous_mean, previous_mid = mean, mid
+            cumulative += weight
+        span = total - previous_mid
+        if span <= 0:
+            return self.max
+        return previous_mean + (self.max - previous_mean) * (target - previous_mid) / span
+
+    def to_bytes(self) -> bytes:
+        """Compact form: a 23-byte header then float32 means and uint32 weights."""
+        self._compress()
+        count = len(self.centroids)
+        return b"".join([
+            SKETCH_HEADER.pack(SKETCH_VERSION, self.compression, self.min, self.max, count),
+            struct.pack(f"<{count}f", *(mean for mean, _ in self.centroids)),
+            struct.pack(f"<{count}I", *(int(weight) for _, weight in self.centroids)),
+        ])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TDigest":
+        version, compression, minimum, maximum, count = SKETCH_HEADER.unpack_from(data)
+        if version != SKETCH_VERSION:
+            raise ValueError(f"unsupported sketch version {version}")
+        offset = SKETCH_HEADER.size
+        means = struct.unpack_from(f"<{count}f", data, offset)
+        weights = struct.unpack_from(f"<{count}I", data, offset + 4 * count)
+        digest = cls(compression)
+        digest.centroids = [[mean, weight] for mean, weight in zip(means, weights)]
+        digest.min, digest.max = minimum, maximum
+        return digest
+
+    def _compress(self, force: bool = False) -> None:
+        if not self._buffer and not force:
+            return
+        items = self.centroids + [[value, 1] for value in self._buffer]
+        self._buffer = []
+        if not items:
+            return
+        items.sort(key=lambda item: item[0])
+        total = sum(weight for _, weight in items)
+
+        merged = [list(items[0])]
+        before = 0.0
+        for mean, weight in items[1:]:
+            current = merged[-1]
+            q_low = before / total
+            q_high = (before + current[1] + weight) / total
+            limit = 4 * total * min(q_low * (1 - q_low), q_high * (1 - q_high)) / self.compression
+            if current[1] + weight <= max(limit, 1):
+                combined = current[1] + weight
+                current[0] += (mean - current[0]) * weight / combined
+                current[1] = combined
+            else:
+                before += current[1]
+                merged.append([mean, weight])
+        self.centroids = merged
+
+
+class SensorSketchStore:
+    """Hourly t-digests of temperature, humidity and LDR per box.
+
+    Every ingest batch pushes one small digest per metric into the hour's
+    ``sensor_sketches`` document, which is an atomic append. The store
+    counts the parts it pushed per box-hour and folds them into one digest
+    once there are ``compact_after`` of them, and again when the hour falls
+    out of the ingest window. Stored hours therefore stay at a handful of
+    parts. A read of a closed hour still compacts whatever is left, for
+    example parts pushed by other processes. A compaction is guarded by the
+    ``updates`` counter: a concurrent push wins, and the next compaction
+    retries.
+    """
+
+    def __init__(self, db, compression: int = 100, compact_after: int = COMPACT_AFTER_PARTS):
+        self.collection = db["sensor_sketches"]
+        self.compression = compression
+        self.compact_after = max(int(compact_after), 2)
+        self._pending: Dict[tuple, int] = {}  # (box_id, hour) -> parts pushed since the last compaction
+        self._lock = threading.Lock()
+        self.compactions = 0
+
+    def ensure_indexes(self) -> None:
+        try:
+            self.collection.create_index(
+                [("box_id", ASCENDING), ("hour", ASCENDING)],
+                unique=True,
+                background=True,
+            )
+        except OperationFailure:  # pragma: no cover - index already exists with other options
+            pass
+
+    def observe(self, payloads: List[dict]) -> None:
+        digests: Dict[tuple, Dict[str, TDigest]] = OrderedDict()
+        for payload in payloads:
+            data = payload.get("data") or {}
+            key = (payload["box_id"], payload["recorded_at"].replace(minute=0, second=0, microsecond=0))
+            for field, name in ROLLUP_METRICS.items():
+                value = data.get(field)
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                metrics = digests.setdefault(key, {})
+                if name not in metrics:
+                    metrics[name] = TDigest(self.compression)
+                metrics[name].add(value)
+        if not digests:
+            return
+
+        self.collection.bulk_write(
+            [
+                UpdateOne(
+                    {"box_id": box_id, "hour": hour},
+                    {
+                        "$push": {
+                            f"parts.{name}": Binary(digest.to_bytes()) for name, digest in metrics.items()
+                        },
+                        "$inc": {"updates": 1},
+                    },
+                    upsert=True,
+                )
+                for (box_id, hour), metrics in digests.items()
+            ],
+            ordered=False,
+        )
+        for box_id, hour in self._due_for_compaction(digests):
+            doc = self.collection.find_one({"box_id": box_id, "hour": hour})
+            if doc is not None:
+                self._compact(doc)
+
+    def _due_for_compaction(self, pushed: Iterable[tuple]) -> List[tuple]:
+        """Count the new parts; returns the box-hours that hit the bound or left the window."""
+        due = []
+        with self._lock:
+            newest = None
+            for key in pushed:
+                count = self._pending.get(key, 0) + 1
+                if count >= self.compact_after:
+                    due.append(key)
+                    self._pending.pop(key, None)
+                else:
+                    self._pending[key] = count
+                newest = key[1] if newest is None else max(newest, key[1])
+            # Hours more than one hour behind the newest are closed: fold
+            # what is left instead of waiting for a read that may never come.
+            for key in [key for key in self._pending if key[1] < newest - timedelta(hours=1)]:
+                if self._pending.pop(key) > 1:
+                    due.append(key)
+        return due
+
+    def merged(
+        self,
+        box_id: str,
+        metric: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        now: Optional[datetime] = None,
+    ) -> Tuple[TDigest, int]:
+        """Merge the hourly digests overlapping ``[start, end)``; returns the digest and hour count."""
+        if metric not in ROLLUP_METRICS.values():
+            raise ValueError(f"metric must be one of {', '.join(ROLLUP_METRICS.values())}")
+        query = {"box_id": box_id}
+        bounds = {}
+        if start is not None:
+            bounds["$gte"] = start.replace(minute=0, second=0, microsecond=0)
+        if end is not None:
+            bounds["$lt"] = end
+        if bounds:
+            query["hour"] = bounds
+        open_hour = (now or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+
+        result = TDigest(self.compression)
+        hours = 0
+        for doc in self.collection.find(query).sort("hour", ASCENDING):
+            parts = (doc.get("parts") or {}).get(metric) or []
+            if not parts:
+                continue
+            hours += 1
+            hourly = self._merge_parts(parts)
+            if len(parts) > 1 and doc["hour"] < open_hour:
+                self._compact(doc)
+            result.merge(hourly)
+        return result, hours
+
+    def _merge_parts(self, parts: Sequence[bytes]) -> TDigest:
+        digest = TDigest.from_bytes(parts[0])
+        for part in parts[1:]:
+            digest.merge(TDigest.from_bytes(part))
+        return digest
+
+    def _compact(self, doc: dict) -> None:
+        merged = {
+            f"parts.{name}": [Binary(self._merge_parts(parts).to_bytes())]
+            for name, parts in (doc.get("parts") or {}).items()
+            if parts
+        }
+        if merged:
+            self.collection.update_one({"_id": doc["_id"], "updates": doc.get("updates")}, {"$set": merged})
+            self.compactions += 1
+
+
+def percentiles(digest: TDigest, quantiles: Sequence[float]) -> Dict[str, Optional[float]]:
+    return {format(q, "g"): digest.quantile(q) for q in quantiles}
+
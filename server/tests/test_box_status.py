@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from routes import medibox
+from services.box_status import BoxStatusCache
+
+
+def test_status_fields_never_move_backwards(app):
+    db = app.config["MONGO_DB"]
+    status = BoxStatusCache(db, ttl=60)
+    start = datetime(2025, 6, 1, 8, 0, 0)
+
+    status.observe(
+        [{"box_id": "box-s", "data": {"temperature": 24.0}, "recorded_at": start + timedelta(minutes=5)}],
+        [{"box_id": "box-s", "type": "lid_opened", "at": start + timedelta(minutes=5)}],
+    )
+    # A late batch carries older readings and events; only last_seen_at may not regress either.
+    status.observe(
+        [{"box_id": "box-s", "data": {"temperature": 19.0}, "recorded_at": start}],
+        [{"box_id": "box-s", "type": "lid_closed", "at": start}],
+    )
+    status.set_pill_count("box-s", 6, start + timedelta(hours=1))
+    status.set_pill_count("box-s", 9, start)
+
+    doc = status.get("box-s")
+    assert doc["latest"]["data"] == {"temperature": 24.0}
+    assert doc["lid_state"] == "open"
+    assert doc["pill_count"] == 6
+    assert doc["last_seen_at"] == start + timedelta(minutes=5)
+
+    reads = status.stats()["reads"]
+    status.get("box-s")
+    assert status.stats()["reads"] == reads and status.stats()["hits"] == 1
+
+    status.seen("box-s", start + timedelta(hours=2))
+    assert status.get("box-s")["last_seen_at"] == start + timedelta(hours=2)
+    assert status.get("box-none") is None
+
+
+def test_status_endpoint_follows_ingest(app):
+    status_app = Flask(__name__)
+    status_app.register_blueprint(medibox.create_medibox_blueprint(
+        app.config["MONGO_DB"],
+        {"LID_EVENTS_ENABLED": True, "INVENTORY_ENABLED": True, "BOX_STATUS_ENABLED": True,
+         "BOX_STATUS_CACHE_SECONDS": 0},
+    ))
+    client = status_app.test_client()
+
+    assert client.put("/api/mediboxes/box-st/inventory", json={"count": 4}).status_code == 200
+    for ldr in (100, 1500):
+        assert client.post("/api/send_data", json={"box_id": "box-st", "ldr_value": ldr}).status_code == 201
+
+    response = client.get("/api/mediboxes/box-st/status")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["lid_state"] == "open"
+    assert body["pill_count"] == 3
+    assert body["latest"]["data"]["ldr_value"] == 1500
+    assert body["last_seen_at"]
+
+    assert client.get("/api/mediboxes/box-unknown/status").status_code == 404
+
+
+def test_status_endpoint_requires_tracking(client):
+    assert client.get("/api/mediboxes/box-st/status").status_code == 409
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from services.deadband import DeadbandFilter
+from services.medibox_service import MediBoxService
+
+
+def test_deadband_skips_idle_readings_but_keeps_lid_crossings_and_heartbeats():
+    band = DeadbandFilter(heartbeat_interval=timedelta(minutes=10))
+    start = datetime(2025, 1, 1, 8, 0, 0)
+
+    def reading(ldr, temperature=27.0):
+        return {"temperature": temperature, "humidity": 60, "ldr_value": ldr}
+
+    assert band.should_store("box-1", reading(100), start)
+    assert not band.should_store("box-1", reading(120, 27.2), start + timedelta(seconds=10))
+    assert band.should_store("box-1", reading(100, 28.0), start + timedelta(seconds=20))
+    assert band.should_store("box-1", reading(980), start + timedelta(seconds=30))
+    assert band.should_store("box-1", reading(1010), start + timedelta(seconds=40))
+    assert not band.should_store("box-1", reading(1015), start + timedelta(seconds=50))
+    assert band.should_store("box-1", reading(1015), start + timedelta(minutes=11))
+    assert band.stats()["suppressed"] == 2
+
+
+def test_service_batch_reports_suppressed_readings(app):
+    db = app.config["MONGO_DB"]
+    service = MediBoxService(db, deadband=DeadbandFilter())
+
+    results = service.record_sensor_batch([
+        {"box_id": "box-idle", "temperature": 25.0, "humidity": 50, "ldr_value": 40},
+        {"box_id": "box-idle", "temperature": 25.1, "humidity": 50, "ldr_value": 42},
+    ])
+
+    assert [item["status"] for item in results] == ["accepted", "suppressed"]
+    assert db["sensor_logs"].count_documents({"box_id": "box-idle"}) == 1
@@ -0,0 +1,63 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.exporter import SENSOR_COLUMNS, DataExporter, iter_column_batches
+from services.medibox_service import MediBoxService
+
+START = datetime(2024, 3, 1, 8, 0)
+
+
+def _seed(db, count=25):
+    db["sensor_logs"].insert_many([
+        {
+            "box_id": f"box-{index % 2}",
+            "data": {"temperature": 20 + index, "humidity": "n/a", "medicine_taken": index % 5 == 0},
+            "recorded_at": START + timedelta(minutes=index),
+        }
+        for index in range(count)
+    ])
+
+
+def test_column_batches_are_typed_and_bounded():
+    docs = [
+        {"box_id": "box-1", "recorded_at": START, "data": {"temperature": 21, "humidity": "wet", "ldr_value": True}},
+        {"box_id": "box-1", "recorded_at": START, "seq": 4},
+        {"box_id": "box-1", "recorded_at": START, "data": {"temperature": 22.5}},
+    ]
+    batches = list(iter_column_batches(docs, SENSOR_COLUMNS, 2))
+
+    assert [len(batch["box_id"]) for batch in batches] == [2, 1]
+    assert batches[0]["temperature"] == [21.0, None]
+    assert batches[0]["humidity"] == [None, None]
+    assert batches[0]["ldr_value"] == [None, None]
+    assert batches[0]["seq"] == [None, 4]
+    assert batches[1]["temperature"] == [22.5]
+
+
+def test_export_endpoint_validates_arguments(app):
+    client = app.test_client()
+    assert client.get("/api/exports/reminders").status_code == 400
+    assert client.get("/api/exports/sensor?format=csv").status_code == 400
+    assert client.get("/api/exports/sensor?from=2024-03-02&to=2024-03-01").status_code == 400
+
+
+def test_export_round_trips_through_arrow_and_parquet(app):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    db = app.config["MONGO_DB"]
+    _seed(db)
+    exporter = DataExporter(MediBoxService(db), batch_rows=4)
+
+    sink = io.BytesIO()
+    assert exporter.write(sink, "sensor", "arrow", box_id="box-1") == 12
+    table = pa.ipc.open_stream(sink.getvalue()).read_all()
+    assert table.column("temperature").to_pylist()[:2] == [21.0, 23.0]
+    assert table.column("humidity").null_count == 12
+
+    response = app.test_client().get("/api/exports/sensor?format=parquet&from=2024-03-01T08:10:00")
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.data))
+    assert table.num_rows == 15
+    assert table.column("box_id").to_pylist() == ["box-0"] * 8 + ["box-1"] * 7
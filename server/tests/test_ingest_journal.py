@@ -0,0 +1,106 @@
+from datetime import datetime
+
+from pymongo.errors import AutoReconnect
+
+from services.deadband import DeadbandFilter
+from services.ingest_journal import IngestJournal, JournalReplayer
+from services.medibox_service import MediBoxService
+from services.rollups import SensorRollupService
+from services.sensor_buffer import POLICY_REJECT, SensorWriteBuffer
+
+
+def payload(value):
+    return {"box_id": "box-j", "data": {"ldr_value": value}, "recorded_at": datetime(2024, 1, 1, 8, 0, value)}
+
+
+def test_journal_round_trip_resumes_from_checkpoint(tmp_path):
+    journal = IngestJournal(str(tmp_path), segment_bytes=200)
+    for value in range(6):
+        journal.append([payload(value)])
+    assert journal.stats()["segments"] > 1
+
+    first, position = journal.read_batch(4)
+    assert [item["data"]["ldr_value"] for item in first] == [0, 1, 2, 3]
+    assert first[0]["recorded_at"] == datetime(2024, 1, 1, 8, 0, 0)
+    journal.commit(position)
+    journal.close()
+
+    reopened = IngestJournal(str(tmp_path), segment_bytes=200)
+    rest, position = reopened.read_batch(100)
+    assert [item["data"]["ldr_value"] for item in rest] == [4, 5]
+    reopened.commit(position)
+    assert reopened.pending_bytes() == 0
+    assert reopened.stats()["segments"] == 1
+
+
+def test_corrupt_tail_is_skipped(tmp_path):
+    journal = IngestJournal(str(tmp_path))
+    journal.append([payload(1), payload(2)])
+    journal.close()
+    segment = next(tmp_path.glob("*.seg"))
+    segment.write_bytes(segment.read_bytes()[:-3])
+
+    reopened = IngestJournal(str(tmp_path))
+    items, _ = reopened.read_batch(10)
+    assert [item["data"]["ldr_value"] for item in items] == [1]
+    assert reopened.corrupt_records == 1
+
+
+def test_failed_writes_are_journaled_and_replayed(app, tmp_path, monkeypatch):
+    db = app.config["MONGO_DB"]
+    service = MediBoxService(db, journal=IngestJournal(str(tmp_path)))
+
+    def unavailable(*args, **kwargs):
+        raise AutoReconnect("connection refused")
+
+    monkeypatch.setattr(service.sensor_logs, "insert_many", unavailable)
+    record = service.record_sensor_data("box-j", {"ldr_value": 120})
+    batch = service.record_sensor_batch([{"box_id": "box-j", "ldr_value": 130}])
+    assert record["journaled"] is True
+    assert batch[0]["status"] == "journaled"
+    assert db["sensor_logs"].count_documents({"box_id": "box-j"}) == 0
+
+    monkeypatch.undo()
+    replayer = JournalReplayer(service.journal, service.replay_sensor_payloads, batch_size=1)
+    assert replayer.replay() == 2
+    assert replayer.replay() == 0
+    assert db["sensor_logs"].count_documents({"box_id": "box-j"}) == 2
+    assert replayer.stats()["batches"] == 2
+
+
+def test_buffer_spills_instead_of_rejecting(tmp_path):
+    journal = IngestJournal(str(tmp_path))
+    buffer = SensorWriteBuffer(lambda batch: None, max_size=2, flush_interval=60,
+                               policy=POLICY_REJECT, overflow_fn=journal.append)
+
+    for value in range(3):
+        buffer.submit(payload(value))
+
+    assert len(buffer) == 2
+    assert buffer.stats()["spilled"] == 1
+    assert [item["data"]["ldr_value"] for item in journal.read_batch(10)[0]] == [2]
+
+
+def test_only_failed_writes_are_journaled(app, tmp_path, monkeypatch):
+    db = app.config["MONGO_DB"]
+    service = MediBoxService(
+        db,
+        deadband=DeadbandFilter(tolerances={"ldr_value": 50}),
+        journal=IngestJournal(str(tmp_path)),
+        rollups=SensorRollupService(db),
+    )
+
+    def unavailable(*args, **kwargs):
+        raise AutoReconnect("connection refused")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(service.sensor_logs, "insert_many", unavailable)
+        statuses = service.persist_sensor_payloads([payload(1), payload(2)])
+    assert statuses == ["journaled", "suppressed"]
+    assert [item["data"]["ldr_value"] for item in service.journal.read_batch(10)[0]] == [1]
+
+    # A failure after the insert (rollups here) leaves the stored reading alone.
+    monkeypatch.setattr(service.rollups, "observe", unavailable)
+    assert service.persist_sensor_payloads([payload(59)]) == ["stored"]
+    assert db["sensor_logs"].count_documents({"box_id": "box-j"}) == 1
+    assert len(service.journal.read_batch(10)[0]) == 1
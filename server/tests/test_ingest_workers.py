@@ -0,0 +1,132 @@
+import json
+
+import mongomock
+from flask import Flask
+
+from routes import medibox
+from services.ingest_workers import HashRing, ShardedIngestPool, ShardWorker
+from services.medibox_service import MediBoxService
+from services.mqtt_ingest import MqttSensorIngestor
+from utils.telemetry_frame import encode_frame, split_frames_by_box
+
+
+def _mock_database():
+    return mongomock.MongoClient()["medibox_workers"]
+
+
+def test_hash_ring_is_stable_and_moves_few_boxes():
+    box_ids = [f"box-{index}" for index in range(2000)]
+    three = HashRing(3)
+    four = HashRing(4)
+
+    assignments = [three.shard_for(box_id) for box_id in box_ids]
+    assert assignments == [HashRing(3).shard_for(box_id) for box_id in box_ids]
+    assert set(assignments) == {0, 1, 2}
+    moved = sum(1 for box_id, shard in zip(box_ids, assignments) if four.shard_for(box_id) != shard)
+    assert moved < len(box_ids) / 2
+
+
+def test_frames_are_split_per_box_in_order():
+    body = b"".join([
+        encode_frame("box-a", 25, 60, 100, seq=1),
+        encode_frame("box-b", 25, 60, 200, seq=1),
+        encode_frame("box-a", 25, 60, 300, seq=2),
+    ])
+
+    groups = split_frames_by_box(body)
+
+    assert list(groups) == ["box-a", "box-b"]
+    assert groups["box-a"] == encode_frame("box-a", 25, 60, 100, seq=1) + encode_frame("box-a", 25, 60, 300, seq=2)
+
+
+def test_shard_worker_persists_json_and_frames(app):
+    db = app.config["MONGO_DB"]
+    worker = ShardWorker(MediBoxService(db))
+
+    readings, errors = worker.handle([
+        ("box-w", json.dumps({"ldr_value": 120}).encode()),
+        ("box-w", encode_frame("box-w", 26.5, 61, 130)),
+        ("box-w", b"not json"),
+    ])
+
+    assert (readings, errors) == (2, 1)
+    assert [doc["data"]["ldr_value"] for doc in db["sensor_logs"].find({"box_id": "box-w"})] == [120, 130]
+
+
+def test_pool_routes_messages_to_worker_processes():
+    pool = ShardedIngestPool(2, _mock_database, batch_size=10).start()
+    for index in range(20):
+        pool.submit(f"box-{index % 5}", json.dumps({"ldr_value": index}).encode())
+    pool.close()
+
+    stats = pool.stats()
+    assert pool.processed() == 20
+    assert stats["submitted"] == 20
+    assert sum(shard["readings"] for shard in stats["shards"]) == 20
+
+
+def test_batch_route_goes_through_the_pool(app):
+    pool = ShardedIngestPool(2, _mock_database, batch_size=10).start()
+    pool_app = Flask(__name__)
+    pool_app.register_blueprint(medibox.create_medibox_blueprint(app.config["MONGO_DB"], ingest_pool=pool))
+    client = pool_app.test_client()
+
+    response = client.post("/api/mediboxes/sensor/batch", json={"readings": [
+        {"box_id": f"box-{index % 3}", "ldr_value": index} for index in range(9)
+    ] + [{"ldr_value": 1}]})
+    frames = client.post(
+        "/api/send_data_batch",
+        data=encode_frame("box-a", 25, 60, 100) + encode_frame("box-b", 25, 60, 200),
+        content_type="application/vnd.medibox.telemetry",
+    )
+    pool.close()
+
+    assert response.status_code == 202
+    assert response.get_json()["box_ids"] == ["box-0", "box-1", "box-2"]
+    assert response.get_json()["rejected"] == 1
+    assert frames.status_code == 202
+    assert pool.processed() == 11
+    assert app.config["MONGO_DB"]["sensor_logs"].count_documents({}) == 0
+
+
+def test_mqtt_readings_go_through_the_pool(app):
+    submitted = []
+
+    class RecordingPool:
+        def submit(self, box_id, body):
+            submitted.append((box_id, json.loads(body)))
+
+    ingestor = MqttSensorIngestor(MediBoxService(app.config["MONGO_DB"]), ingest_pool=RecordingPool())
+    ingestor.submit("medibox/data/box-m", json.dumps({"ldr_value": 300}).encode())
+    ingestor.drain()
+
+    assert submitted == [("box-m", [{"ldr_value": 300, "box_id": "box-m"}])]
+    assert ingestor.stats()["buffer"] is None
+    assert app.config["MONGO_DB"]["sensor_logs"].count_documents({}) == 0
+
+
+def test_frames_without_a_box_id_are_rejected_before_the_pool(app):
+    submitted = []
+
+    class RecordingPool:
+        def submit(self, box_id, body):
+            submitted.append(box_id)
+
+    pool_app = Flask(__name__)
+    pool_app.register_blueprint(
+        medibox.create_medibox_blueprint(app.config["MONGO_DB"], ingest_pool=RecordingPool())
+    )
+    client = pool_app.test_client()
+    content_type = "application/vnd.medibox.telemetry"
+
+    single = client.post("/api/send_data", data=encode_frame("", 25, 60, 100), content_type=content_type)
+    batch = client.post(
+        "/api/send_data_batch",
+        data=encode_frame("box-a", 25, 60, 100) + encode_frame("", 25, 60, 200),
+        content_type=content_type,
+    )
+    json_body = client.post("/api/send_data", json={"box_id": 7, "ldr_value": 100})
+
+    assert [response.status_code for response in (single, batch, json_body)] == [400, 400, 400]
+    assert single.get_json()["message"] == "box_id is required"
+    assert submitted == []
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from routes import medibox
+from services.inventory_service import InventoryService
+
+
+def test_inventory_counts_doses_and_rebuilds_past_counts(app):
+    db = app.config["MONGO_DB"]
+    inventory = InventoryService(db, snapshot_every=2)
+    start = datetime(2025, 4, 1, 8, 0, 0)
+
+    inventory.refill("box-inv", 10, at=start)
+    inventory.on_lid_opened("box-inv", start + timedelta(hours=1))
+    inventory.on_confirmation("box-inv", start + timedelta(hours=1, minutes=1))
+    inventory.on_lid_opened("box-inv", start + timedelta(hours=2))
+    inventory.on_lid_opened("box-inv", start + timedelta(hours=3))
+    inventory.on_confirmation("box-inv", start + timedelta(hours=4))
+
+    current = inventory.get("box-inv")
+    assert current["current_count"] == 7
+    assert current["taken_count"] == 3
+
+    assert inventory.count_at("box-inv", start + timedelta(minutes=30))["current_count"] == 10
+    assert inventory.count_at("box-inv", start + timedelta(hours=2, minutes=30))["current_count"] == 8
+    assert inventory.count_at("box-inv", start + timedelta(hours=3, minutes=30))["current_count"] == 7
+    assert db["inventory_snapshots"].count_documents({"box_id": "box-inv"}) >= 2
+
+
+def test_inventory_endpoint_follows_lid_events(app):
+    inventory_app = Flask(__name__)
+    inventory_app.register_blueprint(medibox.create_medibox_blueprint(
+        app.config["MONGO_DB"],
+        {"LID_EVENTS_ENABLED": True, "INVENTORY_ENABLED": True},
+    ))
+    client = inventory_app.test_client()
+
+    assert client.put("/api/mediboxes/box-pill/inventory", json={"count": 5}).status_code == 200
+    for ldr in (100, 1500, 100, 1600, 100):
+        client.post("/api/send_data", json={"box_id": "box-pill", "ldr_value": ldr})
+    client.post("/api/send_data", json={"box_id": "box-pill", "ldr_value": 90, "medicine_taken": True})
+
+    body = client.get("/api/mediboxes/box-pill/inventory").get_json()
+    assert body["current_count"] == 3
+    assert body["remaining"] == 3
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from routes import medibox
+from services.lid_events import LidEventDetector
+
+
+def test_detector_applies_hysteresis_and_records_open_duration(app):
+    db = app.config["MONGO_DB"]
+    detector = LidEventDetector(db, threshold=1000, hysteresis=50)
+    start = datetime(2025, 2, 1, 7, 0, 0)
+    ldr_values = [100, 1005, 990, 1003, 960, 940, 1200, 100]
+
+    detector.observe([
+        {"box_id": "box-lid", "data": {"ldr_value": value}, "recorded_at": start + timedelta(seconds=10 * step)}
+        for step, value in enumerate(ldr_values)
+    ])
+
+    events = list(db["box_events"].find({"box_id": "box-lid"}).sort("at", 1))
+    assert [event["type"] for event in events] == ["lid_opened", "lid_closed", "lid_opened", "lid_closed"]
+    assert events[1]["duration_seconds"] == 40
+    assert detector.count_openings("box-lid", since=start + timedelta(seconds=15)) == 1
+
+    restarted = LidEventDetector(db)
+    restarted.observe([{"box_id": "box-lid", "data": {"ldr_value": 1500}, "recorded_at": start + timedelta(minutes=5)}])
+    assert restarted.count_openings("box-lid") == 3
+
+
+def test_events_endpoint_lists_transitions_from_ingest(app):
+    events_app = Flask(__name__)
+    events_app.register_blueprint(
+        medibox.create_medibox_blueprint(app.config["MONGO_DB"], {"LID_EVENTS_ENABLED": True})
+    )
+    client = events_app.test_client()
+
+    for ldr in (120, 1400, 1300, 80):
+        assert client.post("/api/send_data", json={"box_id": "box-ev", "ldr_value": ldr}).status_code == 201
+
+    response = client.get("/api/mediboxes/box-ev/events")
+    assert response.status_code == 200
+    assert [event["type"] for event in response.get_json()] == ["lid_closed", "lid_opened"]
+
+    settings = client.put("/api/mediboxes/box-ev/lid-settings", json={"threshold": 1500})
+    assert settings.get_json()["threshold"] == 1500
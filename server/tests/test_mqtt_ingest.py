@@ -0,0 +1,48 @@
+import json
+
+from services.medibox_service import MediBoxService
+from services.mqtt_ingest import MqttSensorIngestor
+from utils.rate_limit import TokenBucketLimiter
+from utils.telemetry_frame import encode_frame
+
+
+def test_mqtt_messages_are_decoded_and_bulk_persisted(app):
+    db = app.config["MONGO_DB"]
+    ingestor = MqttSensorIngestor(MediBoxService(db), workers=1, batch_size=50, flush_interval=60)
+
+    assert ingestor.submit("medibox/data/box-m1", json.dumps({"temperature": 26.5, "ldr_value": 300}).encode())
+    assert ingestor.submit("medibox/data/box-m2", encode_frame("box-m2", 25.0, 50.0, 1200))
+    assert ingestor.submit("medibox/data/box-m1", b"{not json")
+    ingestor.drain()
+
+    assert db["sensor_logs"].find_one({"box_id": "box-m1"})["data"]["temperature"] == 26.5
+    assert db["sensor_logs"].find_one({"box_id": "box-m2"})["data"]["ldr_value"] == 1200
+    stats = ingestor.stats()
+    assert stats["decoded"] == 2
+    assert stats["decode_errors"] == 1
+    assert stats["buffer"]["flush_count"] == 1
+
+
+def test_mqtt_ingest_queue_is_bounded(app):
+    ingestor = MqttSensorIngestor(MediBoxService(app.config["MONGO_DB"]), queue_size=1)
+
+    assert ingestor.submit("medibox/data/box-1", b"{}")
+    assert not ingestor.submit("medibox/data/box-1", b"{}")
+    assert ingestor.stats()["dropped"] == 1
+
+
+def test_box_id_comes_from_the_topic_and_limiter_applies(app):
+    db = app.config["MONGO_DB"]
+    limiter = TokenBucketLimiter(rate=0.001, burst=2)
+    ingestor = MqttSensorIngestor(MediBoxService(db), workers=1, flush_interval=60, limiter=limiter)
+
+    ingestor.submit("medibox/data/box-t", json.dumps({"box_id": "box-other", "ldr_value": 1}).encode())
+    ingestor.submit("medibox/data/box-t", encode_frame("box-spoof", 25.0, 50.0, 2))
+    ingestor.submit("medibox/data/box-t", json.dumps({"ldr_value": 3}).encode())
+    ingestor.submit("medibox/data/", json.dumps({"box_id": "box-x", "ldr_value": 4}).encode())
+    ingestor.drain()
+
+    assert [doc["data"]["ldr_value"] for doc in db["sensor_logs"].find({"box_id": "box-t"})] == [1, 2]
+    assert db["sensor_logs"].count_documents({"box_id": {"$ne": "box-t"}}) == 0
+    assert ingestor.stats()["throttled"] == 1
+    assert ingestor.stats()["decode_errors"] == 1
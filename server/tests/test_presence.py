@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from services.medibox_service import MediBoxService
+from services.presence import FIELD_SENSOR, PresenceTracker
+
+
+def test_presence_coalesces_touches_into_one_flush(app):
+    db = app.config["MONGO_DB"]
+    db["mediboxes"].insert_many([{"box_id": "box-p1"}, {"box_id": "box-p2"}])
+    presence = PresenceTracker(db, flush_interval=60)
+    service = MediBoxService(db, presence=presence)
+
+    for value in range(5):
+        service.record_sensor_data("box-p1", {"ldr_value": value})
+    service.log_intake("m-1", True, box_id="box-p2")
+    assert db["mediboxes"].find_one({"box_id": "box-p1"}).get("last_sensor_at") is None
+
+    assert presence.flush() == 2
+    stats = presence.stats()
+    assert stats["touches"] == 6 and stats["written"] == 2 and stats["pending_boxes"] == 0
+    assert db["mediboxes"].find_one({"box_id": "box-p1"})["last_sensor_at"] is not None
+    assert db["mediboxes"].find_one({"box_id": "box-p2"})["last_intake_at"] is not None
+
+
+def test_flush_never_moves_timestamps_backwards(app):
+    db = app.config["MONGO_DB"]
+    newer = datetime(2024, 5, 1, 12, 0)
+    db["mediboxes"].insert_one({"box_id": "box-p3", "last_sensor_at": newer})
+    presence = PresenceTracker(db)
+
+    presence.touch("box-p3", FIELD_SENSOR, newer - timedelta(minutes=5))
+    presence.flush()
+
+    assert db["mediboxes"].find_one({"box_id": "box-p3"})["last_sensor_at"] == newer
+
+
+def test_silent_boxes_endpoint(app):
+    from flask import Flask
+    from routes import medibox
+
+    db = app.config["MONGO_DB"]
+    now = datetime.utcnow()
+    db["mediboxes"].insert_many([
+        {"box_id": "box-quiet", "last_sensor_at": now - timedelta(hours=2)},
+        {"box_id": "box-busy", "last_sensor_at": now - timedelta(hours=3)},
+    ])
+    presence_app = Flask(__name__)
+    blueprint = medibox.create_medibox_blueprint(db, {"PRESENCE_TRACKING_ENABLED": True})
+    presence_app.register_blueprint(blueprint)
+    client = presence_app.test_client()
+
+    client.post("/api/send_data", json={"box_id": "box-busy", "ldr_value": 10})
+    response = client.get("/api/mediboxes/silent?minutes=60")
+
+    assert response.status_code == 200
+    assert [item["box_id"] for item in response.get_json()] == ["box-quiet"]
+    assert client.get("/api/mediboxes/silent?minutes=0").status_code == 400
@@ -0,0 +1,67 @@
+from utils.rate_limit import MongoRateStore, TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=1.0, burst=3, clock=clock)
+
+    assert [limiter.acquire("box-1")[0] for _ in range(4)] == [True, True, True, False]
+    allowed, retry_after = limiter.acquire("box-1")
+    assert not allowed and 0 < retry_after <= 1.0
+    assert limiter.acquire("box-2")[0] is True
+
+    clock.now += 1.0
+    assert limiter.acquire("box-1")[0] is True
+    assert limiter.acquire("box-1")[0] is False
+
+    stats = limiter.stats()
+    assert stats["throttled"] == 3
+    assert stats["top_throttled"] == {"box-1": 3}
+    assert stats["tracked_keys"] == 2
+
+
+def test_shared_store_is_seen_by_every_limiter(app):
+    collection = app.config["MONGO_DB"]["rate_limits"]
+    clock = FakeClock()
+    first = TokenBucketLimiter(1.0, 2, store=MongoRateStore(collection, "sensor"), clock=clock)
+    second = TokenBucketLimiter(1.0, 2, store=MongoRateStore(collection, "sensor"), clock=clock)
+
+    assert first.acquire("box-1")[0] is True
+    assert second.acquire("box-1")[0] is True
+    assert first.acquire("box-1")[0] is False
+    assert len(second.store) == 1
+
+
+def test_sensor_route_answers_429_with_retry_after(app):
+    from flask import Flask
+    from routes import medibox
+
+    limited_app = Flask(__name__)
+    limited_app.register_blueprint(medibox.create_medibox_blueprint(
+        app.config["MONGO_DB"],
+        {"RATE_LIMIT_ENABLED": True, "RATE_LIMIT_SENSOR_RATE": 0.01, "RATE_LIMIT_SENSOR_BURST": 2},
+    ))
+    client = limited_app.test_client()
+
+    statuses = [
+        client.post("/api/send_data", json={"box_id": "box-flood", "ldr_value": 10 + i}).status_code
+        for i in range(3)
+    ]
+    assert statuses == [201, 201, 429]
+
+    response = client.post("/api/mediboxes/box-flood/sensor", json={"ldr_value": 50})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert client.post("/api/send_data", json={"box_id": "box-calm", "ldr_value": 10}).status_code == 201
+
+    stats = client.get("/api/ingest/stats").get_json()["rate_limits"]
+    assert stats["sensor"]["throttled"] == 2
+    assert stats["sensor"]["top_throttled"] == {"box-flood": 2}
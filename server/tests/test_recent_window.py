@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+from services.medibox_service import MediBoxService
+from services.recent_window import RecentWindowStore
+
+
+def _payload(service, box_id, at, value):
+    return service.build_sensor_payload(box_id, {"temperature": value, "ldr_value": 100}, recorded_at=at)
+
+
+def test_ring_serves_recent_window_without_database_reads(app):
+    db = app.config["MONGO_DB"]
+    service = MediBoxService(db)
+    now = datetime.utcnow()
+    service.persist_sensor_payloads([
+        _payload(service, "box-w", now - timedelta(hours=30 - index), 20.0 + index) for index in range(30)
+    ])
+    loads = []
+    service.recent_window = RecentWindowStore(
+        lambda *args: loads.append(args) or service.iter_sensor_readings(*args),
+        hours=24,
+        capacity=100,
+    )
+
+    recent = service.recent_window.recent("box-w", now - timedelta(hours=3, minutes=30), now)
+    assert [reading["data"]["temperature"] for reading in recent] == [47.0, 48.0, 49.0]
+
+    service.persist_sensor_payloads([_payload(service, "box-w", now, 99.0)])
+    assert service.recent_window.latest("box-w")["data"] == {"temperature": 99.0, "ldr_value": 100.0}
+    assert len(service.recent_window.recent("box-w", now - timedelta(hours=24), now)) == 25
+    assert len(loads) == 1
+    assert service.recent_window.recent("box-w", now - timedelta(hours=48), now) is None
+
+
+def test_rings_are_fixed_size_and_evict_least_recently_viewed(app):
+    service = MediBoxService(app.config["MONGO_DB"])
+    store = service.recent_window = RecentWindowStore(service.iter_sensor_readings, capacity=4, max_boxes=2)
+    now = datetime.utcnow()
+    for box_id in ("box-1", "box-2"):
+        store.latest(box_id)
+    service.persist_sensor_payloads([
+        _payload(service, "box-1", now - timedelta(minutes=10 - index), float(index)) for index in range(10)
+    ])
+
+    # Only the newest ``capacity`` readings stay; older windows are no longer covered.
+    assert [r["data"]["temperature"] for r in store.recent("box-1", now - timedelta(minutes=4), now)] == [6, 7, 8, 9]
+    assert store.recent("box-1", now - timedelta(minutes=30), now) is None
+
+    store.latest("box-3")
+    assert store.stats()["boxes"] == 2 and store.stats()["evictions"] == 1
+    loads = store.stats()["loads"]
+    store.latest("box-1")
+    store.latest("box-2")
+    assert store.stats()["loads"] == loads + 1
+
+
+def test_recent_and_latest_endpoints(client, app):
+    service = MediBoxService(app.config["MONGO_DB"])
+    service.persist_sensor_payloads([_payload(service, "box-e", datetime.utcnow() - timedelta(minutes=5), 21.5)])
+
+    body = client.get("/api/mediboxes/box-e/sensor/recent?hours=1").get_json()
+    assert body["source"] == "database" and len(body["readings"]) == 1
+    assert client.get("/api/mediboxes/box-e/sensor/latest").get_json()["data"]["temperature"] == 21.5
+    assert client.get("/api/mediboxes/box-none/sensor/latest").status_code == 404
+    assert client.get("/api/mediboxes/box-e/sensor/recent?hours=0").status_code == 400
+
+
+def test_database_fallback_matches_the_ring_shape(app):
+    service = MediBoxService(app.config["MONGO_DB"])
+    now = datetime.utcnow()
+    service.persist_sensor_payloads([
+        service.build_sensor_payload(
+            "box-s",
+            {"temperature": 21, "humidity": 55.5, "ldr_value": 300, "battery": 90, "seq": index},
+            recorded_at=now - timedelta(minutes=10 - index),
+        )
+        for index in range(3)
+    ])
+
+    from_database = service.recent_sensor_readings("box-s", hours=1)
+    latest_from_database = service.latest_sensor_reading("box-s")
+    service.recent_window = RecentWindowStore(service.iter_sensor_readings, hours=24, capacity=100)
+    from_memory = service.recent_sensor_readings("box-s", hours=1)
+
+    assert from_database["source"] == "database" and from_memory["source"] == "memory"
+    assert from_database["readings"] == from_memory["readings"]
+    assert latest_from_database == service.latest_sensor_reading("box-s") == from_memory["readings"][-1]
+    assert set(latest_from_database) == {"box_id", "data", "recorded_at"}
@@ -0,0 +1,95 @@
+import random
+from datetime import datetime, timedelta
+
+from services.archive import SensorArchive, decode_block, encode_block
+from services.medibox_service import MediBoxService
+from services.retention import SensorRetention
+
+NOW = datetime(2024, 3, 10, 12, 0)
+
+
+def test_block_round_trip_is_lossless():
+    rng = random.Random(3)
+    start = datetime(2024, 3, 1)
+    readings = []
+    for index in range(2000):
+        data = {
+            "temperature": round(25 + rng.choice([-0.1, 0, 0.1]) * index % 3, 1),
+            "humidity": 60 + index % 4,
+            "ldr_value": rng.randint(0, 1023),
+            "medicine_taken": index % 50 == 0,
+        }
+        if index % 400 == 0:
+            data.update({"seq": index, "humidity": None, "firmware": "1.2"})
+        readings.append({
+            "box_id": "box-a",
+            "data": data,
+            "recorded_at": start + timedelta(seconds=10 * index, milliseconds=rng.choice([0, 0, 3])),
+        })
+
+    block = encode_block(readings)
+    decoded = decode_block(block, "box-a")
+    assert decoded == readings
+    assert [type(value) for value in decoded[1]["data"].values()] == [float, int, int, bool]
+    assert len(block) < len(readings) * 12
+
+
+def _seed(db, days=5):
+    db["sensor_logs"].insert_many([
+        {
+            "box_id": "box-r",
+            "data": {"temperature": 20.0 + hour / 10, "ldr_value": 100},
+            "recorded_at": NOW - timedelta(days=day, hours=hour),
+        }
+        for day in range(days)
+        for hour in range(0, 24, 6)
+    ])
+
+
+def test_retention_archives_cold_days_and_reads_them_back(app, tmp_path):
+    db = app.config["MONGO_DB"]
+    _seed(db)
+    archive = SensorArchive(str(tmp_path))
+    service = MediBoxService(db, archive=archive)
+    before = list(service.iter_sensor_readings("box-r"))
+
+    retention = SensorRetention(db["sensor_logs"], archive, hot_days=2)
+    moved = retention.run(now=NOW)
+
+    cutoff = datetime(2024, 3, 8)
+    assert moved == 9 and db["sensor_logs"].count_documents({}) == 11
+    assert db["sensor_logs"].count_documents({"recorded_at": {"$lt": cutoff}}) == 0
+    assert [day.isoformat() for day in archive.days("box-r")] == ["2024-03-05", "2024-03-06", "2024-03-07"]
+
+    after = list(service.iter_sensor_readings("box-r"))
+    assert [(r["recorded_at"], r["data"]) for r in after] == [(r["recorded_at"], r["data"]) for r in before]
+    window = list(service.iter_sensor_readings("box-r", datetime(2024, 3, 7, 6), datetime(2024, 3, 8, 6)))
+    assert [r["recorded_at"].hour for r in window] == [6, 12, 18, 0]
+
+    # A rerun (e.g. after a crash before the delete) never duplicates archived readings.
+    db["sensor_logs"].insert_one({"box_id": "box-r", "data": {"temperature": 20.0 + 6 / 10, "ldr_value": 100},
+                                  "recorded_at": datetime(2024, 3, 6, 6)})
+    retention.run(now=NOW)
+    assert len(archive.read_day("box-r", datetime(2024, 3, 6).date())) == 4
+
+
+def test_archived_readings_keep_their_sequence_numbers(app, tmp_path):
+    db = app.config["MONGO_DB"]
+    readings = [
+        {"box_id": "box-q", "seq": 40 + index, "data": {"temperature": 21.0},
+         "recorded_at": NOW - timedelta(days=4, hours=index)}
+        for index in range(3)
+    ]
+    readings.append({"box_id": "box-q", "data": {"temperature": 21.0}, "recorded_at": NOW - timedelta(days=4, hours=5)})
+    db["sensor_logs"].insert_many(readings)
+    archive = SensorArchive(str(tmp_path))
+    service = MediBoxService(db, archive=archive)
+
+    def stored():
+        return [(r.get("seq"), r["data"], r["recorded_at"]) for r in service.iter_sensor_readings("box-q")]
+
+    before = stored()
+    assert SensorRetention(db["sensor_logs"], archive, hot_days=2).run(now=NOW) == 4
+    after = stored()
+    assert after == before
+    assert [seq for seq, _, _ in after] == [None, 42, 41, 40]
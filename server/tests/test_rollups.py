@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from services.lid_events import LidEventDetector
+from services.medibox_service import MediBoxService
+from services.rollups import SensorRollupService
+
+START = datetime(2024, 3, 1, 8, 0)
+
+
+def readings(service, values, step=timedelta(seconds=20)):
+    return [
+        service.build_sensor_payload("box-r", {"temperature": 20 + index, "ldr_value": ldr}, recorded_at=START + step * index)
+        for index, ldr in enumerate(values)
+    ]
+
+
+def test_rollups_update_incrementally_at_ingest(app):
+    db = app.config["MONGO_DB"]
+    rollups = SensorRollupService(db)
+    service = MediBoxService(db, lid_detector=LidEventDetector(db), rollups=rollups)
+
+    service.persist_sensor_payloads(readings(service, [100, 1200, 100]))
+    service.persist_sensor_payloads([
+        service.build_sensor_payload("box-r", {"temperature": 30, "ldr_value": 1300}, recorded_at=START + timedelta(minutes=5)),
+    ])
+
+    minutes = rollups.query("box-r", "minute")
+    assert [bucket["count"] for bucket in minutes] == [3, 1]
+    assert minutes[0]["temperature"] == {"min": 20, "max": 22, "mean": 21, "count": 3}
+
+    (hour,) = rollups.query("box-r", "hour")
+    assert hour["count"] == 4
+    assert hour["lid_opens"] == 2
+    assert hour["ldr"]["max"] == 1300
+
+
+def test_backfill_matches_incremental_rollups(app):
+    db = app.config["MONGO_DB"]
+    service = MediBoxService(db)
+    service.persist_sensor_payloads(readings(service, range(0, 600, 10), step=timedelta(minutes=7)))
+
+    rollups = SensorRollupService(db)
+    assert rollups.backfill("box-r", service.iter_sensor_readings) == 60
+    hours = rollups.query("box-r", "hour")
+    assert sum(bucket["count"] for bucket in hours) == 60
+    assert len(hours) == 7
+
+    rollups.backfill("box-r", service.iter_sensor_readings, START, START + timedelta(hours=2))
+    assert rollups.query("box-r", "hour") == hours
+
+
+def test_minute_rollups_expire_and_the_planner_skips_them(app):
+    db = app.config["MONGO_DB"]
+    rollups = SensorRollupService(db, minute_retention_days=7)
+    rollups.ensure_indexes()
+
+    ttl = db["sensor_rollups"].index_information()["minute_rollups_ttl"]
+    assert ttl["expireAfterSeconds"] == 7 * 86400
+    assert ttl["partialFilterExpression"] == {"resolution": "minute"}
+    assert rollups.minute_horizon(START) == START - timedelta(days=7)
+    assert SensorRollupService(db).minute_horizon(START) is None
+
+    service = MediBoxService(db, rollups=rollups)
+    service.persist_sensor_payloads(readings(service, range(0, 600, 2), step=timedelta(seconds=20)))
+    end = START + timedelta(hours=2)
+    recent = service.history.query("box-r", START, end, max_points=200, now=end)
+    old = service.history.query("box-r", START, end, max_points=200, now=START + timedelta(days=8))
+    assert (recent["tier"], old["tier"]) == ("minute", "hour")
+
+
+def test_rollups_endpoint(app):
+    from flask import Flask
+    from routes import medibox
+
+    db = app.config["MONGO_DB"]
+    rollup_app = Flask(__name__)
+    rollup_app.register_blueprint(medibox.create_medibox_blueprint(db, {"ROLLUPS_ENABLED": True}))
+    client = rollup_app.test_client()
+
+    client.post("/api/mediboxes/box-r/sensor", json={"temperature": 25, "humidity": 60, "ldr_value": 100})
+    response = client.get("/api/mediboxes/box-r/rollups?resolution=day")
+    assert response.status_code == 200
+    (day,) = response.get_json()
+    assert day["count"] == 1 and day["humidity"]["mean"] == 60
+
+    assert client.get("/api/mediboxes/box-r/rollups?resolution=week").status_code == 400
@@ -0,0 +1,34 @@
+def test_sensor_batch_persists_readings_and_reports_rejects(app, client):
+    client.post("/api/mediboxes/register", json={"box_id": "box-a", "user_id": "u1"})
+    client.post("/api/mediboxes/register", json={"box_id": "box-b", "user_id": "u2"})
+
+    response = client.post(
+        "/api/mediboxes/sensor/batch",
+        json={
+            "readings": [
+                {"box_id": "box-a", "temperature": 27.1, "humidity": 60, "ldr_value": 120},
+                {"box_id": "box-b", "sensor_data": {"temperature": 26.0, "humidity": 58, "ldr_value": 1400}},
+                {"temperature": 25.0},
+                {"box_id": "box-a", "temperature": 27.3, "humidity": 61, "ldr_value": 118},
+            ]
+        },
+    )
+
+    assert response.status_code == 207
+    body = response.get_json()
+    assert body["accepted"] == 3
+    assert body["rejected"] == 1
+    statuses = [item["status"] for item in body["results"]]
+    assert statuses == ["accepted", "accepted", "rejected", "accepted"]
+    assert body["results"][2]["error"] == "box_id is required"
+
+    db = app.config["MONGO_DB"]
+    assert db["sensor_logs"].count_documents({"box_id": "box-a"}) == 2
+    stored_b = db["sensor_logs"].find_one({"box_id": "box-b"})
+    assert stored_b["data"]["ldr_value"] == 1400
+    assert db["mediboxes"].find_one({"box_id": "box-a"}).get("last_sensor_at") is not None
+
+
+def test_sensor_batch_rejects_empty_payload(client):
+    response = client.post("/api/send_data_batch", json={"readings": []})
+    assert response.status_code == 400
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+
+from services.medibox_service import MediBoxService
+
+
+def test_bucketed_storage_packs_box_hours_and_flattens_on_read(app):
+    db = app.config["MONGO_DB"]
+    service = MediBoxService(db, storage_mode="buckets")
+    base = datetime(2025, 3, 1, 9, 0, 0)
+
+    payloads = [
+        service.build_sensor_payload(
+            "box-b",
+            {"temperature": 26 + minute / 100, "humidity": 60, "ldr_value": 100 + minute},
+            recorded_at=base + timedelta(minutes=minute),
+        )
+        for minute in range(0, 90, 10)
+    ]
+    service.persist_sensor_payloads(payloads[:4])
+    service.persist_sensor_payloads(payloads[4:])
+
+    assert db["sensor_logs"].count_documents({}) == 0
+    buckets = list(db["sensor_buckets"].find({"box_id": "box-b"}).sort("bucket_start", 1))
+    assert [bucket["count"] for bucket in buckets] == [6, 3]
+    assert buckets[0]["offsets"][:2] == [0, 600]
+
+    readings = service.list_sensor_readings(
+        "box-b",
+        start=base + timedelta(minutes=15),
+        end=base + timedelta(minutes=75),
+    )
+    assert [reading["data"]["ldr_value"] for reading in readings] == [170, 160, 150, 140, 130, 120]
+    assert readings[0]["recorded_at"] == (base + timedelta(minutes=70)).isoformat()
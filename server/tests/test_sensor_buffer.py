@@ -0,0 +1,59 @@
+import pytest
+
+from services.sensor_buffer import BufferFullError, SensorWriteBuffer
+
+
+def test_buffer_flushes_in_bulk_and_tracks_counters():
+    batches = []
+    buffer = SensorWriteBuffer(batches.append, max_size=10, flush_size=3, flush_interval=60)
+
+    for value in range(7):
+        buffer.submit({"box_id": "box-1", "data": {"ldr_value": value}})
+
+    assert buffer.flush() == 7
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    stats = buffer.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["flushed"] == 7
+    assert stats["flush_count"] == 3
+
+
+def test_buffer_backpressure_policies():
+    dropping = SensorWriteBuffer(lambda batch: None, max_size=2, policy="drop_oldest")
+    for value in range(3):
+        dropping.submit({"seq": value})
+    assert dropping.stats()["dropped"] == 1
+    assert len(dropping) == 2
+
+    rejecting = SensorWriteBuffer(lambda batch: None, max_size=1, policy="reject")
+    rejecting.submit({"seq": 0})
+    with pytest.raises(BufferFullError):
+        rejecting.submit({"seq": 1})
+    assert rejecting.stats()["rejected"] == 1
+
+
+def test_background_flusher_drains_on_close():
+    batches = []
+    buffer = SensorWriteBuffer(batches.append, max_size=100, flush_size=50, flush_interval=60).start()
+    buffer.submit({"box_id": "box-1"})
+    buffer.close()
+    assert sum(len(batch) for batch in batches) == 1
+
+
+def test_send_data_queues_when_buffer_enabled(app):
+    from flask import Flask
+    from routes import medibox
+
+    buffered_app = Flask(__name__)
+    database = app.config["MONGO_DB"]
+    blueprint = medibox.create_medibox_blueprint(
+        database,
+        {"SENSOR_BUFFER_ENABLED": True, "SENSOR_BUFFER_FLUSH_INTERVAL": 60},
+    )
+    buffered_app.register_blueprint(blueprint)
+
+    response = buffered_app.test_client().post("/api/send_data", json={"box_id": "box-q", "ldr_value": 10})
+    assert response.status_code == 202
+
+    blueprint.sensor_buffer.close()
+    assert database["sensor_logs"].count_documents({"box_id": "box-q"}) == 1
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from services.medibox_service import MediBoxService
+from services.rollups import SensorRollupService
+from services.sensor_history import SensorHistoryPlanner
+
+START = datetime(2024, 3, 1, 0, 0)
+
+
+def seed(service, count, step):
+    service.persist_sensor_payloads([
+        service.build_sensor_payload("box-h", {"temperature": 20, "ldr_value": index}, recorded_at=START + step * index)
+        for index in range(count)
+    ])
+
+
+def test_resolution_choice_fits_max_points():
+    week = (START, START + timedelta(days=7))
+
+    assert SensorHistoryPlanner.choose_resolution(*week, max_points=200) == "hour"
+    assert SensorHistoryPlanner.choose_resolution(*week, max_points=20000) == "minute"
+    assert SensorHistoryPlanner.choose_resolution(*week, max_points=10) == "day"
+
+
+def test_small_windows_return_raw_readings(app):
+    service = MediBoxService(app.config["MONGO_DB"], rollups=SensorRollupService(app.config["MONGO_DB"]))
+    seed(service, 30, timedelta(minutes=1))
+
+    result = service.history.query("box-h", START, START + timedelta(hours=1), max_points=50)
+
+    assert result["tier"] == "raw"
+    assert len(result["points"]) == 30
+
+
+def test_long_windows_use_rollups_and_stitch_the_open_tail(app):
+    db = app.config["MONGO_DB"]
+    service = MediBoxService(db, rollups=SensorRollupService(db))
+    seed(service, 3 * 24 * 6, timedelta(minutes=10))
+    now = START + timedelta(days=2, hours=23, minutes=25)
+
+    result = service.history.query("box-h", START, START + timedelta(days=3), max_points=100, now=now)
+
+    assert result["tier"] == "hour"
+    assert len(result["points"]) == 72
+    assert result["stitched_tail"] is True
+    # Only readings up to ``now`` count towards the still-open hour.
+    assert result["points"][-1]["count"] == 3
+    assert sum(point["count"] for point in result["points"][:-1]) == 71 * 6
+
+
+def test_history_endpoint_reports_tier(client, app):
+    seed(MediBoxService(app.config["MONGO_DB"]), 5, timedelta(minutes=1))
+
+    response = client.get("/api/mediboxes/box-h/sensor/history?from=2024-03-01T00:00:00&to=2024-03-02T00:00:00")
+    assert response.status_code == 200
+    assert response.get_json()["tier"] == "raw"
+    assert client.get("/api/mediboxes/box-h/sensor/history?from=2024-03-02&to=2024-03-01").status_code == 400
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from services.medibox_service import STORAGE_BUCKETS, MediBoxService
+
+START = datetime(2024, 3, 1, 8, 0)
+
+
+def seed(service, count, step=timedelta(minutes=1)):
+    service.persist_sensor_payloads([
+        service.build_sensor_payload(
+            "box-q",
+            {"temperature": 20 + index, "humidity": 50, "ldr_value": index},
+            recorded_at=START + step * index,
+        )
+        for index in range(count)
+    ])
+
+
+def collect(client, url):
+    values, cursor = [], None
+    while True:
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        page = response.get_json()
+        values.extend(item["data"]["ldr_value"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return values
+
+
+def test_keyset_pages_cover_range_once(app, client):
+    service = MediBoxService(app.config["MONGO_DB"])
+    seed(service, 25)
+
+    values = collect(client, "/api/mediboxes/box-q/sensor?from=2024-03-01T08:05:00&to=2024-03-01T08:20:00&limit=4")
+    assert values == list(range(19, 4, -1))
+
+    ascending = collect(client, "/api/mediboxes/box-q/sensor?order=asc&limit=7")
+    assert ascending == list(range(25))
+
+
+def test_pages_are_stable_under_concurrent_inserts(app, client):
+    service = MediBoxService(app.config["MONGO_DB"])
+    seed(service, 10)
+
+    first = client.get("/api/mediboxes/box-q/sensor?limit=5").get_json()
+    service.record_sensor_data("box-q", {"ldr_value": 999})
+    second = client.get(f"/api/mediboxes/box-q/sensor?limit=5&cursor={first['next_cursor']}").get_json()
+
+    assert [item["data"]["ldr_value"] for item in second["items"]] == [4, 3, 2, 1, 0]
+
+
+def test_projection_and_validation(app, client):
+    seed(MediBoxService(app.config["MONGO_DB"]), 3)
+
+    page = client.get("/api/mediboxes/box-q/sensor?fields=temperature&limit=1").get_json()
+    assert page["items"][0]["data"] == {"temperature": 22}
+    assert client.get("/api/mediboxes/box-q/sensor?cursor=garbage").status_code == 400
+    assert client.get("/api/mediboxes/box-q/sensor?from=yesterday").status_code == 400
+
+
+def test_bucket_mode_pages_through_ties(app):
+    service = MediBoxService(app.config["MONGO_DB"], storage_mode=STORAGE_BUCKETS)
+    seed(service, 9, step=timedelta(0))
+
+    seen, cursor = [], None
+    while True:
+        page = service.page_sensor_readings("box-q", limit=4, cursor=cursor)
+        seen.extend(item["data"]["ldr_value"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert sorted(seen) == list(range(9))
@@ -0,0 +1,82 @@
+import pytest
+from pymongo.errors import AutoReconnect
+
+from services.medibox_service import MediBoxService
+from services.sequence_tracker import ACCEPTED, DUPLICATE, STALE, SequenceTracker
+from utils.telemetry_frame import decode_frames, encode_frame
+
+
+def test_tracker_window_detects_duplicates_and_out_of_order():
+    tracker = SequenceTracker(window=8)
+
+    assert [tracker.check("box-1", seq) for seq in (1, 2, 5, 3)] == [ACCEPTED] * 4
+    assert tracker.check("box-1", 2) == DUPLICATE
+    assert tracker.check("box-1", 4) == ACCEPTED
+    assert tracker.check("box-1", 20) == ACCEPTED
+    assert tracker.check("box-1", 12) == STALE
+    assert tracker.check("box-2", 2) == ACCEPTED
+
+
+def test_retried_readings_are_written_once(app):
+    db = app.config["MONGO_DB"]
+    service = MediBoxService(db, sequence_window=64)
+
+    first = service.record_sensor_data("box-seq", {"temperature": 27, "ldr_value": 100, "seq": 41})
+    retry = service.record_sensor_data("box-seq", {"temperature": 27, "ldr_value": 100, "seq": 41})
+    batch = service.record_sensor_batch([
+        {"box_id": "box-seq", "ldr_value": 101, "seq": 42},
+        {"box_id": "box-seq", "ldr_value": 100, "seq": 41},
+    ])
+
+    assert "duplicate" not in first
+    assert retry["duplicate"] is True
+    assert [item["status"] for item in batch] == ["accepted", "duplicate"]
+    assert db["sensor_logs"].count_documents({"box_id": "box-seq"}) == 2
+
+    restarted = MediBoxService(db, sequence_window=64)
+    assert restarted.record_sensor_data("box-seq", {"ldr_value": 99, "seq": 42})["duplicate"] is True
+
+
+def test_intake_retries_are_logged_once(client, app):
+    service = MediBoxService(app.config["MONGO_DB"], sequence_window=64)
+
+    assert "duplicate" not in service.log_intake("m-1", True, box_id="box-int", seq=7)
+    assert service.log_intake("m-1", True, box_id="box-int", seq=7)["duplicate"] is True
+    assert client.post("/api/intake/logs", json={"box_id": "box-int", "seq": -1}).status_code == 400
+
+
+def test_frames_can_carry_sequence_numbers():
+    readings = decode_frames(encode_frame("box-1", 20, 50, 10, seq=9) + encode_frame("box-1", 20, 50, 12, seq=10))
+    assert [reading["seq"] for reading in readings] == [9, 10]
+
+
+def test_failed_writes_leave_the_sequence_retryable(app, monkeypatch):
+    db = app.config["MONGO_DB"]
+    service = MediBoxService(db, sequence_window=64)
+
+    def unavailable(*args, **kwargs):
+        raise AutoReconnect("connection refused")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(service.sensor_logs, "insert_many", unavailable)
+        patch.setattr(service.intake_logs, "insert_one", unavailable)
+        with pytest.raises(AutoReconnect):
+            service.record_sensor_data("box-retry", {"ldr_value": 100, "seq": 5})
+        with pytest.raises(AutoReconnect):
+            service.log_intake("m-1", True, box_id="box-retry", seq=5)
+
+    assert "duplicate" not in service.record_sensor_data("box-retry", {"ldr_value": 100, "seq": 5})
+    assert "duplicate" not in service.log_intake("m-1", True, box_id="box-retry", seq=5)
+    assert db["sensor_logs"].count_documents({"box_id": "box-retry"}) == 1
+    assert db["intake_logs"].count_documents({"box_id": "box-retry"}) == 1
+
+
+def test_stale_sequences_are_left_to_the_unique_index(app):
+    db = app.config["MONGO_DB"]
+    service = MediBoxService(db, sequence_window=4)
+
+    for seq in (1, 10):
+        service.record_sensor_data("box-stale", {"ldr_value": 100, "seq": seq})
+    assert "duplicate" not in service.record_sensor_data("box-stale", {"ldr_value": 100, "seq": 2})
+    assert service.record_sensor_data("box-stale", {"ldr_value": 100, "seq": 1})["duplicate"] is True
+    assert sorted(doc["seq"] for doc in db["sensor_logs"].find({"box_id": "box-stale"})) == [1, 2, 10]
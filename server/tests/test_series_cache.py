@@ -0,0 +1,124 @@
+import threading
+from datetime import datetime, timedelta
+
+from services.medibox_service import MediBoxService
+from services.rollups import SensorRollupService
+from services.series_cache import SeriesCache
+
+NOW = datetime(2024, 3, 31, 12, 0)
+
+
+def _service(db, tmp_path):
+    service = MediBoxService(db, rollups=SensorRollupService(db))
+    service.series_cache = SeriesCache(str(tmp_path), service.iter_sensor_readings, window_days=7)
+    return service
+
+
+def _seed(service, count, step, start):
+    service.persist_sensor_payloads([
+        service.build_sensor_payload(
+            "box-c",
+            {"temperature": 20 + index / 10, "ldr_value": index} if index % 3 else {"ldr_value": index},
+            recorded_at=start + step * index,
+        )
+        for index in range(count)
+    ])
+
+
+def test_slice_is_a_binary_search_over_mapped_columns(app, tmp_path):
+    service = _service(app.config["MONGO_DB"], tmp_path)
+    start = NOW - timedelta(days=2)
+    _seed(service, 100, timedelta(minutes=1), start)
+
+    window = service.series_cache.slice("box-c", start + timedelta(minutes=12), start + timedelta(minutes=22), NOW)
+    assert len(window) == 10
+    readings = window.readings()
+    assert readings[0]["recorded_at"] == start + timedelta(minutes=12)
+    assert readings[0]["data"] == {"ldr_value": 12.0}
+    assert readings[1]["data"] == {"temperature": 20 + 13 / 10, "ldr_value": 13.0}
+
+    # Ingest keeps the mapped series current without another database read.
+    _seed(service, 5, timedelta(minutes=1), start + timedelta(hours=3))
+    assert len(service.series_cache.slice("box-c", start, NOW, NOW)) == 105
+    assert service.series_cache.stats()["loads"] == 1
+
+    # Ranges older than the cached window fall back to the database.
+    assert service.series_cache.slice("box-c", NOW - timedelta(days=30), NOW, NOW) is None
+
+
+def test_out_of_order_readings_rebuild_the_box(app, tmp_path):
+    service = _service(app.config["MONGO_DB"], tmp_path)
+    start = NOW - timedelta(days=1)
+    _seed(service, 10, timedelta(minutes=1), start)
+    assert len(service.series_cache.slice("box-c", start, NOW, NOW)) == 10
+
+    _seed(service, 1, timedelta(minutes=1), start - timedelta(minutes=30))
+    assert service.series_cache.stats()["invalidations"] == 1
+    assert len(service.series_cache.slice("box-c", start - timedelta(hours=1), NOW, NOW)) == 11
+
+
+def test_history_counts_from_the_cache(app, tmp_path):
+    service = _service(app.config["MONGO_DB"], tmp_path)
+    start = NOW - timedelta(days=3)
+    _seed(service, 3 * 24 * 6, timedelta(minutes=10), start)
+
+    small = service.history.query("box-c", start, start + timedelta(hours=1), max_points=50, now=NOW)
+    assert (small["source"], small["tier"], len(small["points"])) == ("cache", "raw", 6)
+
+    large = service.history.query("box-c", start, NOW, max_points=100, now=NOW)
+    assert (large["source"], large["tier"]) == ("cache", "hour")
+    assert sum(point["count"] for point in large["points"]) == 3 * 24 * 6
+
+
+def test_raw_points_have_the_same_shape_with_and_without_the_cache(app, tmp_path):
+    db = app.config["MONGO_DB"]
+    service = MediBoxService(db)
+    start = NOW - timedelta(hours=2)
+    service.persist_sensor_payloads([
+        service.build_sensor_payload(
+            "box-c",
+            {"temperature": 21, "humidity": 50.5, "ldr_value": 300, "medicine_taken": True, "seq": index},
+            recorded_at=start + timedelta(minutes=index),
+        )
+        for index in range(5)
+    ])
+
+    from_database = service.history.query("box-c", start, NOW, now=NOW)
+    service.series_cache = SeriesCache(str(tmp_path), service.iter_sensor_readings, window_days=7)
+    from_cache = service.history.query("box-c", start, NOW, now=NOW)
+
+    assert (from_database["source"], from_cache["source"]) == ("database", "cache")
+    assert from_database["points"] == from_cache["points"]
+    assert set(from_cache["points"][0]) == {"box_id", "data", "recorded_at"}
+
+
+def test_loading_a_box_does_not_block_ingest_or_other_boxes(app, tmp_path):
+    service = MediBoxService(app.config["MONGO_DB"])
+    start = NOW - timedelta(hours=3)
+    _seed(service, 10, timedelta(minutes=1), start)
+    release, loading = threading.Event(), threading.Event()
+    waited = []
+
+    def loader(box_id, since, end):
+        if box_id == "box-c":
+            readings = list(service.iter_sensor_readings(box_id, since, end))
+            loading.set()
+            waited.append(release.wait(5))
+            return readings
+        return service.iter_sensor_readings(box_id, since, end)
+
+    cache = service.series_cache = SeriesCache(str(tmp_path), loader, window_days=7)
+    slow = threading.Thread(target=cache.slice, args=("box-c", start, NOW, NOW))
+    slow.start()
+    assert loading.wait(5)
+
+    # While box-c loads, other boxes are served and box-c's new readings are held back.
+    assert len(cache.slice("box-other", start, NOW, NOW)) == 0
+    _seed(service, 2, timedelta(minutes=1), start + timedelta(minutes=10))
+    assert slow.is_alive()
+    release.set()
+    slow.join(5)
+    assert waited == [True]
+
+    assert len(cache.slice("box-c", start, NOW, NOW)) == 12
+    assert cache.stats()["loads"] == 2 and cache.stats()["invalidations"] == 0
@@ -0,0 +1,85 @@
+import random
+from datetime import datetime, timedelta
+
+from services.medibox_service import MediBoxService
+from services.sketches import SensorSketchStore, TDigest
+
+START = datetime(2024, 3, 1, 0, 0)
+
+
+def test_digest_is_accurate_and_mergeable():
+    rng = random.Random(7)
+    values = [rng.gauss(25, 3) for _ in range(20000)]
+    merged = TDigest()
+    for index in range(0, len(values), 500):
+        part = TDigest().extend(values[index:index + 500])
+        merged.merge(TDigest.from_bytes(part.to_bytes()))
+
+    ordered = sorted(values)
+    for q in (0.05, 0.5, 0.95, 0.99):
+        assert abs(merged.quantile(q) - ordered[int(q * len(ordered))]) < 0.1
+    assert merged.count == len(values)
+    assert merged.quantile(0) == min(values) and merged.quantile(1) == max(values)
+    assert len(merged.to_bytes()) < 4096
+
+
+def test_hourly_parts_merge_and_compact(app):
+    db = app.config["MONGO_DB"]
+    store = SensorSketchStore(db)
+    service = MediBoxService(db, sketches=store)
+    for batch in range(4):
+        service.persist_sensor_payloads([
+            service.build_sensor_payload(
+                "box-s",
+                {"temperature": float(value)},
+                recorded_at=START + timedelta(hours=batch % 2, minutes=value % 60),
+            )
+            for value in range(batch * 25, batch * 25 + 25)
+        ])
+
+    digest, hours = store.merged("box-s", "temperature", START, START + timedelta(hours=2))
+    assert hours == 2 and digest.count == 100
+    assert 45 <= digest.quantile(0.5) <= 55
+    assert all(len(doc["parts"]["temperature"]) == 1 for doc in db["sensor_sketches"].find())
+
+
+def test_percentile_endpoint(app):
+    from flask import Flask
+    from routes import medibox
+
+    sketch_app = Flask(__name__)
+    sketch_app.register_blueprint(medibox.create_medibox_blueprint(app.config["MONGO_DB"], {"SENSOR_SKETCHES_ENABLED": True}))
+    client = sketch_app.test_client()
+    client.post("/api/mediboxes/sensor/batch", json={"readings": [
+        {"box_id": "box-s", "temperature": value} for value in range(1, 101)
+    ]})
+
+    body = client.get("/api/mediboxes/box-s/percentiles?metric=temperature&q=0.5,0.95").get_json()
+    assert body["count"] == 100
+    assert abs(body["percentiles"]["0.95"] - 95) <= 1.5
+    assert client.get("/api/mediboxes/box-s/percentiles?metric=pressure").status_code == 400
+    assert client.get("/api/mediboxes/box-s/percentiles?q=1.5").status_code == 400
+
+
+def test_parts_stay_bounded_without_reads(app):
+    db = app.config["MONGO_DB"]
+    store = SensorSketchStore(db)
+    service = MediBoxService(db, sketches=store)
+    for second in range(360):
+        service.persist_sensor_payloads([service.build_sensor_payload(
+            "box-w", {"temperature": 20 + second % 7, "humidity": 60.0, "ldr_value": 100},
+            recorded_at=START + timedelta(seconds=10 * second),
+        )])
+
+    doc = db["sensor_sketches"].find_one({"box_id": "box-w", "hour": START})
+    assert all(len(parts) < store.compact_after for parts in doc["parts"].values())
+    assert sum(len(part) for parts in doc["parts"].values() for part in parts) < 8 * 1024
+
+    # Moving on to later hours closes this one down to a single part.
+    service.persist_sensor_payloads([service.build_sensor_payload(
+        "box-w", {"temperature": 21.0}, recorded_at=START + timedelta(hours=2, minutes=1),
+    )])
+    doc = db["sensor_sketches"].find_one({"box_id": "box-w", "hour": START})
+    assert all(len(parts) == 1 for parts in doc["parts"].values())
+    digest, _ = store.merged("box-w", "temperature", START, START + timedelta(hours=1))
+    assert digest.count == 360
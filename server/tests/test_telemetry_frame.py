@@ -0,0 +1,47 @@
+import pytest
+
+from utils.telemetry_frame import CONTENT_TYPE, FRAME, decode_frames, encode_frame
+
+
+def test_decode_frames_round_trips_a_batch():
+    body = encode_frame("box-1", 27.5, 61.25, 1200, medicine_taken=True) + encode_frame("box-2", -3.1, 40, 80)
+
+    readings = decode_frames(body)
+
+    assert len(body) == 2 * FRAME.size
+    assert readings[0] == {
+        "box_id": "box-1",
+        "temperature": 27.5,
+        "humidity": 61.25,
+        "ldr_value": 1200,
+        "medicine_taken": True,
+    }
+    assert readings[1]["box_id"] == "box-2"
+    assert readings[1]["temperature"] == -3.1
+    assert readings[1]["medicine_taken"] is False
+
+
+def test_decode_frames_rejects_truncated_payload():
+    with pytest.raises(ValueError):
+        decode_frames(encode_frame("box-1", 20, 50, 10)[:-1])
+
+
+def test_send_data_accepts_binary_frames(app, client):
+    single = client.post(
+        "/api/send_data",
+        data=encode_frame("box-bin", 26.0, 55.0, 900),
+        content_type=CONTENT_TYPE,
+    )
+    assert single.status_code == 201
+    assert single.get_json()["data"]["ldr_value"] == 900
+
+    batch = client.post(
+        "/api/send_data",
+        data=encode_frame("box-bin", 26.1, 55.0, 910) + encode_frame("box-bin", 26.2, 55.0, 1300),
+        content_type=CONTENT_TYPE,
+    )
+    assert batch.status_code == 201
+    assert batch.get_json()["accepted"] == 2
+
+    db = app.config["MONGO_DB"]
+    assert db["sensor_logs"].count_documents({"box_id": "box-bin"}) == 3
@@ -20,13 +20,80 @@ class Config:
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/medibox')
     MONGO_DB = os.getenv('MONGO_DB', 'medibox')
     
+    # Sensor ingestion
+    SENSOR_STORAGE_MODE = os.getenv('SENSOR_STORAGE_MODE', 'documents')  # documents | buckets
+    SENSOR_BATCH_MAX_SIZE = int(os.getenv('SENSOR_BATCH_MAX_SIZE', '500'))
+    SENSOR_DEADBAND_ENABLED = os.getenv('SENSOR_DEADBAND_ENABLED', '0') == '1'
+    SENSOR_DEADBAND_TEMPERATURE = float(os.getenv('SENSOR_DEADBAND_TEMPERATURE', '0.5'))
+    SENSOR_DEADBAND_HUMIDITY = float(os.getenv('SENSOR_DEADBAND_HUMIDITY', '2.0'))
+    SENSOR_DEADBAND_LDR = float(os.getenv('SENSOR_DEADBAND_LDR', '50'))
+    SENSOR_HEARTBEAT_SECONDS = int(os.getenv('SENSOR_HEARTBEAT_SECONDS', '600'))
+    LID_EVENTS_ENABLED = os.getenv('LID_EVENTS_ENABLED', '0') == '1'
+    LID_LDR_THRESHOLD = int(os.getenv('LID_LDR_THRESHOLD', '1000'))
+    LID_LDR_HYSTERESIS = int(os.getenv('LID_LDR_HYSTERESIS', '50'))
+    INVENTORY_ENABLED = os.getenv('INVENTORY_ENABLED', '0') == '1'
+    INVENTORY_SNAPSHOT_EVERY = int(os.getenv('INVENTORY_SNAPSHOT_EVERY', '50'))
+    INVENTORY_SNAPSHOT_HOURS = int(os.getenv('INVENTORY_SNAPSHOT_HOURS', '24'))
+    SEQUENCE_TRACKING_ENABLED = os.getenv('SEQUENCE_TRACKING_ENABLED', '1') == '1'
+    SEQUENCE_WINDOW = int(os.getenv('SEQUENCE_WINDOW', '64'))
+    SENSOR_BUFFER_ENABLED = os.getenv('SENSOR_BUFFER_ENABLED', '0') == '1'
+    SENSOR_BUFFER_MAX_SIZE = int(os.getenv('SENSOR_BUFFER_MAX_SIZE', '10000'))
+    SENSOR_BUFFER_FLUSH_SIZE = int(os.getenv('SENSOR_BUFFER_FLUSH_SIZE', '500'))
+    SENSOR_BUFFER_FLUSH_INTERVAL = float(os.getenv('SENSOR_BUFFER_FLUSH_INTERVAL', '1.0'))
+    SENSOR_BUFFER_POLICY = os.getenv('SENSOR_BUFFER_POLICY', 'block')  # block | drop_oldest | reject
+    SENSOR_BUFFER_BLOCK_TIMEOUT = float(os.getenv('SENSOR_BUFFER_BLOCK_TIMEOUT', '1.0'))
+    ROLLUPS_ENABLED = os.getenv('ROLLUPS_ENABLED', '0') == '1'
+    ROLLUP_MINUTE_RETENTION_DAYS = int(os.getenv('ROLLUP_MINUTE_RETENTION_DAYS', '7'))  # 0 = keep forever
+    SENSOR_SKETCHES_ENABLED = os.getenv('SENSOR_SKETCHES_ENABLED', '0') == '1'
+    SENSOR_SKETCH_COMPRESSION = int(os.getenv('SENSOR_SKETCH_COMPRESSION', '100'))
+    SENSOR_RETENTION_DAYS = int(os.getenv('SENSOR_RETENTION_DAYS', '0'))  # 0 = keep sensor_logs forever
+    SENSOR_RETENTION_INTERVAL = float(os.getenv('SENSOR_RETENTION_INTERVAL', '3600'))
+    SENSOR_ARCHIVE_DIR = os.getenv('SENSOR_ARCHIVE_DIR', 'data/sensor-archive')
+    SERIES_CACHE_ENABLED = os.getenv('SERIES_CACHE_ENABLED', '0') == '1'
+    SERIES_CACHE_DIR = os.getenv('SERIES_CACHE_DIR', 'data/series-cache')
+    SERIES_CACHE_DAYS = int(os.getenv('SERIES_CACHE_DAYS', '30'))
+    SERIES_CACHE_MAX_BOXES = int(os.getenv('SERIES_CACHE_MAX_BOXES', '256'))
+    RECENT_WINDOW_ENABLED = os.getenv('RECENT_WINDOW_ENABLED', '1') == '1'
+    RECENT_WINDOW_HOURS = int(os.getenv('RECENT_WINDOW_HOURS', '24'))
+    RECENT_WINDOW_CAPACITY = int(os.getenv('RECENT_WINDOW_CAPACITY', '8640'))  # readings per box
+    RECENT_WINDOW_MAX_BOXES = int(os.getenv('RECENT_WINDOW_MAX_BOXES', '256'))
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '5000'))
+    BOX_STATUS_ENABLED = os.getenv('BOX_STATUS_ENABLED', '0') == '1'
+    BOX_STATUS_CACHE_SECONDS = float(os.getenv('BOX_STATUS_CACHE_SECONDS', '5.0'))
+    PRESENCE_TRACKING_ENABLED = os.getenv('PRESENCE_TRACKING_ENABLED', '0') == '1'
+    PRESENCE_FLUSH_SECONDS = float(os.getenv('PRESENCE_FLUSH_SECONDS', '5.0'))
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '0'))  # 0 = ingest in the API process
+    INGEST_WORKER_QUEUE_SIZE = int(os.getenv('INGEST_WORKER_QUEUE_SIZE', '10000'))
+    INGEST_WORKER_BATCH_SIZE = int(os.getenv('INGEST_WORKER_BATCH_SIZE', '200'))
+    INGEST_JOURNAL_ENABLED = os.getenv('INGEST_JOURNAL_ENABLED', '1') == '1'
+    INGEST_JOURNAL_DIR = os.getenv('INGEST_JOURNAL_DIR', 'data/ingest-journal')
+    INGEST_JOURNAL_SEGMENT_MB = int(os.getenv('INGEST_JOURNAL_SEGMENT_MB', '16'))
+    INGEST_JOURNAL_FSYNC = os.getenv('INGEST_JOURNAL_FSYNC', '0') == '1'
+    INGEST_JOURNAL_REPLAY_BATCH = int(os.getenv('INGEST_JOURNAL_REPLAY_BATCH', '1000'))
+    INGEST_JOURNAL_REPLAY_INTERVAL = float(os.getenv('INGEST_JOURNAL_REPLAY_INTERVAL', '5.0'))
+
+    # Per-box rate limits (tokens per second, bucket size)
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+    RATE_LIMIT_SHARED = os.getenv('RATE_LIMIT_SHARED', '0') == '1'
+    RATE_LIMIT_SENSOR_RATE = float(os.getenv('RATE_LIMIT_SENSOR_RATE', '1.0'))
+    RATE_LIMIT_SENSOR_BURST = int(os.getenv('RATE_LIMIT_SENSOR_BURST', '10'))
+    RATE_LIMIT_INTAKE_RATE = float(os.getenv('RATE_LIMIT_INTAKE_RATE', '0.2'))
+    RATE_LIMIT_INTAKE_BURST = int(os.getenv('RATE_LIMIT_INTAKE_BURST', '5'))
+    RATE_LIMIT_REMINDER_RATE = float(os.getenv('RATE_LIMIT_REMINDER_RATE', '0.2'))
+    RATE_LIMIT_REMINDER_BURST = int(os.getenv('RATE_LIMIT_REMINDER_BURST', '3'))
+
     # MQTT
     MQTT_BROKER_URL = os.getenv('MQTT_BROKER', 'broker.hivemq.com')
     MQTT_BROKER_PORT = int(os.getenv('MQTT_PORT', '1883'))
     MQTT_USERNAME = os.getenv('MQTT_USERNAME', '')
     MQTT_PASSWORD = os.getenv('MQTT_PASSWORD', '')
     MQTT_KEEPALIVE = 60
-    MQTT_TLS_ENABLED = False
+    MQTT_TLS_ENABLED = os.getenv('MQTT_TLS_ENABLED', '0') == '1'
+    MQTT_INGEST_ENABLED = os.getenv('MQTT_INGEST_ENABLED', '0') == '1'  # also needs MQTT_USERNAME or TLS
+    MQTT_INGEST_WORKERS = int(os.getenv('MQTT_INGEST_WORKERS', '2'))
+    MQTT_INGEST_QUEUE_SIZE = int(os.getenv('MQTT_INGEST_QUEUE_SIZE', '10000'))
+    MQTT_INGEST_BATCH_SIZE = int(os.getenv('MQTT_INGEST_BATCH_SIZE', '200'))
+    MQTT_INGEST_FLUSH_INTERVAL = float(os.getenv('MQTT_INGEST_FLUSH_INTERVAL', '0.5'))
     
     # AI Hub
     AI_HUB_URL = os.getenv('AI_HUB_URL', 'https://placeholder.qualcomm.aihub')
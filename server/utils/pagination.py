@@ -0,0 +1,22 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+
+def encode_cursor(recorded_at: datetime, tiebreaker) -> str:
+    """Opaque keyset cursor for the position just after ``(recorded_at, tiebreaker)``."""
+    raw = json.dumps({"t": recorded_at.isoformat(), "k": tiebreaker}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]):
+    """Return ``(recorded_at, tiebreaker)`` or ``(None, None)``; raises ``ValueError`` if malformed."""
+    if not cursor:
+        return None, None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(data["t"]), data["k"]
+    except (ValueError, KeyError, TypeError, UnicodeError) as exc:
+        raise ValueError("cursor is invalid") from exc
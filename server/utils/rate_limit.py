@@ -0,0 +1,171 @@
+import math
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import jsonify
+from pymongo.errors import DuplicateKeyError
+
+
+class InMemoryRateStore:
+    """Per-process limiter state: one float per key."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._values: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[float]:
+        return self._values.get(key)
+
+    def compare_and_set(self, key: str, expected: Optional[float], value: float, now: float) -> bool:
+        with self._lock:
+            if self._values.get(key) != expected:
+                return False
+            if expected is None and len(self._values) >= self.max_keys:
+                self._prune(now)
+            self._values[key] = value
+            return True
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _prune(self, now: float) -> None:
+        # A key whose arrival time is in the past is indistinguishable from a
+        # key that was never seen, so it can be dropped safely.
+        for key in [key for key, value in self._values.items() if value <= now]:
+            del self._values[key]
+
+
+class MongoRateStore:
+    """Limiter state shared by several processes through a Mongo collection.
+
+    Keys are stored as ``<namespace>:<key>`` so the sensor, intake and
+    reminder limiters can share one collection.
+    """
+
+    def __init__(self, collection, namespace: str):
+        self.collection = collection
+        self.namespace = namespace
+
+    def get(self, key: str) -> Optional[float]:
+        doc = self.collection.find_one({"_id": self._id(key)}, {"tat": 1})
+        return doc["tat"] if doc else None
+
+    def compare_and_set(self, key: str, expected: Optional[float], value: float, now: float) -> bool:
+        if expected is None:
+            try:
+                self.collection.insert_one({"_id": self._id(key), "tat": value})
+                return True
+            except DuplicateKeyError:
+                return False
+        result = self.collection.update_one(
+            {"_id": self._id(key), "tat": expected},
+            {"$set": {"tat": value}},
+        )
+        return result.modified_count == 1
+
+    def __len__(self) -> int:
+        return self.collection.count_documents({"_id": {"$regex": f"^{self.namespace}:"}})
+
+    def _id(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+
+class TokenBucketLimiter:
+    """Token bucket per key (box_id), refilled at ``rate`` tokens per second.
+
+    The bucket is stored in its GCRA form: a single "theoretical arrival
+    time" per key instead of a (tokens, timestamp) pair. Behaviour is the same
+    as a token bucket holding at most ``burst`` tokens, but every key costs
+    one float and updates are a single compare-and-set, which also makes the
+    optional shared ``MongoRateStore`` straightforward.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        store=None,
+        clock: Callable[[], float] = time.time,
+        max_retries: int = 3,
+    ):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.interval = 1.0 / rate
+        self.tolerance = self.interval * (burst - 1)
+        self.store = store if store is not None else InMemoryRateStore()
+        self.clock = clock
+        self.max_retries = max_retries
+
+        self._counter_lock = threading.Lock()
+        self.allowed = 0
+        self.throttled = 0
+        self.throttled_by_key: Counter = Counter()
+        self.max_tracked_throttled = 1000
+
+    @classmethod
+    def from_config(cls, db, config, name: str) -> Optional["TokenBucketLimiter"]:
+        """Build the ``RATE_LIMIT_<NAME>_*`` limiter, or ``None`` when rate limiting is off."""
+        config = config or {}
+        if not config.get("RATE_LIMIT_ENABLED"):
+            return None
+        prefix = f"RATE_LIMIT_{name.upper()}"
+        store = None
+        if config.get("RATE_LIMIT_SHARED"):
+            store = MongoRateStore(db.rate_limits, namespace=name)
+        return cls(
+            rate=config.get(f"{prefix}_RATE", 1.0),
+            burst=config.get(f"{prefix}_BURST", 10),
+            store=store,
+        )
+
+    def acquire(self, key: str) -> Tuple[bool, float]:
+        """Take one token for ``key``; returns ``(allowed, retry_after_seconds)``."""
+        for _ in range(self.max_retries):
+            now = self.clock()
+            stored = self.store.get(key)
+            arrival = max(stored if stored is not None else now, now)
+            wait = arrival - now - self.tolerance
+            if wait > 0:
+                self._record(key, allowed=False)
+                return False, wait
+            if self.store.compare_and_set(key, stored, arrival + self.interval, now):
+                self._record(key, allowed=True)
+                return True, 0.0
+        # Heavy contention on one key: fail open rather than reject a device
+        # because other workers happened to win the race.
+        self._record(key, allowed=True)
+        return True, 0.0
+
+    def stats(self, top: int = 10) -> dict:
+        with self._counter_lock:
+            return {
+                "tracked_keys": len(self.store),
+                "allowed": self.allowed,
+                "throttled": self.throttled,
+                "throttled_keys": len(self.throttled_by_key),
+                "top_throttled": dict(self.throttled_by_key.most_common(top)),
+            }
+
+    def _record(self, key: str, allowed: bool) -> None:
+        with self._counter_lock:
+            if allowed:
+                self.allowed += 1
+                return
+            self.throttled += 1
+            if key in self.throttled_by_key or len(self.throttled_by_key) < self.max_tracked_throttled:
+                self.throttled_by_key[key] += 1
+
+
+def throttle_response(limiter: Optional[TokenBucketLimiter], key):
+    """Return a 429 response when ``key`` is over its budget, otherwise ``None``."""
+    if limiter is None or not key:
+        return None
+    allowed, retry_after = limiter.acquire(str(key))
+    if allowed:
+        return None
+    response = jsonify({"message": "Too many requests for this box", "box_id": key})
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response, 429
@@ -0,0 +1,159 @@
+"""Fixed-layout binary telemetry frames sent by the ESP32 firmware.
+
+Layout (little-endian, 26 bytes per version 1 frame)::
+
+    magic       2s   b"MB"
+    version     B    1 or 2
+    flags       B    bit 0 = medicine_taken
+    box_id      16s  UTF-8, NUL padded
+    temperature h    degrees Celsius * 100
+    humidity    H    percent * 100
+    ldr_value   H    raw ADC reading
+    seq         I    version 2 only: per-box sequence number (30 bytes total)
+
+A request body may hold any number of frames of the same version back to
+back. Keep this in sync with ``FRAME_FORMAT`` in
+``esp32_firmware/esp32_firmware.py``.
+"""
+import json
+import struct
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+CONTENT_TYPE = "application/vnd.medibox.telemetry"
+BINARY_CONTENT_TYPES = {CONTENT_TYPE, "application/octet-stream"}
+
+FRAME_MAGIC = b"MB"
+FRAME_VERSION = 1
+FRAME_VERSION_SEQ = 2
+FLAG_MEDICINE_TAKEN = 0x01
+BOX_ID_SIZE = 16
+
+FRAME = struct.Struct("<2sBB16shHH")
+FRAME_SEQ = struct.Struct("<2sBB16shHHI")
+FRAMES_BY_VERSION = {FRAME_VERSION: FRAME, FRAME_VERSION_SEQ: FRAME_SEQ}
+
+
+def is_binary_request(content_type) -> bool:
+    if not content_type:
+        return False
+    return content_type.split(";", 1)[0].strip().lower() in BINARY_CONTENT_TYPES
+
+
+def looks_like_frames(body) -> bool:
+    """Cheap check used where JSON and frames share a channel (MQTT)."""
+    if len(body) < FRAME.size or bytes(body[:2]) != FRAME_MAGIC:
+        return False
+    layout = FRAMES_BY_VERSION.get(body[2])
+    return layout is not None and len(body) % layout.size == 0
+
+
+def encode_frame(
+    box_id: str,
+    temperature: float,
+    humidity: float,
+    ldr_value: int,
+    medicine_taken: bool = False,
+    seq=None,
+) -> bytes:
+    encoded_id = box_id.encode("utf-8")
+    if len(encoded_id) > BOX_ID_SIZE:
+        raise ValueError(f"box_id longer than {BOX_ID_SIZE} bytes")
+    fields = [
+        FRAME_MAGIC,
+        FRAME_VERSION if seq is None else FRAME_VERSION_SEQ,
+        FLAG_MEDICINE_TAKEN if medicine_taken else 0,
+        encoded_id,
+        int(round(temperature * 100)),
+        int(round(humidity * 100)),
+        int(ldr_value),
+    ]
+    if seq is None:
+        return FRAME.pack(*fields)
+    return FRAME_SEQ.pack(*fields, int(seq))
+
+
+def decode_frames(body) -> List[dict]:
+    """Decode every frame in ``body`` without copying it.
+
+    Returns readings shaped like the JSON payload of ``/api/send_data``.
+    Raises ``ValueError`` for truncated bodies or unknown frame headers.
+    """
+    view = memoryview(body)
+    if view.nbytes < 3:
+        raise ValueError("binary payload is too short")
+    layout = FRAMES_BY_VERSION.get(view[2])
+    if layout is None:
+        raise ValueError("unsupported telemetry frame")
+    if view.nbytes % layout.size:
+        raise ValueError(f"binary payload must be a multiple of {layout.size} bytes")
+
+    version = view[2]
+    readings = []
+    for fields in layout.iter_unpack(view):
+        magic, frame_version, flags, raw_box_id, temperature, humidity, ldr_value = fields[:7]
+        if magic != FRAME_MAGIC or frame_version != version:
+            raise ValueError("unsupported telemetry frame")
+        reading = {
+            "box_id": raw_box_id.rstrip(b"\0").decode("utf-8"),
+            "temperature": temperature / 100,
+            "humidity": humidity / 100,
+            "ldr_value": ldr_value,
+            "medicine_taken": bool(flags & FLAG_MEDICINE_TAKEN),
+        }
+        if version == FRAME_VERSION_SEQ:
+            reading["seq"] = fields[7]
+        readings.append(reading)
+    return readings
+
+
+def split_frames_by_box(body) -> Dict[str, bytes]:
+    """Split a frame body into per-box bodies without decoding the readings.
+
+    Used by the sharded ingest front door, which only needs the box_id of
+    each frame to pick a worker. Frame order is kept within every box.
+    """
+    view = memoryview(body)
+    if view.nbytes < 3:
+        raise ValueError("binary payload is too short")
+    layout = FRAMES_BY_VERSION.get(view[2])
+    if layout is None:
+        raise ValueError("unsupported telemetry frame")
+    if view.nbytes % layout.size:
+        raise ValueError(f"binary payload must be a multiple of {layout.size} bytes")
+
+    groups: Dict[str, List[bytes]] = OrderedDict()
+    for start in range(0, view.nbytes, layout.size):
+        raw_box_id = bytes(view[start + 4:start + 4 + BOX_ID_SIZE])
+        box_id = raw_box_id.rstrip(b"\0").decode("utf-8")
+        groups.setdefault(box_id, []).append(bytes(view[start:start + layout.size]))
+    return OrderedDict((box_id, b"".join(frames)) for box_id, frames in groups.items())
+
+
+def decode_sensor_message(body, default_box_id: Optional[str] = None) -> List[dict]:
+    """Decode a JSON or binary sensor message into a list of readings.
+
+    JSON may be a single reading, a list of readings or ``{"readings": [...]}``.
+    Readings without a ``box_id`` get ``default_box_id`` (from the URL or MQTT
+    topic). Raises ``ValueError`` for anything that is not a sensor message.
+    """
+    if looks_like_frames(body):
+        readings = decode_frames(body)
+    else:
+        try:
+            decoded = json.loads(body)
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            raise ValueError(str(exc)) from exc
+        if isinstance(decoded, dict):
+            readings = decoded.get("readings") if isinstance(decoded.get("readings"), list) else [decoded]
+        elif isinstance(decoded, list):
+            readings = decoded
+        else:
+            raise ValueError("sensor message must be an object or a list")
+
+    for reading in readings:
+        if not isinstance(reading, dict):
+            raise ValueError("sensor readings must be objects")
+        if default_box_id and not reading.get("box_id"):
+            reading["box_id"] = default_box_id
+    return readings